@@ -0,0 +1,99 @@
+"""
+Generator benchmark with per-phase profiling.
+
+Run from the repository root:
+    python -m benchmarks.bench_generator --runs 20 --difficulty easy medium
+    python -m benchmarks.bench_generator --runs 20 --corpus solution_grids.bin
+
+For each difficulty, prints latency percentiles, the fill/removal/uniqueness split and
+the search-node counts, so slow generate_puzzle calls can be traced to a phase.
+With --corpus (built by python -m src.grid_corpus), each difficulty is also run with full
+boards drawn from the corpus instead of searched for, and the latency saved is reported.
+"""
+import argparse
+import json
+import statistics
+
+from src.grid_corpus import GridCorpus
+from src.profiling import SearchStats, profile_generator
+from src.sudoku_generator import SudokuGenerator
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def bench_difficulty(difficulty, runs, grid_corpus=None):
+    generator = SudokuGenerator(grid_corpus=grid_corpus)
+    stats = SearchStats(max_call_records=runs * 200)
+    profile_generator(generator, stats)
+    shortfalls = []
+    for _ in range(runs):
+        generator.generate_puzzle(difficulty)
+        shortfalls.append(generator.last_generation["shortfall"])
+
+    calls = [c for c in stats.calls if c["op"] == "generate_puzzle"]
+    seconds = [c["seconds"] for c in calls]
+    return {
+        "difficulty": difficulty,
+        "runs": runs,
+        "corpus": grid_corpus is not None,
+        "p50_seconds": statistics.median(seconds),
+        "p95_seconds": percentile(seconds, 95),
+        "max_seconds": max(seconds),
+        "fill_seconds": sum(c.get("fill.seconds", 0.0) for c in calls) / runs,
+        "removal_seconds": sum(c.get("removal.seconds", 0.0) for c in calls) / runs,
+        "uniqueness_seconds": sum(c.get("uniqueness.seconds", 0.0) for c in calls) / runs,
+        "fill_nodes": sum(c.get("fill.nodes", 0) for c in calls) / runs,
+        "check_nodes": sum(c.get("bitset.nodes", 0) for c in calls) / runs,
+        "is_valid_calls": sum(c.get("is_valid.calls", 0) for c in calls) / runs,
+        "short_runs": sum(1 for shortfall in shortfalls if shortfall),
+        "mean_shortfall": statistics.mean(shortfalls),
+        "slowest_call": max(calls, key=lambda c: c["seconds"]),
+    }
+
+
+def print_result(result, runs, as_json):
+    if as_json:
+        print(json.dumps(result))
+        return
+    print(f"--- {result['difficulty']}{' (corpus)' if result['corpus'] else ''} ({runs} runs) ---")
+    print(f"latency  p50 {result['p50_seconds']:.4f}s  p95 {result['p95_seconds']:.4f}s  max {result['max_seconds']:.4f}s")
+    print(f"phases   fill {result['fill_seconds']:.4f}s  removal {result['removal_seconds']:.4f}s  "
+          f"uniqueness {result['uniqueness_seconds']:.4f}s  (mean per call)")
+    print(f"work     fill nodes {result['fill_nodes']:.0f}  check nodes {result['check_nodes']:.0f}  "
+          f"is_valid calls {result['is_valid_calls']:.0f}  (mean per call)")
+    print(f"removal  {result['short_runs']} of {runs} puzzles short of their target, "
+          f"by {result['mean_shortfall']:.1f} cells on average")
+    if "p50_saved_seconds" in result:
+        print(f"corpus   fill phase {result['fill_saved_seconds'] * 1000:.1f} ms shorter per call, "
+              f"p50 {result['p50_saved_seconds'] * 1000:.1f} ms faster ({result['p50_saved_percent']:.0f}%; "
+              f"the rest of the latency is uniqueness checks, which vary from puzzle to puzzle)")
+    print(f"slowest  {result['slowest_call']}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--difficulty", nargs="+", default=["easy", "medium"])
+    parser.add_argument("--corpus", help="Grid corpus file: also run with full boards drawn from it")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines")
+    args = parser.parse_args()
+
+    corpus = GridCorpus(args.corpus) if args.corpus else None
+    for difficulty in args.difficulty:
+        results = [bench_difficulty(difficulty, args.runs)]
+        if corpus is not None:
+            results.append(bench_difficulty(difficulty, args.runs, corpus))
+            base, drawn = results
+            drawn["p50_saved_seconds"] = base["p50_seconds"] - drawn["p50_seconds"]
+            drawn["p50_saved_percent"] = 100 * drawn["p50_saved_seconds"] / base["p50_seconds"]
+            drawn["fill_saved_seconds"] = base["fill_seconds"] - drawn["fill_seconds"]
+        for result in results:
+            print_result(result, args.runs, args.json)
+
+
+if __name__ == "__main__":
+    main()
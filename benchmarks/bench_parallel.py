@@ -0,0 +1,98 @@
+"""
+Parallel search benchmark: the sequential bitset search against ParallelSolver on 1..N workers.
+
+Run from the repository root:
+    python -m benchmarks.bench_parallel --runs 3 --workers 1 2 4 8
+
+Workloads are boards whose search tree is large enough to split:
+    count 9x9     a hard puzzle with two clues removed, every solution counted
+    count 16x16   a random 16x16 board, 57% empty, every solution counted
+    solve 16x16   the same board solved (first solution wins, the rest is cancelled)
+Counts are exhaustive: with a limit that is reached, each subtree counts up to the limit on
+its own, so parallel counting pays off for full counts and uniqueness checks (limit 2).
+Every parallel answer is checked against the sequential one (counts equal, solutions valid).
+The first parallel run of each worker count includes starting its pool; the times are medians.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+
+from src.bitset_solver import BitsetSolver
+from src.constraints import classic_model
+from src.parallel_solver import ParallelSolver
+from src.sudoku_board import string_to_board
+
+
+def workloads(seed):
+    hard = string_to_board("800000000003600000070090200050007000000045700000100030001000068008500010090000400")
+    for r, c in ((0, 0), (1, 2)):
+        hard[r][c] = 0
+    random.seed(seed)
+    sparse = BitsetSolver().random_solution(16)
+    for cell in random.sample(range(256), int(256 * 0.57)):
+        sparse[cell // 16][cell % 16] = 0
+    return [("count 9x9", "count", hard, None), ("count 16x16", "count", sparse, None),
+            ("solve 16x16", "solve", sparse, None)]
+
+
+def run(solver, mode, board, limit):
+    """Returns (answer, seconds); a solve's answer is the solved board, or False."""
+    start = time.perf_counter()
+    if mode == "count":
+        answer = solver.count_solutions(board, limit=limit)
+    else:
+        solved = [row[:] for row in board]
+        answer = solved if solver.solve(solved) else False
+    return answer, time.perf_counter() - start
+
+
+def check(mode, board, expected, answer):
+    if mode == "count":
+        assert answer == expected, f"parallel count {answer} != sequential {expected}"
+    else:
+        assert bool(answer) == bool(expected), "parallel and sequential solve verdicts differ"
+        assert not answer or (classic_model(len(board)).is_solved(answer) and all(
+            not given or given == value for row, solved in zip(board, answer) for given, value in zip(row, solved)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines")
+    args = parser.parse_args()
+
+    sequential = BitsetSolver()
+    pools = {workers: ParallelSolver(workers=workers) for workers in args.workers}
+    try:
+        for name, mode, board, limit in workloads(args.seed):
+            expected, _ = run(sequential, mode, board, limit)
+            base = statistics.median(run(sequential, mode, board, limit)[1] for _ in range(args.runs))
+            results = [{"workload": name, "workers": "sequential", "seconds": base, "speedup": 1.0}]
+            for workers, solver in pools.items():
+                times = []
+                for _ in range(args.runs):
+                    answer, seconds = run(solver, mode, board, limit)
+                    check(mode, board, expected, answer)
+                    times.append(seconds)
+                seconds = statistics.median(times)
+                results.append({"workload": name, "workers": workers, "seconds": seconds, "speedup": base / seconds})
+            for result in results:
+                if args.json:
+                    print(json.dumps(result))
+                else:
+                    print(f"{result['workload']:<12} {str(result['workers']):>10} workers  "
+                          f"{result['seconds']:8.3f}s  x{result['speedup']:.2f}")
+    finally:
+        for solver in pools.values():
+            solver.close()
+    print(f"{os.cpu_count()} CPUs")
+
+
+if __name__ == "__main__":
+    main()
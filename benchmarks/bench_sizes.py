@@ -0,0 +1,75 @@
+"""
+Board-size benchmark: generation, solving and uniqueness checks for 4x4 up to 25x25.
+
+Run from the repository root:
+    python -m benchmarks.bench_sizes --runs 5 --sizes 4 9 16
+
+For each size, prints the mean time to build a full board, to generate a puzzle (with its
+uniqueness checks), to solve that puzzle from scratch and to confirm it has one solution.
+"""
+import argparse
+import json
+import statistics
+import time
+
+from src.search_budget import SearchBudget
+from src.sudoku_generator import SudokuGenerator
+from src.sudoku_solver import SudokuSolver
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench_size(size, runs, difficulty, timeout):
+    generator = SudokuGenerator(size=size)
+    solver = SudokuSolver()
+    fill, generate, solve, unique, empty = [], [], [], [], []
+    for _ in range(runs):
+        fill.append(timed(generator.generate_full_board)[1])
+        (puzzle, _), seconds = timed(generator.generate_puzzle, difficulty, timeout=timeout)
+        generate.append(seconds)
+        empty.append(sum(row.count(0) for row in puzzle))
+        solve.append(timed(solver.solve, [row[:] for row in puzzle], SearchBudget(timeout=timeout))[1])
+        count, seconds = timed(solver.count_solutions, puzzle, limit=2, budget=SearchBudget(timeout=timeout))
+        unique.append(seconds)
+        assert count == 1, f"{size}x{size} puzzle has {count} solutions"
+    return {
+        "size": size,
+        "runs": runs,
+        "difficulty": difficulty,
+        "empty_cells": statistics.mean(empty),
+        "fill_seconds": statistics.mean(fill),
+        "generate_seconds": statistics.mean(generate),
+        "generate_max_seconds": max(generate),
+        "solve_seconds": statistics.mean(solve),
+        "uniqueness_seconds": statistics.mean(unique),
+        "timed_out": generator.last_generation.get("timed_out", False),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[4, 9, 16])
+    parser.add_argument("--difficulty", default="medium")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-call time limit in seconds")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        result = bench_size(size, args.runs, args.difficulty, args.timeout)
+        if args.json:
+            print(json.dumps(result))
+            continue
+        print(f"--- {size}x{size} {args.difficulty} ({args.runs} runs, {result['empty_cells']:.0f} empty cells) ---")
+        print(f"full board  {result['fill_seconds']:.4f}s")
+        print(f"generate    {result['generate_seconds']:.4f}s  (max {result['generate_max_seconds']:.4f}s)")
+        print(f"solve       {result['solve_seconds']:.4f}s")
+        print(f"uniqueness  {result['uniqueness_seconds']:.4f}s\n")
+
+
+if __name__ == "__main__":
+    main()
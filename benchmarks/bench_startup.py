@@ -0,0 +1,116 @@
+"""
+Startup benchmark: time from launching the interpreter to a playable first puzzle.
+
+Run from the repository root:
+    python -m benchmarks.bench_startup --runs 5
+
+Every run is a fresh interpreter, so imports and table builds are measured cold. Stages:
+    import        import src.main (Tkinter and every game module)
+    first puzzle  the game's first puzzle from the bundled/banked set, as the UI loads it
+    live puzzle   the same with an empty bank, i.e. generating the first puzzle (the old path)
+    tables        16x16 and 25x25 lookup tables, without and with the on-disk table cache
+    window        Tk window drawn and first puzzle shown (skipped without a display)
+Each line reports the in-process time and the wall time including interpreter startup.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+_STAGES = {
+    "import": """
+import src.main
+""",
+    "first puzzle": """
+from src.ai_controller import AIController
+from src.puzzle_bank import PuzzleBank
+from src.sudoku_generator import SudokuGenerator
+controller = AIController(puzzle_bank=PuzzleBank.load_default())
+controller.get_next_puzzle(SudokuGenerator(), timeout=5.0)
+""",
+    "live puzzle": """
+from src.ai_controller import AIController
+from src.puzzle_bank import PuzzleBank
+from src.sudoku_generator import SudokuGenerator
+controller = AIController(puzzle_bank=PuzzleBank())
+controller.get_next_puzzle(SudokuGenerator(), timeout=5.0)
+""",
+    "tables": """
+from src.constraints import classic_model
+classic_model(16)
+classic_model(25)
+""",
+    "window": """
+import tkinter as tk
+from src.main import GameManager
+from src.profile_store import InMemoryProfileStore
+root = tk.Tk()
+game = GameManager(root, profile_store=InMemoryProfileStore())
+while not any(map(any, game.sudoku_board.get_initial_board())):
+    root.update()
+root.destroy()
+""",
+}
+
+# Wraps a stage so the child reports its own elapsed time on the last line of stdout
+_TIMED = "import time\n_start = time.perf_counter()\n{code}\nprint(time.perf_counter() - _start)\n"
+
+
+def run_stage(code, env=None):
+    """Runs code in a fresh interpreter. Returns (in-process seconds, wall seconds)."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", _TIMED.format(code=code)], capture_output=True,
+                            text=True, env=env, check=True)
+    wall = time.perf_counter() - start
+    return float(result.stdout.split()[-1]), wall
+
+
+def bench_stage(name, runs, env=None):
+    inner, wall = zip(*(run_stage(_STAGES[name], env) for _ in range(runs)))
+    return {"stage": name, "runs": runs, "seconds": statistics.median(inner), "wall_seconds": statistics.median(wall)}
+
+
+def has_display():
+    try:
+        subprocess.run([sys.executable, "-c", "import tkinter; tkinter.Tk().destroy()"],
+                       capture_output=True, check=True)
+        return True
+    except subprocess.CalledProcessError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines")
+    args = parser.parse_args()
+
+    results = [bench_stage("import", args.runs),
+               bench_stage("first puzzle", args.runs),
+               bench_stage("live puzzle", args.runs)]
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # "" turns the table cache off; a fresh directory is filled by the first run and read after
+        results.append(dict(bench_stage("tables", args.runs, dict(os.environ, SUDOKU_CACHE_DIR="")),
+                            stage="tables (no cache)"))
+        run_stage(_STAGES["tables"], dict(os.environ, SUDOKU_CACHE_DIR=cache_dir))
+        results.append(dict(bench_stage("tables", args.runs, dict(os.environ, SUDOKU_CACHE_DIR=cache_dir)),
+                            stage="tables (cached)"))
+    if has_display():
+        results.append(bench_stage("window", args.runs))
+    else:
+        print("No display: skipping the Tk window stage", file=sys.stderr)
+
+    for result in results:
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print(f"{result['stage']:<18} {result['seconds'] * 1000:8.1f} ms  "
+                  f"(wall {result['wall_seconds'] * 1000:.1f} ms, median of {result['runs']})")
+
+
+if __name__ == "__main__":
+    main()
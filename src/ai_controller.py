@@ -1,22 +1,92 @@
 import time
 from src.sudoku_solver import SudokuSolver
+from src.telemetry import get_telemetry
+from src.search_budget import SearchBudget
+from src.solution_cache import get_solution_cache, solve_from_givens
+from src.skill_rating import SkillRatingModel, DIFFICULTY_EMPTY_CELLS
+
+# A hint must never keep the caller waiting longer than this
+HINT_TIMEOUT_SECONDS = 1.0
 
 class AIController:
-    def __init__(self):
+    def __init__(self, profile_store=None, player_id="default", telemetry=None, rating_model=None, puzzle_bank=None,
+                 solution_cache=None):
         self.solver = SudokuSolver()
-        # Initialize user's adaptive score and difficulty level
-        self.user_difficulty_score = 0
+        # Solutions by puzzle, shared process-wide, so repeated hints and solves skip the search
+        self.solution_cache = solution_cache if solution_cache is not None else get_solution_cache()
+        # Structured events and metrics (see telemetry.py); emitting never blocks the caller
+        self.telemetry = telemetry if telemetry is not None else get_telemetry()
+        # Initialize user's skill rating and difficulty level (see skill_rating.py)
+        self.rating_model = rating_model if rating_model is not None else SkillRatingModel()
+        self.rating = self.rating_model.initial_rating
+        self.rating_deviation = self.rating_model.initial_deviation
         self.difficulty_levels = ["easy", "medium", "hard"]
-        self.current_difficulty_index = 0 # Starts at "easy" (index 0)
+        self.current_difficulty_index = self._difficulty_index_for(self.get_target_rating())
+        self.games_played = 0
+
+        # Optional catalog of pre-rated puzzles (see puzzle_bank.py), used before live generation
+        self.puzzle_bank = puzzle_bank
+        self.current_puzzle_id = None # Bank id of the current puzzle, None if it was generated live
+
+        # Optional persistence (see profile_store.py). Without a store, state lives only in memory.
+        self.profile_store = profile_store
+        self.player_id = player_id
+        if self.profile_store is not None:
+            self.load_profile()
 
         # Game session statistics (reset per game)
         self.start_time = 0
         self.hints_used = 0
         self.incorrect_attempts = 0
         self.initial_puzzle_difficulty = "" # Stores the difficulty of the puzzle generated for the current game
+        self.board_size = 9 # Side of the current board
+        self.rules_name = "classic" # Variant rules of the current board; only classic 9x9 games are rated
+
+    def load_profile(self):
+        """
+        Loads the player's adaptive state from the profile store, if one is configured,
+        and merges the puzzles they were already served into the bank's seen set.
+        """
+        if self.profile_store is None:
+            return
+        profile = self.profile_store.load_profile(self.player_id)
+        if profile is None:
+            # New player: start from the defaults, not the state of whoever played before them
+            self.rating = self.rating_model.initial_rating
+            self.rating_deviation = self.rating_model.initial_deviation
+            self.current_difficulty_index = self._difficulty_index_for(self.get_target_rating())
+            self.games_played = 0
+            return
+        if self.puzzle_bank is not None and profile.get("seen_puzzles"):
+            self.puzzle_bank.import_seen(self.player_id, profile["seen_puzzles"])
+        if profile["rating"] is None:
+            # Profile saved before ratings existed: start from the middle of its stored level
+            level_index = min(profile["current_difficulty_index"], len(self.difficulty_levels) - 1)
+            low, high = DIFFICULTY_EMPTY_CELLS[self.difficulty_levels[level_index]]
+            self.rating = self.rating_model.puzzle_rating_for((low + high) / 2) - self.rating_model.target_offset
+            self.rating_deviation = self.rating_model.initial_deviation
+        else:
+            self.rating = profile["rating"]
+            self.rating_deviation = profile["rating_deviation"]
+        self.current_difficulty_index = self._difficulty_index_for(self.get_target_rating())
+        self.games_played = profile["games_played"]
+
+    def save_profile(self):
+        """Queues the player's adaptive state (and seen puzzles) for persistence. Never blocks on disk I/O."""
+        if self.profile_store is None:
+            return
+        self.profile_store.save_profile(self.player_id, {
+            "rating": self.rating,
+            "rating_deviation": self.rating_deviation,
+            "current_difficulty_index": self.current_difficulty_index,
+            "games_played": self.games_played,
+            "seen_puzzles": self.puzzle_bank.export_seen(self.player_id) if self.puzzle_bank is not None else None,
+        })
 
     def start_game_timer(self):
         """Resets and starts the timer and game-specific stats for a new game."""
+        # Pick up state persisted by other sessions or workers for this player
+        self.load_profile()
         self.start_time = time.time()
         self.hints_used = 0
         self.incorrect_attempts = 0
@@ -39,93 +109,210 @@ class AIController:
         """Returns the current target difficulty string."""
         return self.difficulty_levels[self.current_difficulty_index]
 
+    def get_target_rating(self):
+        """Returns the puzzle rating the next puzzle should have, given the player's current rating."""
+        return self.rating + self.rating_model.target_offset
+
+    def _difficulty_index_for(self, rating):
+        return self.difficulty_levels.index(self.rating_model.difficulty_for_rating(rating))
+
     def set_initial_puzzle_difficulty(self, difficulty):
         """Sets the difficulty string of the puzzle that was just generated."""
         self.initial_puzzle_difficulty = difficulty
 
+    def get_next_puzzle(self, generator, timeout=None):
+        """
+        Returns (puzzle_board, solved_board) for the player's next game and records its difficulty.
+        Serves an unseen puzzle near the target rating from the puzzle bank when one is available,
+        otherwise generates one live at the current difficulty level.
+        The bank only holds classic 9x9 puzzles, so other sizes and variants always generate live.
+        """
+        self._use_rules_of(generator)
+        if self.puzzle_bank is not None and self.is_rated_game():
+            entry = self.puzzle_bank.draw_nearest(self.player_id, self.get_target_rating())
+            if entry is not None:
+                self.current_puzzle_id = entry["id"]
+                self.set_initial_puzzle_difficulty(self.rating_model.difficulty_for_rating(entry["rating"]))
+                self.telemetry.increment("puzzles_served", source="bank")
+                self.solution_cache.put(entry["puzzle"], entry["solution"])
+                return entry["puzzle"], entry["solution"]
+
+        difficulty = self.get_current_difficulty()
+        puzzle, solution = generator.generate_puzzle(difficulty, timeout=timeout)
+        self.current_puzzle_id = None
+        shortfall = generator.last_generation.get("shortfall", 0)
+        if shortfall > 0:
+            # Fewer clues could be removed than the level asks for: report it, and label the
+            # puzzle by the cells actually removed (its rating already comes from those)
+            removed = generator.last_generation["removed"]
+            self.telemetry.emit("generation_shortfall", difficulty=difficulty, removed=removed, shortfall=shortfall)
+            if self.is_rated_game():
+                difficulty = self.rating_model.difficulty_for_rating(self.rating_model.puzzle_rating_for(removed))
+        self.set_initial_puzzle_difficulty(difficulty)
+        self.telemetry.increment("puzzles_served", source="generator")
+        if generator.model.is_classic:
+            self.solution_cache.put(puzzle, solution) # The first hint or solve is then a cache hit
+        return puzzle, solution
+
+    def _use_rules_of(self, generator):
+        """The current game is played at generator's size and rules."""
+        self.board_size = generator.size
+        self.rules_name = generator.model.name
+        # Hints must follow the same rules as the puzzle
+        self.solver.set_model(None if generator.model.is_classic else generator.model)
+
+    def game_state(self):
+        """What a saved game needs besides the board to resume (see resume_game): a JSON-friendly dict."""
+        return {
+            "difficulty": self.initial_puzzle_difficulty,
+            "size": self.board_size,
+            "rules": self.rules_name,
+            "puzzle_id": self.current_puzzle_id,
+            "elapsed_seconds": self.get_game_time(),
+            "hints_used": self.hints_used,
+            "incorrect_attempts": self.incorrect_attempts,
+        }
+
+    def resume_game(self, generator, state, initial_board):
+        """
+        Picks up a game saved with game_state(), played at generator's size and rules: restores
+        its difficulty, bank id (if the bank still holds that puzzle), clock, hints and mistakes.
+        """
+        self._use_rules_of(generator)
+        puzzle_id = state.get("puzzle_id")
+        if (puzzle_id is not None and
+                (self.puzzle_bank is None or not 0 <= puzzle_id < len(self.puzzle_bank)
+                 or self.puzzle_bank.get(puzzle_id)["puzzle"] != initial_board)):
+            puzzle_id = None # The bank changed since the save: rate it like a live puzzle
+        self.current_puzzle_id = puzzle_id
+        self.set_initial_puzzle_difficulty(state.get("difficulty") or self.get_current_difficulty())
+        self.start_game_timer()
+        self.start_time = time.time() - state.get("elapsed_seconds", 0.0)
+        self.hints_used = state.get("hints_used", 0)
+        self.incorrect_attempts = state.get("incorrect_attempts", 0)
+
+    def is_rated_game(self):
+        """Ratings are calibrated on classic 9x9 puzzles; other sizes and variants are unrated."""
+        return self.board_size == 9 and self.rules_name == "classic"
+
     def adjust_difficulty(self, game_solved_time_seconds, puzzle_empty_cells):
         """
-        Adjusts the user_difficulty_score and current_difficulty_index based on the player's performance
-        in the completed game. This uses a heuristic scoring system.
+        Updates the player's skill rating from the completed game and picks the next difficulty.
+        A banked puzzle uses (and updates) its stored rating; a live one is rated from its number
+        of empty cells. The game is scored in [0, 1] from time taken, hints used and incorrect
+        attempts (see SkillRatingModel).
+
+        Unrated games (other board sizes, variant rules) are reported but leave the rating
+        and difficulty unchanged.
         """
-        performance_score = 0
-
-        # --- Time Factor: Reward faster completion, penalize slower times ---
-        # Adjusted thresholds to be more sensitive for "easy" games
-        if game_solved_time_seconds < 60:  # Solved very quickly (under 1 minute)
-            performance_score += 5
-        elif game_solved_time_seconds < 180: # Solved decently (under 3 minutes)
-            performance_score += 3
-        elif game_solved_time_seconds < 480: # Still solved (under 8 minutes)
-            performance_score += 1
-        else: # Took a long time
-            performance_score -= 2
-
-        # --- Hint Factor: Penalize using hints ---
-        # Slightly reduced penalty for hints
-        performance_score -= self.hints_used * 1.5
-
-        # --- Incorrect Attempts Factor: Penalize wrong inputs ---
-        # Slightly reduced penalty for incorrect attempts
-        performance_score -= self.incorrect_attempts * 2
-
-        # --- Puzzle Difficulty Bonus: Reward completing harder puzzles ---
-        # Increased bonus to encourage progression
-        if self.initial_puzzle_difficulty == "easy":
-            performance_score += 2
-        elif self.initial_puzzle_difficulty == "medium":
-            performance_score += 4
-        elif self.initial_puzzle_difficulty == "hard":
-            performance_score += 6
-
-        # Accumulate the performance score
-        self.user_difficulty_score += performance_score
-
-        # --- DEBUGGING OUTPUT (Keep these for testing!) ---
-        print(f"\n--- Game Performance Summary ---")
-        print(f"Puzzle Difficulty (Generated): {self.initial_puzzle_difficulty.capitalize()}")
-        print(f"Time Taken: {game_solved_time_seconds:.2f} seconds")
-        print(f"Hints Used: {self.hints_used}")
-        print(f"Incorrect Attempts: {self.incorrect_attempts}")
-        print(f"Performance Score for this game: {performance_score}")
-        print(f"Total User Difficulty Score (Accumulated): {self.user_difficulty_score}")
-        print(f"Current Global Difficulty Level (Before Adjustment): {self.get_current_difficulty()}")
-
-
-        # --- Logic to change global difficulty level ---
-        # Lowered the threshold to increase difficulty faster
-        if self.user_difficulty_score >= 7 and self.current_difficulty_index < len(self.difficulty_levels) - 1:
-            self.current_difficulty_index += 1
-            self.user_difficulty_score = 0 # Reset score for new level
-            print(f"*** Difficulty INCREASED to {self.get_current_difficulty().upper()}! ***")
-        # Slightly adjusted negative threshold to decrease difficulty faster if struggling
-        elif self.user_difficulty_score <= -3 and self.current_difficulty_index > 0:
-            self.current_difficulty_index -= 1
-            self.user_difficulty_score = 0 # Reset score for new level
-            print(f"*** Difficulty DECREASED to {self.get_current_difficulty().upper()}! ***")
-        elif self.user_difficulty_score < 0:
-            # Cap the score at 0 if it goes slightly negative but doesn't warrant a difficulty decrease
-            self.user_difficulty_score = 0
-
-        print(f"New Global Difficulty Level (After Adjustment): {self.get_current_difficulty()}")
-        print(f"----------------------------------\n")
+        if not self.is_rated_game():
+            self.record_revealed_game(game_solved_time_seconds, puzzle_empty_cells, outcome="solved")
+            return
+        if self.current_puzzle_id is not None:
+            entry = self.puzzle_bank.get(self.current_puzzle_id)
+            puzzle_rating, puzzle_deviation = entry["rating"], entry["deviation"]
+        else:
+            puzzle_rating = self.rating_model.puzzle_rating_for(puzzle_empty_cells)
+            puzzle_deviation = self.rating_model.puzzle_deviation
+        score = self.rating_model.game_score(game_solved_time_seconds, puzzle_empty_cells,
+                                             self.hints_used, self.incorrect_attempts)
+        previous_rating = self.rating
+        self.rating, self.rating_deviation, new_puzzle_rating, new_puzzle_deviation = self.rating_model.update(
+            self.rating, self.rating_deviation, puzzle_rating, puzzle_deviation, score)
+        if self.current_puzzle_id is not None:
+            self.puzzle_bank.update_rating(self.current_puzzle_id, new_puzzle_rating, new_puzzle_deviation)
 
+        # --- Pick the level whose puzzles best match the new target rating ---
+        previous_index = self.current_difficulty_index
+        self.current_difficulty_index = self._difficulty_index_for(self.get_target_rating())
+
+        # --- Telemetry (queued; replaces the old per-game debug prints) ---
+        self.telemetry.emit(
+            "game_completed",
+            player_id=self.player_id,
+            outcome="solved",
+            difficulty=self.initial_puzzle_difficulty,
+            empty_cells=puzzle_empty_cells,
+            time_seconds=game_solved_time_seconds,
+            hints_used=self.hints_used,
+            incorrect_attempts=self.incorrect_attempts,
+            puzzle_rating=puzzle_rating,
+            score=score,
+            rating_before=previous_rating,
+            rating=self.rating,
+            rating_deviation=self.rating_deviation,
+        )
+        self.telemetry.observe("game_seconds", game_solved_time_seconds,
+                               difficulty=self.initial_puzzle_difficulty, outcome="solved")
+        if self.current_difficulty_index != previous_index:
+            self.telemetry.emit(
+                "difficulty_changed",
+                player_id=self.player_id,
+                old=self.difficulty_levels[previous_index],
+                new=self.get_current_difficulty(),
+                direction="up" if self.current_difficulty_index > previous_index else "down",
+            )
+
+        # --- Persist the result (write-behind, returns immediately) ---
+        self.games_played += 1
+        if self.profile_store is not None:
+            self.profile_store.record_game(self.player_id, {
+                "finished_at": time.time(),
+                "difficulty": self.initial_puzzle_difficulty,
+                "empty_cells": puzzle_empty_cells,
+                "time_seconds": game_solved_time_seconds,
+                "hints_used": self.hints_used,
+                "incorrect_attempts": self.incorrect_attempts,
+                "puzzle_rating": puzzle_rating,
+                "score": score,
+                "player_rating": self.rating,
+            })
+            self.save_profile()
+
+    def record_revealed_game(self, elapsed_seconds, puzzle_empty_cells, outcome="revealed"):
+        """
+        Reports a game that ended because the player asked for the solution (or an unrated
+        game, with outcome="solved"). Difficulty is unchanged.
+        """
+        self.telemetry.emit(
+            "game_completed",
+            player_id=self.player_id,
+            outcome=outcome,
+            difficulty=self.initial_puzzle_difficulty,
+            board_size=self.board_size,
+            rules=self.rules_name,
+            empty_cells=puzzle_empty_cells,
+            time_seconds=elapsed_seconds,
+            hints_used=self.hints_used,
+            incorrect_attempts=self.incorrect_attempts,
+        )
+        self.telemetry.observe("game_seconds", elapsed_seconds,
+                               difficulty=self.initial_puzzle_difficulty, outcome=outcome)
+        self.save_profile() # Keeps the puzzle marked as seen
 
     def get_hint(self, current_board, initial_board):
         """
         Provides a hint by solving the board and finding the next logical step.
         This is a basic hint system that just finds the first empty cell the solver would fill.
         """
+        hint_start = time.perf_counter()
+        hint = self._find_hint(current_board, initial_board)
+        self.telemetry.observe("hint_seconds", time.perf_counter() - hint_start, found="yes" if hint[0] is not None else "no")
+        return hint
+
+    def _find_hint(self, current_board, initial_board):
         # Create a solvable copy of the board to find the next valid number
         solvable_board = [row[:] for row in current_board]
-        if not self.solver.solve(solvable_board):
+        if not solve_from_givens(self.solver, solvable_board, initial_board,
+                                 SearchBudget(timeout=HINT_TIMEOUT_SECONDS), self.solution_cache):
             # This should ideally not happen if the puzzle generator ensures unique solutions
-            # and the board state is valid up to this point.
+            # and the board state is valid up to this point (or the search ran out of time).
             return None, None, None
 
         # Find the first empty cell that was filled by the solver
-        for r in range(9):
-            for c in range(9):
+        size = len(current_board)
+        for r in range(size):
+            for c in range(size):
                 # An empty cell in the current board that was originally empty (not a fixed number)
                 # and has been filled by the solver in the solved_board_copy
                 if initial_board[r][c] == 0 and current_board[r][c] == 0 and solvable_board[r][c] != 0:
@@ -0,0 +1,264 @@
+import math
+import random
+
+from src.constraints import SUPPORTED_SIZES, classic_model
+from src.search_budget import BUDGET_EXCEEDED, BudgetExceededError
+
+
+class BitsetSolver:
+    """
+    Constraint-propagation solver for n x n boards (4x4 up to 25x25).
+
+    Each empty cell keeps its remaining candidates as a bitmask (bit d set = digit d still
+    possible), so the mask can be wider than 9 bits. After every assignment, the solver
+    propagates naked singles (a cell with one candidate) and hidden singles (a digit with
+    one place in a unit). It then branches on the empty cell with the fewest candidates
+    (minimum remaining values). Branches copy the flat state instead of undoing moves.
+
+    The units and peers come from a ConstraintModel (see constraints.py), so variant rules
+    (diagonals, jigsaw regions, anti-knight, killer cages) solve through the same loops.
+    Without a model, each board gets the classic rules for its size.
+
+    Same interface as SudokuSolver: solve() fills the board in place, count_solutions()
+    takes a limit and a SearchBudget, and both return BUDGET_EXCEEDED when the budget runs out.
+    """
+
+    def __init__(self, model=None):
+        self.model = model
+
+    def _model_for(self, size):
+        if self.model is None:
+            return classic_model(size)
+        if self.model.size != size:
+            raise ValueError(f"Board is {size}x{size} but the rules are for {self.model.size}x{self.model.size}")
+        return self.model
+
+    def solve(self, board_state, budget=None):
+        """Fills board_state in place. Returns True, False (no solution) or BUDGET_EXCEEDED."""
+        solutions = []
+        try:
+            found = self._run(board_state, 1, budget, False, solutions)
+        except BudgetExceededError:
+            return BUDGET_EXCEEDED
+        if not found:
+            return False
+        size = len(board_state)
+        values = solutions[0]
+        for r in range(size):
+            board_state[r][:] = values[r * size:(r + 1) * size]
+        return True
+
+    def count_solutions(self, board_state, limit=None, budget=None):
+        """Counts solutions (stopping at `limit`). Returns the count or BUDGET_EXCEEDED."""
+        try:
+            return self._run(board_state, math.inf if limit is None else limit, budget, False, None)
+        except BudgetExceededError:
+            return BUDGET_EXCEEDED
+
+    def random_solution(self, size, budget=None):
+        """
+        Returns a random full n x n board, None if the model's rules have no solution,
+        or BUDGET_EXCEEDED if the budget runs out.
+        """
+        empty = [[0] * size for _ in range(size)]
+        solutions = []
+        try:
+            self._run(empty, 1, budget, True, solutions)
+        except BudgetExceededError:
+            return BUDGET_EXCEEDED
+        if not solutions:
+            return None
+        values = solutions[0]
+        return [values[r * size:(r + 1) * size] for r in range(size)]
+
+    def split(self, board_state, parts):
+        """
+        Splits the search into at least `parts` independent subproblems (fewer if the tree is
+        smaller), by expanding the MRV branch cell level by level as _search would. Returns
+        flat value lists in the order the sequential search visits them; complete boards are
+        already solutions. Every solution of the board is a solution of exactly one of them,
+        and [] means there is no solution.
+        """
+        state = self._initial_state(board_state)
+        if state is None:
+            return []
+        layout = state[0]
+        frontier = [state[1:]]
+        while len(frontier) < parts:
+            expanded = []
+            for values, candidates in frontier:
+                best = self._branch_cell(layout, values, candidates)
+                if best == -1:
+                    expanded.append((values, candidates))
+                else:
+                    expanded.extend(self._branches(layout, values, candidates, best, False))
+            if len(expanded) == len(frontier):
+                break # Only complete boards are left (or one branch each): nothing more to split
+            frontier = expanded
+        return [values for values, _ in frontier]
+
+    def _initial_state(self, board_state):
+        """(layout, values, candidates) with the givens propagated, or None if they contradict."""
+        layout = self._model_for(len(board_state))
+        values = [v for row in board_state for v in row]
+        candidates = [0] * layout.cells
+        pending = []
+
+        # Initial candidates; givens that clash with each other mean there's no solution
+        for cell in range(layout.cells):
+            digit = values[cell]
+            peers = layout.peers[cell]
+            if digit:
+                for peer in peers:
+                    if values[peer] == digit:
+                        return None
+                continue
+            mask = layout.all_digits
+            for peer in peers:
+                mask &= ~(1 << values[peer])
+            if not mask:
+                return None
+            candidates[cell] = mask
+            if not mask & (mask - 1):
+                pending.append(cell)
+
+        # Rule-specific pruning (e.g. cage sums) for what the givens already fix
+        for cell in range(layout.cells):
+            for rule in layout.cell_rules[cell]:
+                if not rule.propagate(layout, values, candidates, cell, pending):
+                    return None
+
+        if not self._propagate(layout, values, candidates, pending):
+            return None
+        return layout, values, candidates
+
+    def _run(self, board_state, limit, budget, randomize, solutions):
+        state = self._initial_state(board_state)
+        if state is None:
+            return 0
+        return self._search(*state, limit, budget, randomize, solutions)
+
+    def _branch_cell(self, layout, values, candidates):
+        """Minimum remaining values: the empty cell with the fewest candidates, -1 if none is empty."""
+        best = -1
+        best_count = layout.size + 1
+        for cell in range(layout.cells):
+            if not values[cell]:
+                count = candidates[cell].bit_count()
+                if count < best_count:
+                    best, best_count = cell, count
+                    if count == 2:
+                        break # Can't do better after propagation removed the singles
+        return best
+
+    def _branches(self, layout, values, candidates, cell, randomize):
+        """Yields the propagated (values, candidates) of each digit of cell that doesn't contradict."""
+        mask = candidates[cell]
+        digits = [d for d in range(1, layout.size + 1) if mask >> d & 1]
+        if randomize:
+            random.shuffle(digits)
+        for digit in digits:
+            branch_values = values[:]
+            branch_candidates = candidates[:]
+            pending = []
+            if (self._assign(layout, branch_values, branch_candidates, cell, digit, pending)
+                    and self._propagate(layout, branch_values, branch_candidates, pending)):
+                yield branch_values, branch_candidates
+
+    def _search(self, layout, values, candidates, limit, budget, randomize, solutions):
+        if budget is not None:
+            budget.charge()
+
+        best = self._branch_cell(layout, values, candidates)
+        if best == -1:
+            if solutions is not None:
+                solutions.append(values)
+            return 1
+
+        total = 0
+        for branch_values, branch_candidates in self._branches(layout, values, candidates, best, randomize):
+            total += self._search(layout, branch_values, branch_candidates, limit - total,
+                                  budget, randomize, solutions)
+            if total >= limit:
+                break
+        return total
+
+    def _assign(self, layout, values, candidates, cell, digit, pending):
+        """Places digit and removes it from the peers. Returns False on a contradiction."""
+        values[cell] = digit
+        candidates[cell] = 0
+        bit = 1 << digit
+        for peer in layout.peers[cell]:
+            mask = candidates[peer]
+            if mask & bit:
+                mask &= ~bit
+                candidates[peer] = mask
+                if not mask:
+                    return False
+                if not mask & (mask - 1):
+                    pending.append(peer)
+            elif values[peer] == digit:
+                return False
+        for rule in layout.cell_rules[cell]:
+            if not rule.propagate(layout, values, candidates, cell, pending):
+                return False
+        return True
+
+    def _propagate(self, layout, values, candidates, pending):
+        """Applies naked and hidden singles until neither makes progress. False on contradiction."""
+        all_digits = layout.all_digits
+        while True:
+            while pending:
+                cell = pending.pop()
+                if values[cell]:
+                    continue
+                mask = candidates[cell]
+                if not mask:
+                    return False
+                if mask & (mask - 1):
+                    continue
+                if not self._assign(layout, values, candidates, cell, mask.bit_length() - 1, pending):
+                    return False
+
+            # Hidden singles: digits that fit exactly one cell of a unit
+            for unit in layout.units:
+                once = twice = placed = 0
+                for cell in unit:
+                    digit = values[cell]
+                    if digit:
+                        placed |= 1 << digit
+                    else:
+                        mask = candidates[cell]
+                        twice |= once & mask
+                        once |= mask
+                if (once | placed) != all_digits:
+                    return False # Some digit has nowhere left to go in this unit
+                singles = once & ~twice & ~placed
+                if not singles:
+                    continue
+                for cell in unit:
+                    if values[cell]:
+                        continue
+                    hit = candidates[cell] & singles
+                    if hit:
+                        if hit & (hit - 1):
+                            return False # Two digits both need this one cell
+                        if not self._assign(layout, values, candidates, cell, hit.bit_length() - 1, pending):
+                            return False
+            if not pending:
+                return True
+
+
+if __name__ == '__main__':
+    import time
+
+    solver = BitsetSolver()
+    for size in SUPPORTED_SIZES:
+        start = time.perf_counter()
+        board = solver.random_solution(size)
+        print(f"{size}x{size} random full board in {time.perf_counter() - start:.4f}s")
+
+    puzzle = [[int(c) for c in "800000000003600000070090200050007000000045700000100030001000068008500010090000400"[r * 9:(r + 1) * 9]]
+              for r in range(9)]
+    start = time.perf_counter()
+    print(f"Hard 9x9: {solver.count_solutions(puzzle)} solution(s) in {time.perf_counter() - start:.4f}s")
@@ -0,0 +1,185 @@
+"""
+Bulk puzzle tools: solve, rate or validate puzzles from stdin (or a file) to stdout.
+
+Run from the repository root:
+    python -m src.cli solve < puzzles.txt > solutions.txt
+    python -m src.cli rate --input corpus.txt.gz --workers 8 --chunksize 500
+    python -m src.cli validate --input puzzle.sdk
+
+Input is one puzzle per line (81 characters, '0' or '.' for empty; SDM files are the same)
+or a single SDK puzzle. Output has one line per input puzzle, in input order:
+    solve     the 81-character solution, or "<puzzle>\t<status>" if there is none
+    rate      "<puzzle>\t<rating>\t<hardest technique>\t<clues>" for a unique puzzle,
+              else "<puzzle>\t<status>"
+    validate  "<puzzle>\t<status>"
+where status is one of unique, multiple, unsolvable, conflict, timeout or malformed.
+
+Puzzles are read lazily, sent to a process pool in batches of --chunksize, and written as
+batches finish (in order), so memory stays flat on corpora of any size.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+from src.bitset_solver import BitsetSolver
+from src.constraints import PEERS
+from src.puzzle_grader import grade_puzzle
+from src.puzzle_io import (PuzzleFormatError, batched, guess_format, open_puzzle_file,
+                           parse_puzzle, read_puzzles)
+from src.search_budget import BUDGET_EXCEEDED, SearchBudget
+from src.skill_rating import SkillRatingModel
+from src.sudoku_board import board_to_string, string_to_board
+
+COMMANDS = ("solve", "rate", "validate")
+# Batches in flight per worker: enough to keep workers busy, few enough to bound memory
+_BATCHES_PER_WORKER = 4
+
+_solver = None
+_rating_model = None
+
+
+def _engines():
+    """Per-process solver and rating model, created on first use inside each worker."""
+    global _solver, _rating_model
+    if _solver is None:
+        _solver = BitsetSolver()
+        _rating_model = SkillRatingModel()
+    return _solver, _rating_model
+
+
+def solve_one(text, timeout=None):
+    try:
+        puzzle = parse_puzzle(text)
+    except PuzzleFormatError:
+        return f"{text}\tmalformed"
+    solver, _ = _engines()
+    board = string_to_board(puzzle)
+    result = solver.solve(board, SearchBudget(timeout=timeout) if timeout else None)
+    if result is BUDGET_EXCEEDED:
+        return f"{puzzle}\ttimeout"
+    if not result:
+        return f"{puzzle}\t{'conflict' if _has_conflict(puzzle) else 'unsolvable'}"
+    return board_to_string(board)
+
+
+def rate_one(text, timeout=None):
+    try:
+        puzzle = parse_puzzle(text)
+    except PuzzleFormatError:
+        return f"{text}\tmalformed"
+    # Only puzzles with exactly one solution have a meaningful rating
+    status = _uniqueness(puzzle, timeout)
+    if status != "unique":
+        return f"{puzzle}\t{status}"
+    _, rating_model = _engines()
+    grade = grade_puzzle(string_to_board(puzzle), rating_model)
+    return f"{puzzle}\t{grade['rating']:.0f}\t{grade['hardest'] or '-'}\t{grade['clues']}"
+
+
+def validate_one(text, timeout=None):
+    try:
+        puzzle = parse_puzzle(text)
+    except PuzzleFormatError:
+        return f"{text}\tmalformed"
+    return f"{puzzle}\t{_uniqueness(puzzle, timeout)}"
+
+
+def _uniqueness(puzzle, timeout):
+    """conflict, unsolvable, unique, multiple or timeout for a parsed puzzle string."""
+    if _has_conflict(puzzle):
+        return "conflict"
+    solver, _ = _engines()
+    count = solver.count_solutions(string_to_board(puzzle), limit=2,
+                                   budget=SearchBudget(timeout=timeout) if timeout else None)
+    if count is BUDGET_EXCEEDED:
+        return "timeout"
+    return ("unsolvable", "unique", "multiple")[count]
+
+
+def _has_conflict(puzzle):
+    return any(digit != "0" and any(puzzle[peer] == digit for peer in PEERS[cell])
+               for cell, digit in enumerate(puzzle))
+
+
+_HANDLERS = {"solve": solve_one, "rate": rate_one, "validate": validate_one}
+
+
+def _run_batch(task):
+    command, timeout, batch = task
+    handler = _HANDLERS[command]
+    return [handler(text, timeout) for text in batch]
+
+
+def _bounded(iterable, slots):
+    """Yields from iterable only while a slot is free, so the pool can't read ahead without limit."""
+    for item in iterable:
+        slots.acquire()
+        yield item
+
+
+def process(command, puzzles, workers=1, chunksize=256, timeout=None):
+    """
+    Runs `command` over an iterable of puzzle strings and yields one output line per puzzle,
+    in input order. With workers > 1, batches of `chunksize` puzzles go to a process pool.
+    """
+    tasks = ((command, timeout, batch) for batch in batched(puzzles, chunksize))
+    if workers <= 1:
+        for task in tasks:
+            yield from _run_batch(task)
+        return
+
+    slots = threading.BoundedSemaphore(workers * _BATCHES_PER_WORKER)
+    with multiprocessing.Pool(workers) as pool:
+        # imap keeps input order; the semaphore stops its feeder thread from reading the whole input
+        for results in pool.imap(_run_batch, _bounded(tasks, slots)):
+            slots.release()
+            yield from results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=COMMANDS)
+    parser.add_argument("--input", help="Puzzle file (.gz is decompressed); default stdin")
+    parser.add_argument("--output", help="Output file (.gz is compressed); default stdout")
+    parser.add_argument("--format", choices=("line", "sdm", "sdk"),
+                        help="Input format; default from the file name, else one puzzle per line")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--chunksize", type=int, default=256, help="Puzzles per batch sent to a worker")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Seconds per puzzle (0 for no limit)")
+    parser.add_argument("--quiet", action="store_true", help="Don't print the summary to stderr")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or (guess_format(args.input) if args.input else "line")
+    source = open_puzzle_file(args.input) if args.input else sys.stdin
+    sink = open_puzzle_file(args.output, "w") if args.output else sys.stdout
+    start = time.perf_counter()
+    count = 0
+    try:
+        puzzles = read_puzzles(source, fmt, on_error="keep")
+        for line in process(args.command, puzzles, args.workers, args.chunksize, args.timeout or None):
+            sink.write(line)
+            sink.write("\n")
+            count += 1
+        sink.flush()
+    except BrokenPipeError:
+        # The reader went away (e.g. piped into `head`): stop quietly like other shell tools
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    finally:
+        if args.input:
+            source.close()
+        if args.output:
+            sink.close()
+    if not args.quiet:
+        elapsed = time.perf_counter() - start
+        print(f"{args.command}: {count} puzzles in {elapsed:.2f}s "
+              f"({count / elapsed if elapsed else 0:.0f}/s, {args.workers} workers)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
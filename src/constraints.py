@@ -0,0 +1,493 @@
+import marshal
+import math
+import os
+import random
+import sys
+
+# Supported box sizes: 2 (4x4), 3 (9x9), 4 (16x16), 5 (25x25)
+SUPPORTED_SIZES = (4, 9, 16, 25)
+
+# Opt-in cache for the large classic models' tables: off unless SUDOKU_CACHE_DIR names a directory
+TABLE_CACHE_DIR = os.environ.get("SUDOKU_CACHE_DIR", "")
+# Only these sizes are slow enough to build that caching them pays off; 4x4 and 9x9 are always built in memory
+TABLE_CACHE_SIZES = (16, 25)
+# Bumped whenever the tables' layout changes, so stale cache files are ignored
+TABLE_CACHE_VERSION = 1
+
+# Knight moves, for the anti-knight rule
+_KNIGHT_STEPS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+
+
+def box_size_for(size):
+    """Returns the box side for an n x n board (e.g. 3 for 9x9). Raises ValueError for other sizes."""
+    box = math.isqrt(size)
+    if box * box != size or size not in SUPPORTED_SIZES:
+        raise ValueError(f"Unsupported board size {size}; expected one of {SUPPORTED_SIZES}")
+    return box
+
+
+class Rule:
+    """
+    A constraint plugin for ConstraintModel. Every hook has a no-op default, so a rule only
+    overrides what it adds. Cells are flat indices (row * size + col).
+
+    regions(size)    - n regions that replace the boxes (jigsaw), or None to keep the boxes
+    units(size)      - extra units that must hold every digit once (e.g. diagonals)
+    groups(size)     - extra cell groups whose digits must differ but need not cover 1..n (cages)
+    peer_pairs(size) - extra pairs of cells that may not hold the same digit (anti-knight)
+    cells(size)      - cells with a constraint beyond "differs from its peers" (cage sums);
+                       check() and propagate() are only called for these cells
+    """
+    name = "rule"
+
+    def regions(self, size):
+        return None
+
+    def units(self, size):
+        return ()
+
+    def groups(self, size):
+        return ()
+
+    def peer_pairs(self, size):
+        return ()
+
+    def cells(self, size):
+        return ()
+
+    def check(self, model, board_state, row, col, num):
+        """Whether placing num at (row, col) of a 2D board keeps this rule satisfiable."""
+        return True
+
+    def propagate(self, model, values, candidates, cell, pending):
+        """
+        Bitset-solver hook, called after `cell` is assigned: narrows candidate masks in the
+        flat `values`/`candidates` state and appends cells left with one candidate to
+        `pending`. Returns False on a contradiction.
+        """
+        return True
+
+
+class DiagonalRule(Rule):
+    """X-Sudoku: both main diagonals also hold every digit once."""
+    name = "diagonal"
+
+    def units(self, size):
+        return ([r * size + r for r in range(size)],
+                [r * size + size - 1 - r for r in range(size)])
+
+
+class AntiKnightRule(Rule):
+    """Cells a chess knight's move apart may not hold the same digit."""
+    name = "anti_knight"
+
+    def peer_pairs(self, size):
+        pairs = []
+        for r in range(size):
+            for c in range(size):
+                for dr, dc in _KNIGHT_STEPS:
+                    rr, cc = r + dr, c + dc
+                    if 0 <= rr < size and 0 <= cc < size and (r, c) < (rr, cc):
+                        pairs.append((r * size + c, rr * size + cc))
+        return pairs
+
+
+class JigsawRule(Rule):
+    """
+    Irregular regions instead of boxes. `layout` is either a string with one region label
+    per cell, row by row (whitespace ignored), or a list of n regions of (row, col) cells.
+    """
+    name = "jigsaw"
+
+    def __init__(self, layout):
+        if isinstance(layout, str):
+            labels = "".join(layout.split())
+            size = math.isqrt(len(labels))
+            regions = {}
+            for cell, label in enumerate(labels):
+                regions.setdefault(label, []).append(cell)
+            self.size = size
+            self._regions = [sorted(cells) for cells in regions.values()]
+        else:
+            self.size = len(layout)
+            self._regions = [sorted(r * self.size + c for r, c in region) for region in layout]
+        if (len(self._regions) != self.size or any(len(region) != self.size for region in self._regions)
+                or sorted(cell for region in self._regions for cell in region) != list(range(self.size ** 2))):
+            raise ValueError(f"A jigsaw layout needs {self.size} regions of {self.size} cells covering the board")
+
+    def regions(self, size):
+        if size != self.size:
+            raise ValueError(f"Jigsaw layout is for {self.size}x{self.size} boards, not {size}x{size}")
+        return self._regions
+
+    def layout_string(self):
+        """The layout as one region label per cell (the string form accepted by the constructor)."""
+        labels = [""] * self.size ** 2
+        for index, region in enumerate(self._regions):
+            for cell in region:
+                labels[cell] = "0123456789abcdefghijklmnop"[index]
+        return "".join(labels)
+
+    @classmethod
+    def random(cls, size=9, swaps=200, rng=random):
+        """
+        Builds irregular regions by starting from the boxes and repeatedly swapping two
+        neighbouring cells of different regions, as long as both regions stay connected.
+        Most layouts made this way have solutions; the generator reports the ones that don't.
+        """
+        box = box_size_for(size)
+        region_of = [(r // box) * box + c // box for r in range(size) for c in range(size)]
+        for _ in range(swaps):
+            a = rng.randrange(size * size)
+            neighbours = [b for b in _orthogonal(a, size) if region_of[b] != region_of[a]]
+            if not neighbours:
+                continue
+            b = rng.choice(neighbours)
+            # Each region gives up one cell and takes the other's: region sizes are unchanged
+            a_region, b_region = region_of[a], region_of[b]
+            region_of[a], region_of[b] = b_region, a_region
+            if not (_connected(region_of, a_region, size) and _connected(region_of, b_region, size)):
+                region_of[a], region_of[b] = a_region, b_region
+        return cls("".join("0123456789abcdefghijklmnop"[region] for region in region_of))
+
+
+class KillerRule(Rule):
+    """
+    Killer cages: each cage is (total, cells) with cells as (row, col). Digits in a cage
+    differ and add up to the total. Cages need not cover the whole board.
+    """
+    name = "killer"
+
+    def __init__(self, cages, size=9):
+        self.size = size
+        self.cages = [(total, tuple(r * size + c for r, c in cells)) for total, cells in cages]
+        self._cage_of = {}
+        for index, (_, cells) in enumerate(self.cages):
+            for cell in cells:
+                if cell in self._cage_of:
+                    raise ValueError(f"Cell {divmod(cell, size)} is in more than one cage")
+                self._cage_of[cell] = index
+
+    def groups(self, size):
+        self._check_size(size)
+        return [cells for _, cells in self.cages]
+
+    def cells(self, size):
+        self._check_size(size)
+        return list(self._cage_of)
+
+    def _check_size(self, size):
+        if size != self.size:
+            raise ValueError(f"Cages are for {self.size}x{self.size} boards, not {size}x{size}")
+
+    def check(self, model, board_state, row, col, num):
+        size = self.size
+        target = row * size + col
+        total, cells = self.cages[self._cage_of[target]]
+        placed, empty = num, 0
+        for cell in cells:
+            if cell != target:
+                value = board_state[cell // size][cell % size]
+                if value:
+                    placed += value
+                else:
+                    empty += 1
+        remaining = total - placed
+        # The empty cells need distinct digits: at least 1+..+k and at most size+..+(size-k+1)
+        return empty * (empty + 1) // 2 <= remaining <= empty * size - empty * (empty - 1) // 2
+
+    def propagate(self, model, values, candidates, cell, pending):
+        total, cells = self.cages[self._cage_of[cell]]
+        remaining = total
+        empty_cells = []
+        for other in cells:
+            value = values[other]
+            if value:
+                remaining -= value
+            else:
+                empty_cells.append(other)
+        k = len(empty_cells)
+        if not k:
+            return remaining == 0
+        # Bounds on any one empty cell, given the other k-1 take the smallest/largest digits
+        low = max(1, remaining - ((k - 1) * self.size - (k - 1) * (k - 2) // 2))
+        high = min(self.size, remaining - (k - 1) * k // 2)
+        if low > high:
+            return False
+        allowed = ((1 << (high + 1)) - 1) & ~((1 << low) - 1)
+        for other in empty_cells:
+            mask = candidates[other]
+            if mask & ~allowed:
+                mask &= allowed
+                candidates[other] = mask
+                if not mask:
+                    return False
+                if not mask & (mask - 1):
+                    pending.append(other)
+        return True
+
+    @classmethod
+    def from_solution(cls, solution, max_cage_size=4, rng=random):
+        """
+        Partitions the board into random connected cages of up to max_cage_size cells with
+        no repeated digit, and takes each cage's total from the solution.
+        """
+        size = len(solution)
+        values = [v for row in solution for v in row]
+        cage_of = [-1] * (size * size)
+        cages = []
+        order = list(range(size * size))
+        rng.shuffle(order)
+        for start in order:
+            if cage_of[start] != -1:
+                continue
+            cage = [start]
+            digits = {values[start]}
+            cage_of[start] = len(cages)
+            target_size = rng.randint(2, max_cage_size) if max_cage_size > 1 else 1
+            while len(cage) < target_size:
+                frontier = [n for c in cage for n in _orthogonal(c, size)
+                            if cage_of[n] == -1 and values[n] not in digits]
+                if not frontier:
+                    break
+                cell = rng.choice(frontier)
+                cage.append(cell)
+                digits.add(values[cell])
+                cage_of[cell] = len(cages)
+            cages.append((sum(values[c] for c in cage), [divmod(c, size) for c in cage]))
+        return cls(cages, size)
+
+
+class ConstraintModel:
+    """
+    The rules of one kind of board as precomputed lookup tables.
+
+    Rows, columns and boxes (or jigsaw regions) are units: every digit appears once in each.
+    Plugins add units (diagonals), all-different groups (cages), pairwise peers (anti-knight)
+    and per-cell checks (cage sums). Everything is flattened once, here, into per-cell
+    tuples, so validating a move is one pass over that cell's peers, and the bitset solver
+    propagates over the same tables for classic and variant boards alike.
+    """
+
+    def __init__(self, size=9, rules=()):
+        self.size = size
+        self.box_size = box_size_for(size)
+        self.rules = tuple(rules)
+        self.cells = size * size
+        self.all_digits = ((1 << size) - 1) << 1 # Bits 1..size
+        self.is_classic = not self.rules
+        self.name = "+".join(rule.name for rule in self.rules) or "classic"
+
+        rows = [[r * size + c for c in range(size)] for r in range(size)]
+        cols = [[r * size + c for r in range(size)] for c in range(size)]
+        regions = None
+        for rule in self.rules:
+            replacement = rule.regions(size)
+            if replacement is not None:
+                if regions is not None:
+                    raise ValueError("Only one rule may replace the boxes")
+                regions = replacement
+        if regions is None:
+            box = self.box_size
+            regions = [[(br + r) * size + bc + c for r in range(box) for c in range(box)]
+                       for br in range(0, size, box) for bc in range(0, size, box)]
+        self.regions = tuple(tuple(region) for region in regions)
+        self.region_of = [0] * self.cells
+        for index, region in enumerate(self.regions):
+            for cell in region:
+                self.region_of[cell] = index
+        self.region_of = tuple(self.region_of)
+
+        units = rows + cols + [list(region) for region in self.regions]
+        groups = []
+        for rule in self.rules:
+            units.extend(rule.units(size))
+            groups.extend(rule.groups(size))
+        self.units = tuple(tuple(unit) for unit in units) # Complete units: hold each digit exactly once
+        self.row_of = tuple(cell // size for cell in range(self.cells))
+        self.col_of = tuple(cell % size for cell in range(self.cells))
+        # The complete units through each cell: row, column and box/region first, then rule units
+        self.cell_units = tuple(tuple(unit for unit in self.units if cell in unit) for cell in range(self.cells))
+
+        peers = [set() for _ in range(self.cells)]
+        for group in units + groups:
+            for cell in group:
+                peers[cell].update(group)
+        for rule in self.rules:
+            for a, b in rule.peer_pairs(size):
+                peers[a].add(b)
+                peers[b].add(a)
+        self.peers = tuple(tuple(sorted(p - {cell})) for cell, p in enumerate(peers))
+        self.peer_coords = tuple(tuple(divmod(peer, size) for peer in p) for p in self.peers)
+
+        cell_rules = [[] for _ in range(self.cells)]
+        for rule in self.rules:
+            for cell in rule.cells(size):
+                cell_rules[cell].append(rule)
+        self.cell_rules = tuple(tuple(r) for r in cell_rules)
+
+    # Tables that only depend on the size for classic models, in the order they are cached
+    _TABLES = ("regions", "region_of", "units", "row_of", "col_of", "cell_units", "peers", "peer_coords")
+
+    @classmethod
+    def _from_tables(cls, size, tables):
+        """A classic model from cached tables, skipping the build in __init__."""
+        model = cls.__new__(cls)
+        model.size = size
+        model.box_size = box_size_for(size)
+        model.rules = ()
+        model.cells = size * size
+        model.all_digits = ((1 << size) - 1) << 1
+        model.is_classic = True
+        model.name = "classic"
+        for name, table in zip(cls._TABLES, tables):
+            setattr(model, name, table)
+        model.cell_rules = ((),) * model.cells
+        return model
+
+    def is_valid(self, board_state, row, col, num):
+        """Checks if placing 'num' at (row, col) is valid on the given 2D board_state."""
+        if num == 0:
+            return True
+        cell = row * self.size + col
+        for r, c in self.peer_coords[cell]:
+            if board_state[r][c] == num:
+                return False
+        for rule in self.cell_rules[cell]:
+            if not rule.check(self, board_state, row, col, num):
+                return False
+        return True
+
+    def conflicts(self, board_state, row, col):
+        """Returns the (row, col) peers that hold the same digit as (row, col)."""
+        num = board_state[row][col]
+        if num == 0:
+            return []
+        return [(r, c) for r, c in self.peer_coords[row * self.size + col] if board_state[r][c] == num]
+
+    def is_solved(self, board_state):
+        """Full, and every digit is valid where it stands."""
+        for r, row in enumerate(board_state):
+            for c, num in enumerate(row):
+                if num == 0 or not self.is_valid(board_state, r, c, num):
+                    return False
+        return True
+
+
+_CLASSIC_MODELS = {}
+
+
+def classic_model(size=9):
+    """
+    The shared row/column/box model for an n x n board, built once per size.
+    With SUDOKU_CACHE_DIR set, 16x16 and 25x25 tables are loaded from that directory when
+    present (7 ms instead of 45 ms for 25x25); every other size is always built in memory.
+    """
+    model = _CLASSIC_MODELS.get(size)
+    if model is None:
+        tables = _load_tables(size) if size in TABLE_CACHE_SIZES else None
+        if tables is not None:
+            model = ConstraintModel._from_tables(size, tables)
+        else:
+            model = ConstraintModel(size)
+            if size in TABLE_CACHE_SIZES:
+                _save_tables(model)
+        _CLASSIC_MODELS[size] = model
+    return model
+
+
+def _table_cache_path(size):
+    # marshal's format is specific to the Python version, so it is part of the name
+    return os.path.join(TABLE_CACHE_DIR, f"classic{size}-v{TABLE_CACHE_VERSION}-m{marshal.version}-"
+                                         f"py{sys.version_info[0]}{sys.version_info[1]}.marshal")
+
+
+def _load_tables(size):
+    if not TABLE_CACHE_DIR:
+        return None
+    try:
+        with open(_table_cache_path(size), "rb") as f:
+            # Only trust a file that no other user could have written
+            info = os.fstat(f.fileno())
+            if info.st_mode & 0o022 or (hasattr(os, "getuid") and info.st_uid != os.getuid()):
+                return None
+            tables = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None # Missing or unreadable: rebuild
+    if not isinstance(tables, tuple) or len(tables) != len(ConstraintModel._TABLES) or len(tables[1]) != size * size:
+        return None
+    return tables
+
+
+def _save_tables(model):
+    """Best effort: a read-only or missing cache directory just means the tables are rebuilt next time."""
+    if not TABLE_CACHE_DIR:
+        return
+    import tempfile # Only needed on the first run, so kept off the import path
+    try:
+        os.makedirs(TABLE_CACHE_DIR, exist_ok=True)
+        # Write to a temporary file and rename it, so a concurrent reader never sees half a file
+        fd, temp_path = tempfile.mkstemp(dir=TABLE_CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            marshal.dump(tuple(getattr(model, name) for name in ConstraintModel._TABLES), f)
+        os.replace(temp_path, _table_cache_path(model.size))
+    except OSError:
+        pass
+
+
+# Classic 9x9 tables, built in memory once at import (never cached on disk) and shared by the
+# board, solvers, grader and UIs.
+# Cells are flat indices 0..80 (row * 9 + col); units are ordered rows, columns, boxes.
+CLASSIC = classic_model(9)
+UNITS = CLASSIC.units           # 27 units of 9 cells
+PEERS = CLASSIC.peers           # 81 tuples of the 20 cells sharing a row, column or box
+CELL_UNITS = CLASSIC.cell_units # 81 tuples of 3 units: (row, column, box)
+ROW_OF = CLASSIC.row_of         # cell -> row
+COL_OF = CLASSIC.col_of         # cell -> column
+BOX_OF = CLASSIC.region_of      # cell -> box (0..8, left to right, top to bottom)
+BOXES = CLASSIC.regions         # 9 boxes of 9 cells
+
+
+def _orthogonal(cell, size):
+    r, c = divmod(cell, size)
+    if r > 0:
+        yield cell - size
+    if r < size - 1:
+        yield cell + size
+    if c > 0:
+        yield cell - 1
+    if c < size - 1:
+        yield cell + 1
+
+
+def _connected(region_of, region, size):
+    cells = [cell for cell, owner in enumerate(region_of) if owner == region]
+    seen = {cells[0]}
+    stack = [cells[0]]
+    while stack:
+        for neighbour in _orthogonal(stack.pop(), size):
+            if neighbour not in seen and region_of[neighbour] == region:
+                seen.add(neighbour)
+                stack.append(neighbour)
+    return len(seen) == len(cells)
+
+
+if __name__ == '__main__':
+    import time
+    from src.bitset_solver import BitsetSolver
+
+    for rules in ((), (DiagonalRule(),), (AntiKnightRule(),), (JigsawRule.random(),),
+                  (DiagonalRule(), AntiKnightRule())):
+        model = ConstraintModel(9, rules)
+        start = time.perf_counter()
+        board = BitsetSolver(model).random_solution(9)
+        print(f"{model.name}: random full board in {time.perf_counter() - start:.4f}s, "
+              f"valid: {model.is_solved(board)}")
+
+    killer = KillerRule.from_solution(board)
+    model = ConstraintModel(9, (killer,))
+    empty = [[0] * 9 for _ in range(9)]
+    start = time.perf_counter()
+    count = BitsetSolver(model).count_solutions(empty, limit=2)
+    print(f"killer: {len(killer.cages)} cages, {count} solution(s) (capped at 2) "
+          f"in {time.perf_counter() - start:.4f}s")
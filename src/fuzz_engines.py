@@ -0,0 +1,249 @@
+"""
+Differential fuzzing of the solver engines against the reference backtracking solver.
+
+Run from the repository root:
+    python -m src.fuzz_engines --boards 100000 --workers 8 --seed 1
+    python -m src.fuzz_engines --boards 20000 --size 4 --json
+
+Each board is random and reproducible from (seed, index): a valid puzzle with a random
+number of clues (often several solutions), a puzzle with one clue changed (usually
+unsolvable, often conflicting), or random digits dropped on an empty grid. Every engine
+solves it, counts its solutions (capped) and checks uniqueness, and the answers are
+cross-checked:
+    solve-verdict     engines disagree on whether there is a solution
+    solve-invalid     a returned solution breaks a rule or changes a clue
+    solve-modified    a failed solve left the board changed
+    count             capped solution counts differ
+    unique            uniqueness verdicts (count with limit 2) differ
+    count-vs-solve    an engine's count disagrees with its own solve verdict
+    unique-solution   engines found different solutions to a unique puzzle
+A comparison is skipped when any engine runs out of its node budget on it. Failing boards
+are shrunk (clues removed while the failure persists) and printed as reproducers:
+    <check>\t<81-character board>\t<each engine's answer>
+
+Boards are checked in batches on a process pool; a worker only returns its counters and
+failures, so throughput scales with cores.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from src.bitset_solver import BitsetSolver
+from src.constraints import classic_model
+from src.search_budget import BUDGET_EXCEEDED, SearchBudget
+from src.sudoku_solver import SudokuSolver
+
+# Engines under test, by name: classes with the SudokuSolver solve()/count_solutions() interface.
+# The first one is the reference the others are reported against.
+ENGINES = {
+    "backtracking": SudokuSolver,
+    "bitset": BitsetSolver,
+}
+KINDS = ("puzzle", "perturbed", "noise")
+# Solution counts are compared up to this cap
+COUNT_LIMIT = 3
+# Search nodes per engine call; a comparison is skipped when any engine needs more
+DEFAULT_NODE_BUDGET = 5000
+
+_engines = None
+
+
+def _engine_instances():
+    """Per-process engines, created on first use inside each worker."""
+    global _engines
+    if _engines is None:
+        _engines = {name: factory() for name, factory in ENGINES.items()}
+    return _engines
+
+
+def random_board(seed, index, size=9):
+    """
+    The reproducible board for (seed, index), and its kind. Boards use the module-level
+    random generator (as the solvers and generator do), reseeded per board.
+    """
+    random.seed(f"{seed}:{index}")
+    kind = random.choice(KINDS)
+    cells = size * size
+    if kind == "noise":
+        board = [[0] * size for _ in range(size)]
+        for cell in random.sample(range(cells), random.randint(1, cells // 3)):
+            board[cell // size][cell % size] = random.randint(1, size)
+        return board, kind
+
+    board = BitsetSolver().random_solution(size)
+    # Mostly between a quarter and two thirds empty, sometimes nearly empty
+    empty = random.randint(cells // 4, cells * 2 // 3) if random.random() < 0.9 else random.randint(0, cells)
+    for cell in random.sample(range(cells), empty):
+        board[cell // size][cell % size] = 0
+    if kind == "perturbed":
+        clues = [cell for cell in range(cells) if board[cell // size][cell % size]]
+        if clues:
+            r, c = divmod(random.choice(clues), size)
+            board[r][c] = random.choice([d for d in range(1, size + 1) if d != board[r][c]])
+    return board, kind
+
+
+def _answers(engine, board, node_budget):
+    """One engine's (solve verdict, solved board, capped count, uniqueness count) for a board."""
+    solved = [row[:] for row in board]
+    verdict = engine.solve(solved, SearchBudget(max_nodes=node_budget))
+    count = engine.count_solutions(board, limit=COUNT_LIMIT, budget=SearchBudget(max_nodes=node_budget))
+    unique = engine.count_solutions(board, limit=2, budget=SearchBudget(max_nodes=node_budget))
+    return verdict, solved, count, unique
+
+
+def check_board(board, engines, node_budget=DEFAULT_NODE_BUDGET):
+    """
+    Cross-checks every engine on one board. Returns (failures, skipped): failures is a list
+    of (check, detail) pairs; skipped is True if any comparison was skipped for budget.
+    """
+    size = len(board)
+    model = classic_model(size)
+    answers = {name: _answers(engine, board, node_budget) for name, engine in engines.items()}
+    failures = []
+    skipped = False
+
+    def detail(index):
+        return {name: repr(a[index]) for name, a in answers.items()}
+
+    verdicts = [a[0] for a in answers.values()]
+    if any(v is BUDGET_EXCEEDED for v in verdicts):
+        skipped = True
+    else:
+        if len({bool(v) for v in verdicts}) > 1:
+            failures.append(("solve-verdict", detail(0)))
+        for name, (verdict, solved, _, _) in answers.items():
+            if verdict and (not model.is_solved(solved) or any(
+                    board[r][c] and solved[r][c] != board[r][c] for r in range(size) for c in range(size))):
+                failures.append(("solve-invalid", {name: "".join(map(str, sum(solved, [])))}))
+            if not verdict and solved != board:
+                failures.append(("solve-modified", {name: "".join(map(str, sum(solved, [])))}))
+
+    for index, check in ((2, "count"), (3, "unique")):
+        values = [a[index] for a in answers.values()]
+        if any(v is BUDGET_EXCEEDED for v in values):
+            skipped = True
+        elif len({v == 1 for v in values} if check == "unique" else set(values)) > 1:
+            failures.append((check, detail(index)))
+
+    for name, (verdict, solved, count, unique) in answers.items():
+        if verdict is BUDGET_EXCEEDED or count is BUDGET_EXCEEDED:
+            continue
+        if bool(verdict) != (count > 0) or (unique is not BUDGET_EXCEEDED and unique != min(count, 2)):
+            failures.append(("count-vs-solve", {name: f"solve={verdict!r} count={count!r} unique={unique!r}"}))
+
+    solutions = [a[1] for a in answers.values() if a[0] and a[3] == 1]
+    if len(solutions) == len(answers) and any(s != solutions[0] for s in solutions):
+        failures.append(("unique-solution", detail(1)))
+    return failures, skipped
+
+
+def shrink(board, check, engines, node_budget=DEFAULT_NODE_BUDGET):
+    """
+    Removes clues one at a time while `check` still fails, until no single clue can go.
+    The result is a minimal board (for that check) that still reproduces the failure.
+    """
+    size = len(board)
+    board = [row[:] for row in board]
+
+    def still_fails(candidate):
+        failures, _ = check_board(candidate, engines, node_budget)
+        return any(name == check for name, _ in failures)
+
+    changed = True
+    while changed:
+        changed = False
+        for cell in range(size * size):
+            r, c = divmod(cell, size)
+            if not board[r][c]:
+                continue
+            digit = board[r][c]
+            board[r][c] = 0
+            if still_fails(board):
+                changed = True
+            else:
+                board[r][c] = digit
+    return board
+
+
+def fuzz_batch(task):
+    """Checks boards start..start+count-1 of a seed. Returns counters and shrunk failures."""
+    seed, start, count, size, node_budget = task
+    engines = _engine_instances()
+    result = {"checked": 0, "skipped": 0, "kinds": dict.fromkeys(KINDS, 0), "failures": []}
+    for index in range(start, start + count):
+        board, kind = random_board(seed, index, size)
+        failures, skipped = check_board(board, engines, node_budget)
+        result["checked"] += 1
+        result["skipped"] += skipped
+        result["kinds"][kind] += 1
+        for check, detail in failures:
+            minimal = shrink(board, check, engines, node_budget)
+            _, answers = next(((name, d) for name, d in check_board(minimal, engines, node_budget)[0]
+                               if name == check), (check, detail))
+            result["failures"].append({
+                "check": check, "seed": seed, "index": index, "kind": kind,
+                "board": "".join(str(v) for row in board for v in row),
+                "minimal": "".join(str(v) for row in minimal for v in row),
+                "answers": answers,
+            })
+    return result
+
+
+def fuzz(boards, workers=1, seed=0, size=9, batch_size=200, node_budget=DEFAULT_NODE_BUDGET):
+    """Fuzzes `boards` boards and yields each batch's result as it finishes (in any order)."""
+    tasks = [(seed, start, min(batch_size, boards - start), size, node_budget)
+             for start in range(0, boards, batch_size)]
+    if workers <= 1:
+        yield from map(fuzz_batch, tasks)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        yield from pool.imap_unordered(fuzz_batch, tasks)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.fuzz_engines", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--boards", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--seed", type=int, default=0, help="Boards are reproducible from (seed, index)")
+    parser.add_argument("--size", type=int, default=9, choices=(4, 9),
+                        help="Board size; larger boards have no backtracking reference")
+    parser.add_argument("--batch-size", type=int, default=200, help="Boards per task sent to a worker")
+    parser.add_argument("--node-budget", type=int, default=DEFAULT_NODE_BUDGET,
+                        help="Search nodes per engine call before a comparison is skipped")
+    parser.add_argument("--json", action="store_true", help="Print failures and the summary as JSON lines")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    totals = {"checked": 0, "skipped": 0, "kinds": dict.fromkeys(KINDS, 0), "failures": 0}
+    for result in fuzz(args.boards, args.workers, args.seed, args.size, args.batch_size, args.node_budget):
+        totals["checked"] += result["checked"]
+        totals["skipped"] += result["skipped"]
+        for kind, count in result["kinds"].items():
+            totals["kinds"][kind] += count
+        for failure in result["failures"]:
+            totals["failures"] += 1
+            if args.json:
+                print(json.dumps(failure), flush=True)
+            else:
+                print(f"{failure['check']}\t{failure['minimal']}\t{failure['answers']}", flush=True)
+
+    elapsed = time.perf_counter() - start
+    totals.update(seconds=elapsed, boards_per_hour=totals["checked"] / elapsed * 3600 if elapsed else 0.0,
+                  engines=list(ENGINES), seed=args.seed, size=args.size)
+    if args.json:
+        print(json.dumps(totals))
+    else:
+        print(f"{totals['checked']} boards ({totals['kinds']}), {totals['skipped']} with skipped comparisons, "
+              f"{totals['failures']} failures in {elapsed:.1f}s "
+              f"({totals['boards_per_hour']:,.0f} boards/hour, {args.workers} workers)", file=sys.stderr)
+    return 1 if totals["failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,15 @@
 import tkinter as tk
 from tkinter import messagebox, font as tkFont
 import time # For timer display
+from src.constraints import box_size_for
+from src.grid_render import CONFLICT, FIXED, HINT, NOTES, SOLVED, USER, GridRenderer
+
+# Board sizes offered in the size menu
+BOARD_SIZES = (4, 9, 16)
+GRID_PIXELS = 450 # Width of the board area; cells shrink as the board grows
+
+# Tk event.state bit set while Control is held
+_CONTROL_MASK = 0x0004
 
 class SudokuGUI:
     def __init__(self, master, game_manager):
@@ -11,6 +20,10 @@ class SudokuGUI:
 
         self.cells = {} # Dictionary to store Entry widgets
         self.initial_board_values = {} # To store the fixed numbers from the puzzle
+        self.size = game_manager.sudoku_generator.size
+        # Redraws only the cells whose text or style changed (see grid_render.py)
+        self.renderer = GridRenderer(self.draw_cells)
+        self.locked = False # All cells read-only after the game ended
 
         self.create_widgets()
         self.update_timer_label()
@@ -26,72 +39,144 @@ class SudokuGUI:
         self.timer_label = tk.Label(self.info_frame, text="Time: 00:00", font=("Arial", 12))
         self.timer_label.pack(side=tk.RIGHT, padx=10)
 
+        # Board size menu; changing it starts a new game on the new board
+        self.size_var = tk.StringVar(value=f"{self.size}x{self.size}")
+        self.size_menu = tk.OptionMenu(self.info_frame, self.size_var, *[f"{n}x{n}" for n in BOARD_SIZES],
+                                       command=self.on_size_change)
+        self.size_menu.pack(side=tk.RIGHT, padx=10)
+
+        # Pencil marks: in notes mode, typing a digit in an empty cell toggles that mark
+        self.notes_mode = tk.BooleanVar(value=False)
+        self.notes_check = tk.Checkbutton(self.info_frame, text="Notes", variable=self.notes_mode, font=("Arial", 12))
+        self.notes_check.pack(side=tk.LEFT, padx=10)
+        self.fill_notes_button = tk.Button(self.info_frame, text="Fill notes", command=self.on_fill_notes,
+                                           font=("Arial", 10))
+        self.fill_notes_button.pack(side=tk.LEFT)
+
         # --- Sudoku Grid Frame ---
         self.grid_frame = tk.Frame(self.master, bg="black", bd=5)
         self.grid_frame.pack(pady=10)
 
         self.cell_font = tkFont.Font(family="Arial", size=18, weight="bold")
         self.fixed_font = tkFont.Font(family="Arial", size=18, weight="bold")
+        self.notes_font = tkFont.Font(family="Arial", size=8)
+        # Widget options per cell style, applied with one config() call per changed cell
+        self.style_options = {
+            FIXED: {"fg": "blue", "font": self.fixed_font, "state": "readonly"},
+            USER: {"fg": "black", "font": self.cell_font, "state": "normal"},
+            HINT: {"fg": "purple", "font": self.cell_font, "state": "normal"},
+            CONFLICT: {"fg": "red", "font": self.cell_font, "state": "normal"},
+            SOLVED: {"fg": "green", "font": self.cell_font, "state": "readonly"},
+            NOTES: {"fg": "gray45", "font": self.notes_font, "state": "normal"},
+        }
+        self.build_grid(self.size)
+
+        # --- Button Frame ---
+        self.button_frame = tk.Frame(self.master, pady=10)
+        self.button_frame.pack(side=tk.BOTTOM, fill=tk.X)
+
+        self.new_game_button = tk.Button(self.button_frame, text="New Game", command=self.game_manager.new_game, font=("Arial", 12))
+        self.new_game_button.pack(side=tk.LEFT, padx=10)
+
+        self.hint_button = tk.Button(self.button_frame, text="Hint", command=self.on_hint, font=("Arial", 12))
+        self.hint_button.pack(side=tk.LEFT, padx=10)
+
+        self.solve_button = tk.Button(self.button_frame, text="Solve", command=self.on_solve, font=("Arial", 12))
+        self.solve_button.pack(side=tk.LEFT, padx=10)
+
+        self.undo_button = tk.Button(self.button_frame, text="Undo", command=self.on_undo, font=("Arial", 12))
+        self.undo_button.pack(side=tk.LEFT, padx=10)
 
+        self.redo_button = tk.Button(self.button_frame, text="Redo", command=self.on_redo, font=("Arial", 12))
+        self.redo_button.pack(side=tk.LEFT, padx=10)
+        self.master.bind("<Control-z>", lambda event: self.on_undo())
+        self.master.bind("<Control-y>", lambda event: self.on_redo())
 
-        for r in range(9):
-            for c in range(9):
-                bg_color = "#E0E0E0" if ((r // 3) % 2 == (c // 3) % 2) else "#FFFFFF"
+        self.exit_button = tk.Button(self.button_frame, text="Exit", command=self.master.quit, font=("Arial", 12))
+        self.exit_button.pack(side=tk.RIGHT, padx=10)
+
+    def build_grid(self, size):
+        """(Re)creates the entry cells for a size x size board."""
+        for child in self.grid_frame.winfo_children():
+            child.destroy()
+        self.cells.clear()
+        self.initial_board_values.clear()
+        self.size = size
+        box = box_size_for(size)
+        cell_pixels = GRID_PIXELS // size
+        self.cell_font.configure(size=max(9, cell_pixels * 18 // 50))
+        self.fixed_font.configure(size=max(9, cell_pixels * 18 // 50))
+        self.notes_font.configure(size=max(6, cell_pixels * 8 // 50))
+
+        for r in range(size):
+            for c in range(size):
+                bg_color = "#E0E0E0" if ((r // box) % 2 == (c // box) % 2) else "#FFFFFF"
                 border_width = 1
                 relief_style = "solid"
 
-                cell_frame = tk.Frame(self.grid_frame, width=50, height=50, bg=bg_color,
+                cell_frame = tk.Frame(self.grid_frame, width=cell_pixels, height=cell_pixels, bg=bg_color,
                                        borderwidth=border_width, relief=relief_style)
                 cell_frame.grid(row=r, column=c, padx=0, pady=0, sticky="nsew")
                 cell_frame.grid_propagate(False) # Prevent cell from resizing based on content
 
-                entry = tk.Entry(cell_frame, width=2, font=self.cell_font, justify='center',
+                entry = tk.Entry(cell_frame, width=len(str(size)) + 1, font=self.cell_font, justify='center',
                                  bg=bg_color, bd=0, insertbackground=bg_color,
                                  highlightthickness=0) # No border for entry itself
                 entry.pack(expand=True, fill="both")
+                entry.bind("<KeyPress>", lambda event, r=r, c=c: self.on_key_press(event, r, c))
                 entry.bind("<KeyRelease>", lambda event, r=r, c=c: self.on_key_release(event, r, c))
                 entry.bind("<FocusOut>", lambda event, r=r, c=c: self.on_focus_out(event, r, c))
                 entry.bind("<Button-1>", lambda event, r=r, c=c: self.on_cell_click(event, r, c))
                 self.cells[(r, c)] = entry
 
         # Configure grid to expand equally
-        for i in range(9):
+        for i in range(size):
             self.grid_frame.grid_rowconfigure(i, weight=1)
             self.grid_frame.grid_columnconfigure(i, weight=1)
+        self.renderer.reset(size, self.game_manager.sudoku_board.model if
+                            self.game_manager.sudoku_board.size == size else None)
 
-        # --- Button Frame ---
-        self.button_frame = tk.Frame(self.master, pady=10)
-        self.button_frame.pack(side=tk.BOTTOM, fill=tk.X)
-
-        self.new_game_button = tk.Button(self.button_frame, text="New Game", command=self.game_manager.new_game, font=("Arial", 12))
-        self.new_game_button.pack(side=tk.LEFT, padx=10)
-
-        self.hint_button = tk.Button(self.button_frame, text="Hint", command=self.on_hint, font=("Arial", 12))
-        self.hint_button.pack(side=tk.LEFT, padx=10)
+    def on_size_change(self, choice):
+        size = int(choice.split("x")[0])
+        if size != self.size:
+            self.game_manager.set_board_size(size)
 
-        self.solve_button = tk.Button(self.button_frame, text="Solve", command=self.on_solve, font=("Arial", 12))
-        self.solve_button.pack(side=tk.LEFT, padx=10)
+    def load_board(self, board, initial_board):
+        if len(board) != self.size:
+            self.build_grid(len(board))
+            self.size_var.set(f"{self.size}x{self.size}")
+        elif self.locked:
+            self.renderer.reset(self.size) # Every cell was made read-only: redraw them all
+        self.locked = False
+        self.renderer.model = self.game_manager.sudoku_board.model
+        self.renderer.hinted.clear()
+        self.renderer.revealed = False
+        for r in range(self.size):
+            for c in range(self.size):
+                self.initial_board_values[(r, c)] = initial_board[r][c]
+        # Cells that look the same in the old and new game (e.g. empty in both) are left alone
+        self.renderer.render(board, initial_board, self.game_manager.sudoku_board.notes)
+
+    def draw_cells(self, changes):
+        """Applies the renderer's changes: new text where it differs, then the style's options in one call."""
+        for r, c, text, style in changes:
+            entry = self.cells[(r, c)]
+            if entry.get() != text: # The player may have typed it already; keep their cursor
+                entry.config(state='normal')
+                entry.delete(0, tk.END)
+                entry.insert(0, text)
+            entry.config(**self.style_options[style])
 
-        self.exit_button = tk.Button(self.button_frame, text="Exit", command=self.master.quit, font=("Arial", 12))
-        self.exit_button.pack(side=tk.RIGHT, padx=10)
+    def refresh_cells(self, *cells):
+        """Redraws the given (row, col) cells and any peers whose conflict state or pencil marks changed with them."""
+        board = self.game_manager.sudoku_board
+        self.renderer.render_cells(board.board, board.initial_board, cells, board.notes)
 
-    def load_board(self, board, initial_board):
-        self.initial_board_values.clear()
-        for r in range(9):
-            for c in range(9):
-                entry = self.cells[(r, c)]
-                entry.config(state='normal', fg='black') # Ensure editable and default color
-                entry.delete(0, tk.END) # Clear previous content
-
-                if initial_board[r][c] != 0:
-                    entry.insert(0, str(initial_board[r][c]))
-                    entry.config(state='readonly', fg='blue', font=self.fixed_font) # Fixed numbers in blue
-                    self.initial_board_values[(r, c)] = initial_board[r][c]
-                else:
-                    self.initial_board_values[(r, c)] = 0
-                    if board[r][c] != 0: # If it's a user-entered number from previous state
-                        entry.insert(0, str(board[r][c]))
-                        entry.config(fg='black', font=self.cell_font) # User entered in black
+    def lock_cells(self):
+        """Makes every cell read-only once the game is over."""
+        self.locked = True
+        for entry in self.cells.values():
+            entry.config(state='readonly')
 
     def update_difficulty_label(self, difficulty_str):
         self.difficulty_label.config(text=f"Difficulty: {difficulty_str.capitalize()}")
@@ -104,30 +189,63 @@ class SudokuGUI:
         if not self.game_manager.is_game_over:
             self.master.after(1000, self.update_timer_label)
 
+    def showing_notes(self, r, c):
+        shown = self.renderer.shown(r, c)
+        return shown is not None and shown[1] == NOTES
+
+    def on_key_press(self, event, r, c):
+        """
+        Pencil-mark editing, before the key reaches the entry. In notes mode a digit toggles
+        that mark in an empty cell (single-key digits, so 1-9). In a cell showing marks,
+        Backspace/Delete clears them and a digit replaces them with an entry.
+        Control shortcuts (Ctrl-Z/Ctrl-Y) always pass through to the window's bindings.
+        """
+        if (self.initial_board_values.get((r, c), 0) or self.game_manager.is_game_over
+                or event.state & _CONTROL_MASK):
+            return None
+        digit = int(event.char) if event.char.isdigit() else 0
+        empty = not self.game_manager.sudoku_board.board[r][c]
+        if self.notes_mode.get() and empty and 1 <= digit <= self.size:
+            self.game_manager.toggle_note(r, c, digit)
+            self.refresh_cells((r, c))
+            return "break"
+        if self.showing_notes(r, c):
+            if event.keysym in ("BackSpace", "Delete"):
+                self.game_manager.clear_notes(r, c)
+                self.refresh_cells((r, c))
+                return "break"
+            if digit:
+                self.cells[(r, c)].delete(0, tk.END) # The entry replaces the marks; placing it clears them
+                return None
+            if event.char:
+                return "break" # Other characters would corrupt the marks' text
+        return None
+
     def on_key_release(self, event, r, c):
         entry = self.cells[(r, c)]
         current_value = entry.get().strip()
+        if self.showing_notes(r, c) and entry.get() == self.renderer.shown(r, c)[0]:
+            return # Pencil marks, not an entry (e.g. Tab, or a mark just toggled)
 
-        # Allow empty or single digit 1-9
+        # Allow empty or a number from 1 to the board size
         if not current_value:
             self.game_manager.update_cell(r, c, 0) # Set to 0 if empty
-            entry.config(fg='black') # Reset color if user deletes content
+            self.refresh_cells((r, c))
             return
 
-        if len(current_value) > 1 or not current_value.isdigit() or not (1 <= int(current_value) <= 9):
+        if not current_value.isdigit() or not (1 <= int(current_value) <= self.size):
             entry.delete(0, tk.END) # Clear invalid input
-            entry.insert(0, "")
             self.game_manager.update_cell(r, c, 0)
+            self.refresh_cells((r, c))
             return
 
         num = int(current_value)
         if not self.game_manager.is_valid_user_move(r, c, num):
-            entry.config(fg='red') # Invalid move in red
             self.game_manager.ai_controller.increment_incorrect_attempt()
-        else:
-            entry.config(fg='black') # Valid move in black
 
+        self.renderer.hinted.discard((r, c)) # The player's own entry now
         self.game_manager.update_cell(r, c, num)
+        self.refresh_cells((r, c)) # Red if it clashes; peers it clashed with before are cleared
         self.check_game_completion()
 
     def on_focus_out(self, event, r, c):
@@ -135,11 +253,11 @@ class SudokuGUI:
         entry = self.cells[(r, c)]
         if not entry.get().strip():
             self.game_manager.update_cell(r, c, 0)
-            entry.config(fg='black') # Ensure color is normal if empty
+            self.refresh_cells((r, c))
 
     def on_cell_click(self, event, r, c):
         # If it's a fixed cell, prevent cursor from appearing (visually)
-        if self.initial_board_values[(r, c)] != 0:
+        if self.initial_board_values.get((r, c), 0) != 0: # Empty until the first game loads
             return "break" # Prevents default Tkinter behavior (like showing cursor)
 
     def check_game_completion(self):
@@ -154,30 +272,37 @@ class SudokuGUI:
     def on_hint(self):
         r, c, num = self.game_manager.get_hint()
         if r is not None:
-            entry = self.cells[(r, c)]
-            entry.delete(0, tk.END)
-            entry.insert(0, str(num))
-            entry.config(fg='purple') # Hinted number in purple
+            self.renderer.mark_hinted(r, c) # Hinted number in purple
             self.game_manager.update_cell(r, c, num)
+            self.refresh_cells((r, c))
             self.check_game_completion()
         else:
             messagebox.showinfo("Hint", "No immediate hint available or board is full.")
 
+    def on_fill_notes(self):
+        changed = self.game_manager.fill_notes()
+        if changed:
+            self.refresh_cells(*changed)
+
+    def on_undo(self):
+        self.game_manager.undo_move()
+        return "break" # Keep the key press out of the focused cell
+
+    def on_redo(self):
+        self.game_manager.redo_move()
+        return "break"
+
+    def set_cell_value(self, r, c, num):
+        """Shows one cell's new value (0 for empty) after an undo or redo, without reloading the board."""
+        self.refresh_cells((r, c))
+
     def on_solve(self):
         if messagebox.askyesno("Solve", "Are you sure you want to reveal the solution? This will end the current game."):
-            self.game_manager.solve_board()
-            self.game_manager.game_over(False) # Game over if solved by AI
-            messagebox.showinfo("Sudoku", "Puzzle solved by AI!")
+            if self.game_manager.solve_board(): # On failure the player was told why and keeps playing
+                self.game_manager.game_over(False) # Game over if solved by AI
+                messagebox.showinfo("Sudoku", "Puzzle solved by AI!")
 
     def show_solution(self, solved_board):
-        for r in range(9):
-            for c in range(9):
-                entry = self.cells[(r, c)]
-                entry.config(state='normal') # Enable all to show solution
-                entry.delete(0, tk.END)
-                entry.insert(0, str(solved_board[r][c]))
-                if self.initial_board_values[(r,c)] == 0:
-                    entry.config(fg='green', font=self.cell_font) # AI-filled in green
-                else:
-                    entry.config(fg='blue', font=self.fixed_font) # Fixed numbers remain blue
-                entry.config(state='readonly') # Make all cells read-only after solving
\ No newline at end of file
+        # AI-filled cells turn green and read-only; fixed numbers are unchanged, so they are not redrawn
+        self.renderer.revealed = True
+        self.renderer.render(solved_board, self.game_manager.sudoku_board.initial_board)
\ No newline at end of file
@@ -0,0 +1,200 @@
+"""
+Precomputed corpus of solved 9x9 grids, so generating a puzzle can skip the fill phase.
+
+Build it once from the repository root:
+    python -m src.grid_corpus --grids 100000 --workers 8
+
+File layout: CORPUS_MAGIC, then one 41-byte record per grid: 81 digits as 4-bit nibbles
+(high nibble first, the last low nibble unused). Grids are stored with their first row
+relabelled to 1..9, which makes digit relabellings of one grid a single record, and no
+record appears twice. The file is memory-mapped on first draw, so loading costs nothing
+until a puzzle is generated and only the records drawn are ever read.
+
+draw() applies a random validity-preserving symmetry on top of a random record: band,
+stack, row-in-band and column-in-stack permutations, a transpose and a digit relabelling,
+up to 3!^8 * 2 * 9! (about 1.2e12) variants of every stored grid.
+"""
+import mmap
+import os
+import random
+import sys
+import threading
+import time
+
+from src.bitset_solver import BitsetSolver
+from src.constraints import CLASSIC
+
+DEFAULT_CORPUS_PATH = "solution_grids.bin"
+CORPUS_MAGIC = b"SUDOKU-GRIDS-v1\n"
+RECORD_SIZE = 41  # 81 nibbles, rounded up to whole bytes
+
+
+def pack_grid(values):
+    """81 flat digits -> 41 bytes of nibbles."""
+    padded = list(values) + [0]
+    return bytes(padded[i] << 4 | padded[i + 1] for i in range(0, 82, 2))
+
+
+def unpack_grid(record):
+    """41 bytes of nibbles -> 81 flat digits."""
+    values = []
+    for byte in record:
+        values.append(byte >> 4)
+        values.append(byte & 15)
+    del values[81:]
+    return values
+
+
+def normalize_grid(values):
+    """Relabels digits so the first row reads 1..9: one representative per relabelling."""
+    label = {digit: index + 1 for index, digit in enumerate(values[:9])}
+    return [label[digit] for digit in values]
+
+
+def random_symmetry(values, rng=random):
+    """A random grid equivalent to `values` (flat, 81 digits), as a 9x9 board."""
+    bands = rng.sample(range(3), 3)
+    rows = [band * 3 + r for band in bands for r in rng.sample(range(3), 3)]
+    stacks = rng.sample(range(3), 3)
+    cols = [stack * 3 + c for stack in stacks for c in rng.sample(range(3), 3)]
+    digits = [0] + rng.sample(range(1, 10), 9)
+    board = [[digits[values[row * 9 + col]] for col in cols] for row in rows]
+    if rng.random() < 0.5:
+        board = [list(column) for column in zip(*board)]
+    return board
+
+
+class GridCorpus:
+    """
+    Read-only view of a corpus file. Nothing is opened until the first draw or lookup;
+    then the file is memory-mapped and records are decoded on demand.
+    """
+
+    def __init__(self, path=DEFAULT_CORPUS_PATH):
+        self.path = path
+        self._file = None
+        self._map = None
+        self._count = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load_default(cls, path=DEFAULT_CORPUS_PATH):
+        """The corpus at `path` if it has been built, else None (the generator then fills boards itself)."""
+        return cls(path) if os.path.exists(path) else None
+
+    def _open(self):
+        with self._lock:
+            if self._map is not None:
+                return
+            f = open(self.path, "rb")
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError: # An empty file can't be mapped
+                f.close()
+                raise ValueError(f"{self.path} is not a grid corpus")
+            if data[:len(CORPUS_MAGIC)] != CORPUS_MAGIC:
+                data.close()
+                f.close()
+                raise ValueError(f"{self.path} is not a grid corpus")
+            self._file, self._map = f, data
+            self._count = (len(data) - len(CORPUS_MAGIC)) // RECORD_SIZE
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._file.close()
+                self._map = self._file = None
+
+    def __len__(self):
+        self._open()
+        return self._count
+
+    def grid(self, index):
+        """The stored grid `index` as 81 flat digits."""
+        self._open()
+        if not 0 <= index < self._count:
+            raise IndexError(f"Grid {index} is out of range (corpus has {self._count})")
+        start = len(CORPUS_MAGIC) + index * RECORD_SIZE
+        return unpack_grid(self._map[start:start + RECORD_SIZE])
+
+    def draw(self, rng=random):
+        """A random solved 9x9 board: a random stored grid under a random symmetry."""
+        self._open()
+        if not self._count:
+            raise ValueError(f"{self.path} has no grids")
+        return random_symmetry(self.grid(rng.randrange(self._count)), rng)
+
+
+def build_batch(task):
+    """Generates `count` normalized grids, reproducibly from (seed, batch). Returns packed records."""
+    seed, batch, count = task
+    random.seed(f"{seed}:{batch}") # The bitset solver shuffles with the module-level generator
+    solver = BitsetSolver()
+    return [pack_grid(normalize_grid([v for row in solver.random_solution(9) for v in row]))
+            for _ in range(count)]
+
+
+def build_corpus(path, grids, workers=1, seed=0, batch_size=500):
+    """
+    Writes a corpus of `grids` distinct grids to `path` (atomically, replacing any old file).
+    Batches are generated on a process pool with workers > 1. Returns the number of duplicates
+    generated (and skipped) along the way.
+    """
+    import multiprocessing # Only the build needs it, so kept off the game's import path
+
+    seen = set()
+    duplicates = 0
+    batch = 0
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    try:
+        while len(seen) < grids:
+            missing = grids - len(seen)
+            tasks = [(seed, batch + i, min(batch_size, missing - i * batch_size))
+                     for i in range(-(-missing // batch_size))]
+            batch += len(tasks)
+            results = pool.imap_unordered(build_batch, tasks) if pool is not None else map(build_batch, tasks)
+            for records in results:
+                for record in records:
+                    if record in seen:
+                        duplicates += 1
+                    elif len(seen) < grids:
+                        seen.add(record)
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    # Write to a temporary file and rename it, so a reader never maps half a corpus
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(CORPUS_MAGIC)
+        for record in sorted(seen): # Sorted: the same grids always give the same file
+            f.write(record)
+    os.replace(temp_path, path)
+    return duplicates
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m src.grid_corpus", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--grids", type=int, default=100000, help="Distinct grids to store")
+    parser.add_argument("--output", default=DEFAULT_CORPUS_PATH)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--seed", type=int, default=0, help="The corpus is reproducible from its seed")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    duplicates = build_corpus(args.output, args.grids, args.workers, args.seed)
+    elapsed = time.perf_counter() - start
+    corpus = GridCorpus(args.output)
+    assert all(CLASSIC.is_solved(corpus.draw()) for _ in range(100)), "corpus produced an invalid grid"
+    print(f"{len(corpus)} grids ({os.path.getsize(args.output):,} bytes) in {elapsed:.1f}s, "
+          f"{duplicates} duplicates skipped", file=sys.stderr)
+    corpus.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
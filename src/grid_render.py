@@ -0,0 +1,125 @@
+from src.constraints import classic_model
+
+# Cell styles, from the player's point of view
+FIXED = "fixed"        # A given clue
+USER = "user"          # The player's entry (or an empty cell)
+HINT = "hint"          # Filled in by a hint
+CONFLICT = "conflict"  # Clashes with a peer
+SOLVED = "solved"      # Revealed by "Solve"
+NOTES = "notes"        # An empty cell showing its pencil marks
+STYLES = (FIXED, USER, HINT, CONFLICT, SOLVED, NOTES)
+
+
+class GridRenderer:
+    """
+    Toolkit-independent diffing for a board's cells.
+
+    Remembers the (text, style) each cell currently shows and passes only the cells whose
+    text or style changed to `draw(changes)`, a list of (row, col, text, style) tuples. So
+    redraw cost follows the number of changed cells, not the number of widgets. Each UI
+    maps a style to its widget options once (see SudokuGUI and the Streamlit app).
+
+    render() checks every cell (after a new game or a solve); render_cells() checks only the
+    given cells and their peers, whose conflict style can change with them, in O(20) per cell.
+    Both take the board's pencil marks (SudokuBoard.notes) when there are any: an empty cell
+    with marks is drawn with the NOTES style and its digits as text. A placement only prunes
+    its peers' marks, so render_cells() after a move also redraws exactly the marks it changed.
+    """
+
+    def __init__(self, draw=None):
+        self.draw = draw
+        self.size = 0
+        self.model = None
+        self.hinted = set()    # (row, col) of cells filled by hints
+        self.revealed = False  # After "Solve", every non-given cell shows as solved
+        self._shown = []       # Flat list of the (text, style) currently drawn, None if never drawn
+
+    def reset(self, size, model=None):
+        """Forgets everything drawn, e.g. after the widgets were rebuilt or a new game started."""
+        self.size = size
+        self.model = model if model is not None else classic_model(size)
+        self.hinted.clear()
+        self.revealed = False
+        self._shown = [None] * (size * size)
+
+    def mark_hinted(self, row, col):
+        self.hinted.add((row, col))
+
+    def style_for(self, board, initial_board, row, col):
+        if initial_board[row][col]:
+            return FIXED
+        if not board[row][col]:
+            return USER
+        if self.revealed:
+            return SOLVED
+        if self.model.conflicts(board, row, col):
+            return CONFLICT
+        return HINT if (row, col) in self.hinted else USER
+
+    def notes_text(self, mask):
+        """A cell's pencil marks as text: "147" on 9x9, space-separated on larger boards."""
+        digits = [str(d) for d in range(1, self.size + 1) if mask >> d & 1]
+        return ("" if self.size <= 9 else " ").join(digits)
+
+    def shown(self, row, col):
+        """The (text, style) currently drawn at (row, col), or None if it was never drawn."""
+        return self._shown[row * self.size + col]
+
+    def render(self, board, initial_board, notes=None):
+        """Diffs every cell against what is drawn. Returns (and draws) the changes."""
+        if len(board) != self.size:
+            self.reset(len(board))
+        return self._update(board, initial_board, range(self.size * self.size), notes)
+
+    def render_cells(self, board, initial_board, cells, notes=None):
+        """Diffs only `cells` ((row, col) pairs) and their peers. Returns (and draws) the changes."""
+        if len(board) != self.size:
+            return self.render(board, initial_board, notes)
+        flat = set()
+        for row, col in cells:
+            cell = row * self.size + col
+            flat.add(cell)
+            flat.update(self.model.peers[cell])
+        return self._update(board, initial_board, sorted(flat), notes)
+
+    def cells_by_style(self):
+        """The drawn cells grouped by style, so a UI can apply each style in one batch."""
+        groups = {style: [] for style in STYLES}
+        for cell, shown in enumerate(self._shown):
+            if shown is not None:
+                groups[shown[1]].append(divmod(cell, self.size))
+        return groups
+
+    def _update(self, board, initial_board, cells, notes):
+        changes = []
+        shown = self._shown
+        for cell in cells:
+            row, col = divmod(cell, self.size)
+            value = board[row][col]
+            if not value and notes is not None and notes[cell] and not initial_board[row][col]:
+                state = (self.notes_text(notes[cell]), NOTES)
+            else:
+                state = (str(value) if value else "", self.style_for(board, initial_board, row, col))
+            if shown[cell] != state:
+                shown[cell] = state
+                changes.append((row, col) + state)
+        if changes and self.draw is not None:
+            self.draw(changes)
+        return changes
+
+
+if __name__ == '__main__':
+    from src.sudoku_board import string_to_board
+
+    puzzle = string_to_board("530070000600195000098000060800060003400803001700020006060000280000419005000080079")
+    board = [row[:] for row in puzzle]
+    renderer = GridRenderer()
+    print(f"First render: {len(renderer.render(board, puzzle))} cells drawn")
+    print(f"Unchanged board: {len(renderer.render(board, puzzle))} cells drawn")
+    board[0][2] = 5 # Clashes with the 5 at (0, 0), but a given keeps its style
+    print(f"Conflicting entry: {renderer.render_cells(board, puzzle, [(0, 2)])}")
+    board[0][2] = 4
+    print(f"Fixed: {renderer.render_cells(board, puzzle, [(0, 2)])}")
+    notes = [0] * 81
+    notes[3] = 1 << 2 | 1 << 6 # Pencil marks 2 and 6 at (0, 3)
+    print(f"Notes: {renderer.render_cells(board, puzzle, [(0, 3)], notes)}")
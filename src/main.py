@@ -1,3 +1,7 @@
+import json
+import os
+import threading
+import time
 import tkinter as tk
 from tkinter import messagebox
 from src.sudoku_board import SudokuBoard
@@ -5,45 +9,162 @@ from src.sudoku_generator import SudokuGenerator
 from src.ai_controller import AIController
 from src.sudoku_solver import SudokuSolver # For solving full board
 from src.game_ui import SudokuGUI
+from src.grid_corpus import GridCorpus
+from src.profile_store import SQLiteProfileStore
+from src.puzzle_bank import PuzzleBank
+from src.search_budget import BUDGET_EXCEEDED, SearchBudget
+from src.solution_cache import solve_from_givens
+from src.telemetry import get_telemetry, JsonLinesSink, serve_metrics_from_env
+
+# Upper bounds on how long a single UI action may keep the game busy
+GENERATION_TIMEOUT_SECONDS = 5.0
+SOLVE_TIMEOUT_SECONDS = 2.0
+# Puzzles per difficulty level the background filler adds to the bank each launch
+BANK_REFILL_PER_LEVEL = 5
+# Where an unfinished game is saved on exit and resumed from on the next launch
+DEFAULT_SESSION_PATH = "sudoku_session.bin"
 
 class GameManager:
-    def __init__(self, master):
+    def __init__(self, master, profile_store=None, player_id="default", puzzle_bank=None, session_path=None):
         self.master = master
         self.sudoku_board = SudokuBoard()
-        self.sudoku_generator = SudokuGenerator()
-        self.ai_controller = AIController()
+        # Solution grids precomputed with python -m src.grid_corpus, if built; opened on first use
+        self.grid_corpus = GridCorpus.load_default()
+        self.sudoku_generator = SudokuGenerator(grid_corpus=self.grid_corpus)
+        # Persist adaptive state between launches (SQLite by default)
+        self.profile_store = profile_store if profile_store is not None else SQLiteProfileStore()
+        # Serve pre-rated puzzles from the bank file (or the bundled starter set); generate live otherwise
+        if puzzle_bank is None:
+            puzzle_bank = PuzzleBank.load_default()
+        self.puzzle_bank = puzzle_bank
+        self.ai_controller = AIController(self.profile_store, player_id, puzzle_bank=self.puzzle_bank)
         self.sudoku_solver = SudokuSolver() # For full solutions
+        self.search_stats = None # SearchStats when profiling is on (SUDOKU_PROFILE)
+        self.session_path = session_path # Saved game to resume, if any
 
         self.is_game_over = False         # <--- MOVED THIS LINE UP!
         self.ui = SudokuGUI(master, self)
 
-        self.new_game() # Start a new game automatically
+        # Draw the window first: the first game is loaded once Tk is idle, so it never delays startup
+        self.master.after_idle(self.start)
+
+    def start(self):
+        """Resumes the saved game, or starts a new one (served from the bank when possible)."""
+        if not self.resume_session():
+            self.new_game()
 
     def new_game(self):
         self.is_game_over = False
-        current_difficulty = self.ai_controller.get_current_difficulty()
-        new_puzzle = self.sudoku_generator.generate_puzzle(current_difficulty)
+        generation_start = time.perf_counter()
+        new_puzzle, _ = self.ai_controller.get_next_puzzle(self.sudoku_generator, timeout=GENERATION_TIMEOUT_SECONDS)
+        current_difficulty = self.ai_controller.initial_puzzle_difficulty
+        if self.ai_controller.current_puzzle_id is None:
+            self.ai_controller.telemetry.observe("generation_seconds", time.perf_counter() - generation_start,
+                                                 difficulty=current_difficulty)
+            # Budget outcomes (fill retries, fallbacks, checks over budget, timeouts)
+            self.ai_controller.telemetry.emit("puzzle_generated", difficulty=current_difficulty,
+                                              **self.sudoku_generator.last_generation)
         self.sudoku_board.set_board(new_puzzle) # Sets both board and initial_board
         self.ui.load_board(self.sudoku_board.get_board(), self.sudoku_board.get_initial_board())
         self.ai_controller.start_game_timer()
-        self.ai_controller.set_initial_puzzle_difficulty(current_difficulty)
         self.ui.update_difficulty_label(current_difficulty)
         self.ui.update_timer_label() # Reset timer display
 
+    def set_board_size(self, size):
+        """Switches to size x size boards (4, 9 or 16) and starts a new game."""
+        self._use_generator(size)
+        self.new_game()
+
+    def _use_generator(self, size):
+        """Generates size x size boards from now on, instrumented like the first generator when profiling."""
+        self.sudoku_generator = SudokuGenerator(size=size, grid_corpus=self.grid_corpus)
+        if self.search_stats is not None:
+            from src.profiling import profile_generator
+            profile_generator(self.sudoku_generator, self.search_stats)
+
     def update_cell(self, row, col, num):
         if not self.is_game_over and self.sudoku_board.get_initial_board()[row][col] == 0:
             self.sudoku_board.place_number(row, col, num)
             # Validation handled in UI, but could also be here for console/logic validation
 
+    def toggle_note(self, row, col, digit):
+        """Adds or removes a pencil mark in an empty cell. Returns True if the mark is now set."""
+        if self.is_game_over:
+            return False
+        return self.sudoku_board.toggle_note(row, col, digit)
+
+    def clear_notes(self, row, col):
+        if not self.is_game_over:
+            self.sudoku_board.clear_notes(row, col)
+
+    def fill_notes(self):
+        """Pencils every candidate into every empty cell. Returns the (row, col) cells whose marks changed."""
+        if self.is_game_over:
+            return []
+        return self.sudoku_board.fill_notes()
+
+    def undo_move(self):
+        """Reverts the player's last entry and shows it. Returns False if there was nothing to undo."""
+        if self.is_game_over:
+            return False
+        change = self.sudoku_board.undo()
+        if change is not None:
+            self.ui.set_cell_value(*change)
+        return change is not None
+
+    def redo_move(self):
+        """Re-applies the last undone entry and shows it. Returns False if there was nothing to redo."""
+        if self.is_game_over:
+            return False
+        change = self.sudoku_board.redo()
+        if change is not None:
+            self.ui.set_cell_value(*change)
+        return change is not None
+
+    def save_session(self):
+        """
+        Writes the unfinished game to session_path: one JSON line with the game state around the
+        board (difficulty, size, rules, clock, see AIController.game_state), then the puzzle and
+        move log (SudokuBoard.to_bytes). Removes the file once the game is over.
+        """
+        if self.session_path is None:
+            return
+        if self.is_game_over:
+            if os.path.exists(self.session_path):
+                os.remove(self.session_path)
+            return
+        with open(self.session_path, "wb") as f:
+            f.write(json.dumps(self.ai_controller.game_state()).encode("utf-8") + b"\n")
+            f.write(self.sudoku_board.to_bytes())
+
+    def resume_session(self):
+        """Restores the game saved by save_session(). Returns False if there is none to resume."""
+        if self.session_path is None or not os.path.exists(self.session_path):
+            return False
+        try:
+            with open(self.session_path, "rb") as f:
+                header, _, data = f.read().partition(b"\n")
+            state = json.loads(header)
+            board = SudokuBoard.from_bytes(data)
+        except (OSError, ValueError, IndexError):
+            return False # Unreadable or from another version: start fresh
+        if state.get("rules", "classic") != "classic" or state.get("size", board.size) != board.size:
+            return False # The desktop game only plays classic rules
+        if board.size != self.sudoku_generator.size:
+            self._use_generator(board.size)
+        self.is_game_over = False
+        self.sudoku_board = board
+        self.ui.load_board(board.get_board(), board.get_initial_board())
+        # Rated, hinted and timed as it was when saved, like a game from new_game()
+        self.ai_controller.resume_game(self.sudoku_generator, state, board.get_initial_board())
+        self.ui.update_difficulty_label(self.ai_controller.initial_puzzle_difficulty)
+        self.ui.update_timer_label()
+        return True
+
     def is_valid_user_move(self, row, col, num):
         """Checks if a user's entered number is valid at that position."""
-        current_board_state = self.sudoku_board.get_board()
-        # Temporarily place the number to check its validity
-        original_val = current_board_state[row][col]
-        current_board_state[row][col] = num
-        is_valid = self.sudoku_board.is_valid_move(current_board_state, row, col, num)
-        current_board_state[row][col] = original_val # Put back original value
-        return is_valid
+        # One pass over the cell's precomputed peers on the live board; the cell itself is not a peer
+        return self.sudoku_board.is_valid_move(self.sudoku_board.board, row, col, num)
 
     def get_hint(self):
         if self.is_game_over:
@@ -55,16 +176,25 @@ class GameManager:
         return r, c, num
 
     def solve_board(self):
+        """Reveals the solution. Returns False (after telling the player why) if none was shown."""
         if self.is_game_over:
-            return
+            return False
 
         current_board = self.sudoku_board.get_board()
         solved_board_copy = [row[:] for row in current_board]
-        if self.sudoku_solver.solve(solved_board_copy):
+        # Served from the shared solution cache when the player's entries agree with it
+        result = solve_from_givens(self.sudoku_solver, solved_board_copy, self.sudoku_board.get_initial_board(),
+                                   SearchBudget(timeout=SOLVE_TIMEOUT_SECONDS), self.ai_controller.solution_cache)
+        if result is BUDGET_EXCEEDED:
+            messagebox.showerror("Error", "Solving the current board took too long. Try clearing some of your entries.")
+        elif result:
             self.ui.show_solution(solved_board_copy)
             self.sudoku_board.set_board(solved_board_copy) # Update internal board state
+            return True
         else:
             messagebox.showerror("Error", "Could not find a solution for the current board.")
+        return False
+
     def game_over(self, solved_by_user):
         self.is_game_over = True
         elapsed_time = self.ai_controller.get_game_time()
@@ -72,16 +202,40 @@ class GameManager:
 
         if solved_by_user:
             self.ai_controller.adjust_difficulty(elapsed_time, empty_cells)
-        # else: if user asks for solve, don't adjust difficulty, maybe penalize score slightly
+        else:
+            # If user asks for solve, don't adjust difficulty, only report the outcome
+            self.ai_controller.record_revealed_game(elapsed_time, empty_cells)
 
-        # Disable all entry cells
-        for r in range(9):
-            for c in range(9):
-                self.ui.cells[(r, c)].config(state='readonly') # Make all cells read-only
+        self.ui.lock_cells() # Disable all entry cells
 
 def main():
+    # Game events and metrics go to a JSON lines file instead of stdout
+    telemetry = get_telemetry()
+    telemetry.add_sink(JsonLinesSink("sudoku_telemetry.jsonl"))
+    # Opt-in: SUDOKU_METRICS_PORT=9108 serves the same records as Prometheus text on /metrics
+    serve_metrics_from_env(telemetry)
+
     root = tk.Tk()
-    game = GameManager(root)
+    game = GameManager(root, session_path=DEFAULT_SESSION_PATH)
+    # Top up the puzzle bank in the background so later games don't wait on generation. Queued after
+    # the first game, so the filler doesn't compete with it for the interpreter
+    root.after_idle(lambda: threading.Thread(
+        target=game.puzzle_bank.fill, args=(SudokuGenerator(grid_corpus=game.grid_corpus), BANK_REFILL_PER_LEVEL),
+        kwargs={"timeout": GENERATION_TIMEOUT_SECONDS}, daemon=True).start())
+    if os.environ.get("SUDOKU_PROFILE"):
+        # Opt-in: forward per-call search stats (nodes, backtracks, phase times) to telemetry
+        from src.profiling import SearchStats, profile_generator, profile_solver, telemetry_listener
+        stats = SearchStats()
+        stats.add_listener(telemetry_listener(telemetry))
+        game.search_stats = stats
+        profile_generator(game.sudoku_generator, stats)
+        profile_solver(game.sudoku_solver, stats)
+        profile_solver(game.ai_controller.solver, stats)
     root.mainloop()
+    game.save_session() # Resumed on the next launch if unfinished
+    game.ai_controller.save_profile() # Includes the puzzles served this session
+    game.profile_store.close() # Flush any buffered game results
+    game.puzzle_bank.save()
+    telemetry.close()
 if __name__ == "__main__":
     main()
\ No newline at end of file
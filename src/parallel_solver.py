@@ -0,0 +1,211 @@
+import math
+import multiprocessing
+import os
+
+from src.bitset_solver import BitsetSolver
+from src.search_budget import BUDGET_EXCEEDED, BudgetExceededError, SearchBudget
+
+# Nodes searched in-process before going parallel: most boards are done long before a pool could start
+QUICK_NODES = 1000
+# Subproblems per worker, so a worker that drew a small subtree picks up another
+SUBPROBLEMS_PER_WORKER = 4
+
+# Worker outcomes that aren't an answer
+_EXCEEDED = "exceeded"
+_CANCELLED = "cancelled"
+
+_cancel = None  # In workers: the pool's shared "stop searching" event
+
+
+class _CancellableBudget(SearchBudget):
+    """A worker's budget: also stops (every check_interval nodes) once the pool is told to cancel."""
+
+    def charge(self):
+        super().charge()
+        if self.nodes % self.check_interval == 0 and _cancel.is_set():
+            raise BudgetExceededError()
+
+
+def _init_worker(cancel):
+    global _cancel
+    _cancel = cancel
+
+
+def _search_subproblem(task):
+    """Solves or counts one subproblem. Returns (outcome, solution values or None, nodes)."""
+    values, model, mode, limit, max_nodes, deadline = task
+    if _cancel.is_set():
+        return _CANCELLED, None, 0
+    size = math.isqrt(len(values))
+    board = [values[r * size:(r + 1) * size] for r in range(size)]
+    budget = _CancellableBudget(max_nodes=max_nodes, deadline=deadline)
+    solver = BitsetSolver(model)
+    if mode == "solve":
+        result = solver.solve(board, budget)
+    else:
+        result = solver.count_solutions(board, limit, budget)
+    if result is BUDGET_EXCEEDED:
+        return (_EXCEEDED if budget.exceeded else _CANCELLED), None, budget.nodes
+    solution = [v for row in board for v in row] if mode == "solve" and result else None
+    return result, solution, budget.nodes
+
+
+class ParallelSolver:
+    """
+    Speculative parallel search for the hardest boards, with the SudokuSolver interface.
+
+    A board first gets QUICK_NODES of ordinary search. If that isn't enough, the top levels
+    of the search tree (the MRV branch cells, see BitsetSolver.split) are expanded into
+    independent subproblems, which a process pool searches in the order the sequential
+    search would. solve() keeps the first solution any worker finds and cancels the rest;
+    count_solutions() adds up the subtree counts, cancelling once the limit is reached.
+    Verdicts and counts match the sequential engines. On a board with several solutions,
+    solve() may return a different (valid) one.
+    With a limit, each subproblem counts up to the whole limit, so a count that reaches its
+    limit can cost up to `workers` times the sequential work; full counts and uniqueness
+    checks (limit 2) are where splitting pays off.
+
+    The pool starts on first use and is reused; close() it (or use a `with` block) when done.
+    A budget's deadline is shared by every worker. Nodes are counted per process: each
+    subproblem may use the budget's remaining nodes, and the search is cancelled once the
+    nodes reported back (all added to the budget) reach max_nodes, so it can overshoot by
+    up to one subproblem's allowance per worker.
+    Inside a pool worker (which can't start processes), the search runs sequentially.
+    """
+
+    def __init__(self, model=None, workers=None):
+        """
+        model   - optional ConstraintModel with variant rules (see constraints.py)
+        workers - worker processes; defaults to one per CPU
+        """
+        self.model = model
+        self.workers = workers or os.cpu_count() or 1
+        self.solver = BitsetSolver(model)
+        self._pool = None
+        self._cancel = None
+
+    def set_model(self, model=None):
+        self.model = model
+        self.solver.model = model
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def solve(self, board_state, budget=None):
+        """Fills board_state in place. Returns True, False (no solution) or BUDGET_EXCEEDED."""
+        quick = self._quick(board_state, budget, lambda quick_budget: self.solver.solve(board_state, quick_budget))
+        if quick is not None:
+            return quick
+
+        solution = None
+        unfinished = False
+        for outcome, values in self._run_parallel(board_state, "solve", 1, budget):
+            if values is not None and solution is None:
+                solution = values
+                self._cancel.set() # The first solution wins
+            elif outcome in (_EXCEEDED, _CANCELLED):
+                unfinished = True
+        if solution is not None:
+            size = len(board_state)
+            for r in range(size):
+                board_state[r][:] = solution[r * size:(r + 1) * size]
+            return True
+        return BUDGET_EXCEEDED if unfinished else False
+
+    def count_solutions(self, board_state, limit=None, budget=None):
+        """Counts solutions (stopping at `limit`). Returns the count or BUDGET_EXCEEDED."""
+        limit = math.inf if limit is None else limit
+        quick = self._quick(board_state, budget,
+                            lambda quick_budget: self.solver.count_solutions(board_state, limit, quick_budget))
+        if quick is not None:
+            return quick
+
+        total = 0
+        unfinished = False
+        for outcome, _ in self._run_parallel(board_state, "count", limit, budget):
+            if outcome in (_EXCEEDED, _CANCELLED):
+                unfinished = True
+                continue
+            total += outcome
+            if total >= limit:
+                self._cancel.set() # Subtree counts can only add up: the answer is known
+        if total >= limit:
+            return limit
+        return BUDGET_EXCEEDED if unfinished else total
+
+    def _quick(self, board_state, budget, search):
+        """
+        Runs `search` with at most QUICK_NODES of the budget. Returns its answer, or None
+        when the board needs the parallel search.
+        """
+        if self.workers <= 1 or multiprocessing.current_process().daemon:
+            return search(budget) # Nothing to gain, or no way to start a pool
+        max_nodes = QUICK_NODES
+        if budget is not None and budget.max_nodes is not None:
+            max_nodes = min(max_nodes, budget.max_nodes - budget.nodes)
+        quick_budget = SearchBudget(max_nodes=max_nodes, deadline=budget.deadline if budget is not None else None)
+        result = search(quick_budget)
+        if budget is not None:
+            budget.nodes += quick_budget.nodes
+        if result is not BUDGET_EXCEEDED:
+            return result
+        if budget is not None and (budget.expired() or
+                                   (budget.max_nodes is not None and budget.nodes >= budget.max_nodes)):
+            budget.exceeded = True
+            return BUDGET_EXCEEDED # The caller's budget ran out, not just the quick allowance
+        return None
+
+    def _run_parallel(self, board_state, mode, limit, budget):
+        """Yields (outcome, solution values or None) per subproblem as workers finish them."""
+        subproblems = self.solver.split(board_state, self.workers * SUBPROBLEMS_PER_WORKER)
+        max_nodes = deadline = None
+        if budget is not None:
+            deadline = budget.deadline
+            if budget.max_nodes is not None:
+                max_nodes = budget.max_nodes - budget.nodes
+        tasks = [(values, self.model, mode, limit, max_nodes, deadline) for values in subproblems]
+
+        if self._pool is None:
+            self._cancel = multiprocessing.Event()
+            self._pool = multiprocessing.Pool(self.workers, initializer=_init_worker, initargs=(self._cancel,))
+        self._cancel.clear()
+        try:
+            # Cancelled subproblems return within check_interval nodes, so draining them is quick
+            for outcome, solution, nodes in self._pool.imap_unordered(_search_subproblem, tasks):
+                if budget is not None:
+                    budget.nodes += nodes
+                    if outcome == _EXCEEDED or (budget.max_nodes is not None and budget.nodes >= budget.max_nodes):
+                        budget.exceeded = True
+                if outcome == _EXCEEDED or (budget is not None and budget.exceeded):
+                    self._cancel.set() # Out of budget: only a solution already found can still count
+                yield outcome, solution
+        finally:
+            self._cancel.clear()
+
+
+if __name__ == '__main__':
+    import time
+
+    from src.sudoku_board import string_to_board
+    from src.sudoku_solver import SudokuSolver
+
+    # A hard puzzle with two clues removed: thousands of solutions to count
+    puzzle = string_to_board("800000000003600000070090200050007000000045700000100030001000068008500010090000400")
+    puzzle[0][0] = puzzle[1][2] = 0
+
+    with ParallelSolver() as parallel:
+        for name, solver in (("sequential", BitsetSolver()), (f"parallel ({parallel.workers} workers)", parallel)):
+            start = time.perf_counter()
+            count = solver.count_solutions(puzzle)
+            print(f"{name}: {count} solutions in {time.perf_counter() - start:.3f}s")
+        board = [row[:] for row in puzzle]
+        print(f"Solve: {parallel.solve(board)}, valid: {SudokuSolver().count_solutions(board) == 1}")
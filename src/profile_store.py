@@ -0,0 +1,321 @@
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+
+DEFAULT_DB_PATH = "sudoku_profiles.db"
+
+# Columns of the per-player adaptive state, in storage order. seen_puzzles is the player's
+# PuzzleBank seen bitset (PuzzleBank.export_seen()), so served puzzles aren't served again
+PROFILE_FIELDS = ("rating", "rating_deviation", "current_difficulty_index", "games_played", "seen_puzzles")
+# Columns of a finished game record, in storage order
+GAME_FIELDS = ("finished_at", "difficulty", "empty_cells", "time_seconds", "hints_used",
+               "incorrect_attempts", "puzzle_rating", "score", "player_rating")
+
+
+class ProfileStore:
+    """
+    Interface for persisting a player's adaptive state and game history.
+    Subclasses decide where the data lives; AIController only talks to these methods.
+    """
+
+    def load_profile(self, player_id):
+        """Returns the stored profile dict for player_id, or None if the player is new."""
+        raise NotImplementedError
+
+    def save_profile(self, player_id, profile):
+        """Stores the profile dict (see PROFILE_FIELDS) for player_id."""
+        raise NotImplementedError
+
+    def record_game(self, player_id, game):
+        """Appends one finished game (see GAME_FIELDS) to the player's history."""
+        raise NotImplementedError
+
+    def get_game_history(self, player_id=None, difficulty=None, since=None, limit=None):
+        """
+        Returns finished games as a list of dicts, oldest first.
+        All filters are optional; with no filters every stored game is returned.
+        """
+        raise NotImplementedError
+
+    def flush(self):
+        """Blocks until every pending write has been stored."""
+        pass
+
+    def close(self):
+        """Flushes pending writes and releases any resources."""
+        self.flush()
+
+
+class InMemoryProfileStore(ProfileStore):
+    """Keeps profiles in process memory. Useful for tests and single-session play."""
+
+    def __init__(self):
+        self.profiles = {}
+        self.games = []
+        self._lock = threading.Lock()
+
+    def load_profile(self, player_id):
+        with self._lock:
+            profile = self.profiles.get(player_id)
+            return dict(profile) if profile is not None else None
+
+    def save_profile(self, player_id, profile):
+        with self._lock:
+            self.profiles[player_id] = {field: profile[field] for field in PROFILE_FIELDS}
+
+    def record_game(self, player_id, game):
+        record = {field: game.get(field) for field in GAME_FIELDS}
+        record["player_id"] = player_id
+        with self._lock:
+            self.games.append(record)
+
+    def get_game_history(self, player_id=None, difficulty=None, since=None, limit=None):
+        with self._lock:
+            games = [dict(g) for g in self.games
+                     if (player_id is None or g["player_id"] == player_id)
+                     and (difficulty is None or g["difficulty"] == difficulty)
+                     and (since is None or g["finished_at"] >= since)]
+        if limit is not None:
+            games = games[-limit:]
+        return games
+
+
+class SQLiteProfileStore(ProfileStore):
+    """
+    SQLite-backed profile store with a write-behind buffer.
+
+    save_profile() and record_game() only enqueue the write and return immediately.
+    A background writer thread drains the queue and commits up to batch_size writes
+    per transaction, so finishing a game never waits on the disk. The database runs
+    in WAL mode with synchronous=NORMAL, which lets several server workers share one
+    file without an fsync on every commit.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS profiles (
+            player_id TEXT PRIMARY KEY,
+            rating REAL,
+            rating_deviation REAL,
+            current_difficulty_index INTEGER NOT NULL,
+            games_played INTEGER NOT NULL,
+            seen_puzzles BLOB,
+            updated_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS games (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            player_id TEXT NOT NULL,
+            finished_at REAL NOT NULL,
+            difficulty TEXT,
+            empty_cells INTEGER,
+            time_seconds REAL,
+            hints_used INTEGER,
+            incorrect_attempts INTEGER,
+            puzzle_rating REAL,
+            score REAL,
+            player_rating REAL
+        );
+        CREATE INDEX IF NOT EXISTS games_by_player ON games (player_id, finished_at);
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, batch_size=64, flush_interval=0.5):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db_lock = threading.Lock() # One connection, shared by the writer and readers
+        with self._db_lock:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self._SCHEMA)
+            self._migrate()
+
+        # Latest profile per player that may not have reached the database yet,
+        # so load_profile() sees our own writes before they are committed.
+        self._pending_profiles = {}
+        self._pending_lock = threading.Lock()
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self.last_error = None
+        self._writer = threading.Thread(target=self._writer_loop, name="profile-store-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _migrate(self):
+        """Upgrades databases created before the skill-rating and seen-puzzle columns existed."""
+        profile_columns = {row[1] for row in self._conn.execute("PRAGMA table_info(profiles)")}
+        if "rating" not in profile_columns:
+            # Old profiles had a point score instead of a rating. Ratings start out NULL, and
+            # AIController seeds them from the stored difficulty level on first load.
+            self._conn.execute("ALTER TABLE profiles ADD COLUMN rating REAL")
+            self._conn.execute("ALTER TABLE profiles ADD COLUMN rating_deviation REAL")
+        if "seen_puzzles" not in profile_columns:
+            self._conn.execute("ALTER TABLE profiles ADD COLUMN seen_puzzles BLOB")
+        if "user_difficulty_score" in profile_columns:
+            self._conn.execute("ALTER TABLE profiles DROP COLUMN user_difficulty_score")
+
+        game_columns = {row[1] for row in self._conn.execute("PRAGMA table_info(games)")}
+        for column in ("puzzle_rating", "score", "player_rating"):
+            if column not in game_columns:
+                self._conn.execute(f"ALTER TABLE games ADD COLUMN {column} REAL")
+
+    # --- Public API ---
+
+    def load_profile(self, player_id):
+        with self._pending_lock:
+            pending = self._pending_profiles.get(player_id)
+            if pending is not None:
+                return dict(pending)
+
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT " + ", ".join(PROFILE_FIELDS) + " FROM profiles WHERE player_id = ?", (player_id,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(PROFILE_FIELDS, row))
+
+    def save_profile(self, player_id, profile):
+        values = {field: profile[field] for field in PROFILE_FIELDS}
+        with self._pending_lock:
+            self._pending_profiles[player_id] = values
+        self._enqueue(("profile", player_id, values))
+
+    def record_game(self, player_id, game):
+        self._enqueue(("game", player_id, {field: game.get(field) for field in GAME_FIELDS}))
+
+    def get_game_history(self, player_id=None, difficulty=None, since=None, limit=None):
+        self.flush() # History queries must include games still in the buffer
+
+        clauses, params = [], []
+        if player_id is not None:
+            clauses.append("player_id = ?")
+            params.append(player_id)
+        if difficulty is not None:
+            clauses.append("difficulty = ?")
+            params.append(difficulty)
+        if since is not None:
+            clauses.append("finished_at >= ?")
+            params.append(since)
+
+        sql = "SELECT player_id, " + ", ".join(GAME_FIELDS) + " FROM games"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        if limit is not None:
+            # Take the newest `limit` games; they are put back in order below
+            sql += " ORDER BY id DESC LIMIT ?"
+            params.append(limit)
+        else:
+            sql += " ORDER BY id"
+
+        with self._db_lock:
+            cursor = self._conn.execute(sql, params)
+            columns = [d[0] for d in cursor.description]
+            rows = cursor.fetchall()
+        if limit is not None:
+            rows.reverse()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def flush(self):
+        if not self._closed:
+            self._queue.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._queue.put(None) # Sentinel stops the writer thread
+        self._writer.join()
+        with self._db_lock:
+            self._conn.close()
+        atexit.unregister(self.close)
+
+    # --- Write-behind internals ---
+
+    def _enqueue(self, item):
+        if self._closed:
+            raise RuntimeError("SQLiteProfileStore is closed")
+        self._queue.put(item)
+
+    def _writer_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+
+            # Gather whatever else arrives within flush_interval into the same transaction
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    nxt = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                batch.append(nxt)
+
+            try:
+                self._write_batch(batch)
+            except sqlite3.Error as e:
+                # Keep the writer alive; the failed batch is dropped and reported here
+                self.last_error = e
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                self._queue.task_done()
+                return
+
+    def _write_batch(self, batch):
+        now = time.time()
+        profile_rows = {}
+        game_rows = []
+        for kind, player_id, values in batch:
+            if kind == "profile":
+                # Only the newest profile per player in a batch needs writing
+                profile_rows[player_id] = (player_id,) + tuple(values[f] for f in PROFILE_FIELDS) + (now,)
+            else:
+                game_rows.append((player_id,) + tuple(values[f] for f in GAME_FIELDS))
+
+        with self._db_lock:
+            self._conn.execute("BEGIN")
+            try:
+                if game_rows:
+                    self._conn.executemany(
+                        "INSERT INTO games (player_id, " + ", ".join(GAME_FIELDS) + ") "
+                        "VALUES (" + ", ".join("?" * (len(GAME_FIELDS) + 1)) + ")", game_rows)
+                if profile_rows:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO profiles (player_id, " + ", ".join(PROFILE_FIELDS) + ", updated_at) "
+                        "VALUES (" + ", ".join("?" * (len(PROFILE_FIELDS) + 2)) + ")", list(profile_rows.values()))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        with self._pending_lock:
+            for player_id, row in profile_rows.items():
+                # Drop the pending copy unless a newer save arrived meanwhile
+                pending = self._pending_profiles.get(player_id)
+                if pending is not None and tuple(pending[f] for f in PROFILE_FIELDS) == row[1:-1]:
+                    del self._pending_profiles[player_id]
+
+
+if __name__ == '__main__':
+    store = SQLiteProfileStore(":memory:")
+    store.save_profile("alice", {"rating": 1290.0, "rating_deviation": 240.0,
+                                 "current_difficulty_index": 1, "games_played": 1, "seen_puzzles": b"\x05"})
+    store.record_game("alice", {"finished_at": time.time(), "difficulty": "medium", "empty_cells": 47,
+                                "time_seconds": 152.3, "hints_used": 1, "incorrect_attempts": 0,
+                                "puzzle_rating": 1425.0, "score": 0.62, "player_rating": 1290.0})
+    print(f"Profile (before flush): {store.load_profile('alice')}")
+    print(f"History: {store.get_game_history('alice')}")
+    store.close()
@@ -0,0 +1,236 @@
+import collections
+import time
+
+# Opt-in instrumentation for the solver and generator hot loops.
+#
+# Nothing in sudoku_solver.py or sudoku_generator.py checks whether profiling is on.
+# Instead, profile_solver()/profile_generator() shadow the hot methods with counting
+# wrappers stored on the *instance*. Recursive calls go through `self.<method>`, so
+# they hit the wrappers too. disable_profiling() deletes the wrappers again, and the
+# class methods run untouched, so a disabled profiler costs nothing.
+
+# Instance attributes installed by the profile_* functions (removed by disable_profiling)
+_SOLVER_METHODS = ("solve", "_solve_recursive", "count_solutions", "_count_solutions_recursive", "is_valid")
+_BITSET_METHODS = ("_search", "solve", "count_solutions")
+_GENERATOR_METHODS = ("_fill_board", "generate_full_board", "generate_puzzle")
+
+
+class SearchStats:
+    """
+    Counters and phase timings collected while profiling is enabled.
+
+    counters  - running totals, e.g. "solve.nodes", "count.backtracks", "bitset.nodes", "is_valid.calls"
+    phases    - accumulated seconds per phase: "solve", "fill", "uniqueness", "removal"
+    calls     - one record per top-level call (solve, count_solutions, generate_puzzle)
+                with the counters and phase times that call alone was responsible for
+    listeners - callables invoked with each per-call record as it completes
+    """
+
+    def __init__(self, max_call_records=1000):
+        self.counters = collections.Counter()
+        self.phases = collections.defaultdict(float)
+        self.calls = collections.deque(maxlen=max_call_records)
+        self.listeners = []
+        self._entry_depth = 0 # Entry points called from inside another one are not recorded twice
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def reset(self):
+        self.counters.clear()
+        self.phases.clear()
+        self.calls.clear()
+
+    def as_dict(self):
+        """Returns the running totals as a flat, JSON-friendly dict."""
+        result = dict(self.counters)
+        for phase, seconds in self.phases.items():
+            result[f"{phase}.seconds"] = seconds
+        return result
+
+    def _snapshot(self):
+        return collections.Counter(self.counters), dict(self.phases)
+
+    def _record_call(self, op, seconds, before):
+        counters_before, phases_before = before
+        record = {"op": op, "seconds": seconds}
+        for key, value in self.counters.items():
+            delta = value - counters_before.get(key, 0)
+            if delta:
+                record[key] = delta
+        for phase, total in self.phases.items():
+            delta = total - phases_before.get(phase, 0.0)
+            if delta:
+                record[f"{phase}.seconds"] = delta
+        self.calls.append(record)
+        for listener in self.listeners:
+            listener(record)
+        return record
+
+
+def profile_solver(solver, stats=None):
+    """
+    Enables instrumentation on a SudokuSolver instance and its BitsetSolver (which searches
+    boards larger than 9x9 and variant rules). Returns the SearchStats in use.
+    """
+    if stats is None:
+        stats = SearchStats()
+    counters = stats.counters
+
+    original_is_valid = type(solver).is_valid.__get__(solver)
+    def is_valid(*args):
+        counters["is_valid.calls"] += 1
+        return original_is_valid(*args)
+
+    solver.is_valid = is_valid
+    solver._solve_recursive = _wrap_search(
+        stats, type(solver)._solve_recursive.__get__(solver), "solve", None, failed=lambda r: not r)
+    solver._count_solutions_recursive = _wrap_search(
+        stats, type(solver)._count_solutions_recursive.__get__(solver), "count", None, failed=lambda r: r == 0)
+    solver.solve = _wrap_entry(stats, type(solver).solve.__get__(solver), "solve", "solve")
+    solver.count_solutions = _wrap_entry(stats, type(solver).count_solutions.__get__(solver), "count_solutions", "uniqueness")
+    # Every bitset search node (solving, counting or filling a board); a branch without solutions is a backtrack
+    bitset = solver.bitset_solver
+    bitset._search = _wrap_search(stats, type(bitset)._search.__get__(bitset), "bitset", None, failed=lambda r: r == 0)
+    # The generator's uniqueness checks call the bitset solver directly
+    bitset.solve = _wrap_entry(stats, type(bitset).solve.__get__(bitset), "solve", "solve")
+    bitset.count_solutions = _wrap_entry(stats, type(bitset).count_solutions.__get__(bitset), "count_solutions", "uniqueness")
+    solver.profiling_stats = stats
+    return stats
+
+
+def profile_generator(generator, stats=None):
+    """
+    Enables instrumentation on a SudokuGenerator and its solver.
+    Each generate_puzzle call is split into the fill, removal and uniqueness phases;
+    "fill" is all of generate_full_board (backtracking, the bitset fill or a corpus draw) and
+    "removal" is the time spent in the removal loop outside the uniqueness checks.
+    """
+    stats = profile_solver(generator.solver, stats)
+    counters = stats.counters
+
+    generator._fill_board = _wrap_search(
+        stats, type(generator)._fill_board.__get__(generator), "fill", None, failed=lambda r: not r)
+
+    original_fill = type(generator).generate_full_board.__get__(generator)
+    def generate_full_board(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original_fill(*args, **kwargs)
+        finally:
+            stats.phases["fill"] += time.perf_counter() - start
+
+    generator.generate_full_board = generate_full_board
+
+    original_generate = type(generator).generate_puzzle.__get__(generator)
+    def generate_puzzle(*args, **kwargs):
+        counters["generate_puzzle.calls"] += 1
+        before = stats._snapshot()
+        start = time.perf_counter()
+        try:
+            return original_generate(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            fill = stats.phases["fill"] - before[1].get("fill", 0.0)
+            uniqueness = stats.phases["uniqueness"] - before[1].get("uniqueness", 0.0)
+            stats.phases["removal"] += max(0.0, elapsed - fill - uniqueness)
+            stats._record_call("generate_puzzle", elapsed, before)
+
+    generator.generate_puzzle = generate_puzzle
+    generator.profiling_stats = stats
+    return stats
+
+
+def disable_profiling(engine):
+    """Removes the instrumentation installed by profile_solver()/profile_generator()."""
+    for name in _SOLVER_METHODS + _BITSET_METHODS + _GENERATOR_METHODS + ("profiling_stats",):
+        engine.__dict__.pop(name, None)
+    for attribute in ("solver", "bitset_solver"):
+        inner = getattr(engine, attribute, None)
+        if inner is not None:
+            disable_profiling(inner)
+
+
+def telemetry_listener(telemetry):
+    """Returns a SearchStats listener that forwards per-call stats as telemetry observations."""
+    def listener(record):
+        op = record["op"]
+        telemetry.observe("search_seconds", record["seconds"], op=op)
+        for prefix in ("solve", "count", "fill", "bitset"):
+            nodes = record.get(f"{prefix}.nodes")
+            if nodes:
+                telemetry.observe("search_nodes", nodes, op=op, search=prefix)
+                telemetry.observe("search_backtracks", record.get(f"{prefix}.backtracks", 0), op=op, search=prefix)
+    return listener
+
+
+def _wrap_entry(stats, method, op, phase):
+    """
+    Wraps a public entry point: counts and times each call and emits a per-call record.
+    A call made from inside another entry point (SudokuSolver handing a board to its
+    BitsetSolver) belongs to the outer call and is passed straight through.
+    """
+    counters = stats.counters
+    calls_key = f"{op}.calls"
+
+    def wrapper(*args, **kwargs):
+        if stats._entry_depth:
+            return method(*args, **kwargs)
+        counters[calls_key] += 1
+        before = stats._snapshot()
+        start = time.perf_counter()
+        stats._entry_depth += 1
+        try:
+            return method(*args, **kwargs)
+        finally:
+            stats._entry_depth -= 1
+            elapsed = time.perf_counter() - start
+            stats.phases[phase] += elapsed
+            stats._record_call(op, elapsed, before)
+
+    return wrapper
+
+
+def _wrap_search(stats, method, prefix, phase, failed):
+    """
+    Wraps a recursive search method: every call is one search node, and a call whose
+    result satisfies `failed` is a backtrack. If `phase` is given, the outermost call
+    is timed under it.
+    """
+    counters = stats.counters
+    nodes_key = f"{prefix}.nodes"
+    backtracks_key = f"{prefix}.backtracks"
+    depth = 0
+
+    def wrapper(*args, **kwargs):
+        nonlocal depth
+        counters[nodes_key] += 1
+        outermost = depth == 0
+        if outermost:
+            start = time.perf_counter()
+        depth += 1
+        try:
+            result = method(*args, **kwargs)
+        finally:
+            depth -= 1
+            if outermost and phase is not None:
+                stats.phases[phase] += time.perf_counter() - start
+        if failed(result):
+            counters[backtracks_key] += 1
+        return result
+
+    return wrapper
+
+
+if __name__ == '__main__':
+    from src.sudoku_generator import SudokuGenerator
+
+    generator = SudokuGenerator()
+    stats = profile_generator(generator)
+    generator.generate_puzzle("easy")
+
+    print("Totals:")
+    for key, value in sorted(stats.as_dict().items()):
+        print(f"  {key}: {value}")
+    print("\nLast generate_puzzle call:")
+    print(f"  {[c for c in stats.calls if c['op'] == 'generate_puzzle'][-1]}")
@@ -0,0 +1,265 @@
+import bisect
+import os
+import random
+import threading
+from array import array
+
+from src.puzzle_grader import grade_puzzle, technique_names
+from src.skill_rating import SkillRatingModel
+from src.sudoku_board import board_to_string, string_to_board
+
+DEFAULT_BANK_PATH = "puzzle_bank.txt"
+# Small pre-rated set shipped with the game, so the first game never waits on generation
+STARTER_BANK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "starter_bank.txt")
+
+
+class PuzzleBank:
+    """
+    Catalog of pre-generated puzzles indexed by difficulty rating.
+
+    Puzzles get stable integer ids in insertion order. Their attributes live in compact
+    parallel arrays (rating, deviation, clue count, technique bitmask). A sorted rating
+    index (two parallel lists kept in order with bisect) turns "an unseen puzzle rated
+    1450-1550" into a binary search plus a short scan. Each player's seen puzzles are a
+    bytearray used as a bitset: bit i is set once puzzle i has been served.
+    """
+
+    def __init__(self, rating_model=None):
+        self.rating_model = rating_model if rating_model is not None else SkillRatingModel()
+        self._puzzles = []              # id -> 81-character puzzle string
+        self._solutions = []            # id -> 81-character solution string
+        self._ratings = array("d")      # id -> current rating
+        self._deviations = array("d")   # id -> rating deviation
+        self._clues = array("B")        # id -> number of givens
+        self._techniques = array("H")   # id -> technique bitmask (see puzzle_grader.TECHNIQUE_BITS)
+        self._ids_by_puzzle = {}        # puzzle string -> id, to skip duplicates
+
+        # Sorted index: _index_ratings[k] is the rating of puzzle _index_ids[k]
+        self._index_ratings = []
+        self._index_ids = []
+
+        self._seen = {}                 # player_id -> bytearray bitset of served puzzle ids
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._puzzles)
+
+    # --- Adding and updating puzzles ---
+
+    def add(self, puzzle, solution, grade=None, rating=None, deviation=None):
+        """
+        Adds a puzzle (9x9 board or 81-character string) with its solution and returns its id.
+        The puzzle is graded unless `grade` (from grade_puzzle) or an explicit `rating` is given.
+        Adding a puzzle that is already in the bank returns the existing id.
+        """
+        puzzle_text = puzzle if isinstance(puzzle, str) else board_to_string(puzzle)
+        solution_text = solution if isinstance(solution, str) else board_to_string(solution)
+        with self._lock:
+            existing = self._ids_by_puzzle.get(puzzle_text)
+            if existing is not None:
+                return existing
+
+            if grade is None and rating is None:
+                grade = grade_puzzle(string_to_board(puzzle_text), self.rating_model)
+            if rating is None:
+                rating = grade["rating"]
+            mask = grade["technique_mask"] if grade is not None else 0
+
+            puzzle_id = len(self._puzzles)
+            self._puzzles.append(puzzle_text)
+            self._solutions.append(solution_text)
+            self._ratings.append(rating)
+            self._deviations.append(deviation if deviation is not None else self.rating_model.puzzle_deviation)
+            self._clues.append(81 - puzzle_text.count("0"))
+            self._techniques.append(mask)
+            self._ids_by_puzzle[puzzle_text] = puzzle_id
+            self._index_insert(puzzle_id, rating)
+            return puzzle_id
+
+    def update_rating(self, puzzle_id, rating, deviation=None):
+        """Re-rates a puzzle (e.g. after a game) and moves it in the sorted index."""
+        with self._lock:
+            old_rating = self._ratings[puzzle_id]
+            position = bisect.bisect_left(self._index_ratings, old_rating)
+            while self._index_ids[position] != puzzle_id:
+                position += 1
+            del self._index_ratings[position]
+            del self._index_ids[position]
+
+            self._ratings[puzzle_id] = rating
+            if deviation is not None:
+                self._deviations[puzzle_id] = deviation
+            self._index_insert(puzzle_id, rating)
+
+    def _index_insert(self, puzzle_id, rating):
+        position = bisect.bisect_right(self._index_ratings, rating)
+        self._index_ratings.insert(position, rating)
+        self._index_ids.insert(position, puzzle_id)
+
+    def fill(self, generator, per_level=10, levels=("easy", "medium", "hard"), timeout=None):
+        """Generates `per_level` puzzles for each difficulty string and adds them. Returns the new ids."""
+        added = []
+        for _ in range(per_level):
+            for level in levels:
+                puzzle, solution = generator.generate_puzzle(level, timeout=timeout)
+                added.append(self.add(puzzle, solution))
+        return added
+
+    # --- Queries ---
+
+    def get(self, puzzle_id):
+        """Returns everything known about a puzzle as a dict (boards as 9x9 lists)."""
+        with self._lock:
+            return {
+                "id": puzzle_id,
+                "puzzle": string_to_board(self._puzzles[puzzle_id]),
+                "solution": string_to_board(self._solutions[puzzle_id]),
+                "rating": self._ratings[puzzle_id],
+                "deviation": self._deviations[puzzle_id],
+                "clues": self._clues[puzzle_id],
+                "techniques": technique_names(self._techniques[puzzle_id]),
+            }
+
+    def query(self, min_rating, max_rating, player_id=None, min_clues=None, max_clues=None,
+              techniques=0, limit=None):
+        """
+        Returns ids of puzzles rated within [min_rating, max_rating], lowest rating first.
+        player_id     - skip puzzles this player has already been served
+        min/max_clues - restrict the number of givens
+        techniques    - bitmask; only puzzles whose profile contains all of these techniques
+        """
+        with self._lock:
+            low = bisect.bisect_left(self._index_ratings, min_rating)
+            high = bisect.bisect_right(self._index_ratings, max_rating)
+            return [pid for pid in (self._index_ids[k] for k in range(low, high))
+                    if self._matches(pid, player_id, min_clues, max_clues, techniques)][:limit]
+
+    def draw(self, player_id, min_rating, max_rating, min_clues=None, max_clues=None, techniques=0):
+        """
+        Serves a random unseen puzzle rated within [min_rating, max_rating] and marks it seen.
+        Returns the puzzle dict (see get()) or None if the range has nothing left for this player.
+        """
+        with self._lock:
+            low = bisect.bisect_left(self._index_ratings, min_rating)
+            high = bisect.bisect_right(self._index_ratings, max_rating)
+            if low >= high:
+                return None
+            # Start at a random point in the range so equally rated puzzles rotate
+            start = random.randrange(low, high)
+            for k in range(start - low, start - low + (high - low)):
+                pid = self._index_ids[low + k % (high - low)]
+                if self._matches(pid, player_id, min_clues, max_clues, techniques):
+                    self.mark_seen(player_id, pid)
+                    return self.get(pid)
+            return None
+
+    def draw_nearest(self, player_id, target_rating, width=50.0, max_width=800.0, **filters):
+        """
+        Serves an unseen puzzle as close to target_rating as the bank allows: tries
+        target ± width first, then doubles the window up to max_width.
+        """
+        while True:
+            entry = self.draw(player_id, target_rating - width, target_rating + width, **filters)
+            if entry is not None or width >= max_width:
+                return entry
+            width = min(width * 2, max_width)
+
+    def count(self, min_rating=float("-inf"), max_rating=float("inf")):
+        """Number of puzzles rated within [min_rating, max_rating]."""
+        with self._lock:
+            return (bisect.bisect_right(self._index_ratings, max_rating)
+                    - bisect.bisect_left(self._index_ratings, min_rating))
+
+    def _matches(self, pid, player_id, min_clues, max_clues, techniques):
+        if player_id is not None and self.has_seen(player_id, pid):
+            return False
+        clues = self._clues[pid]
+        if min_clues is not None and clues < min_clues:
+            return False
+        if max_clues is not None and clues > max_clues:
+            return False
+        return self._techniques[pid] & techniques == techniques
+
+    # --- Per-player seen sets ---
+
+    def mark_seen(self, player_id, puzzle_id):
+        with self._lock:
+            seen = self._seen.setdefault(player_id, bytearray())
+            byte = puzzle_id >> 3
+            if byte >= len(seen):
+                seen.extend(bytes(byte + 1 - len(seen)))
+            seen[byte] |= 1 << (puzzle_id & 7)
+
+    def has_seen(self, player_id, puzzle_id):
+        seen = self._seen.get(player_id)
+        byte = puzzle_id >> 3
+        return seen is not None and byte < len(seen) and bool(seen[byte] >> (puzzle_id & 7) & 1)
+
+    def seen_count(self, player_id):
+        return sum(bin(b).count("1") for b in self._seen.get(player_id, b""))
+
+    def export_seen(self, player_id):
+        """Returns the player's seen set as compact bytes (one bit per puzzle id)."""
+        return bytes(self._seen.get(player_id, b""))
+
+    def import_seen(self, player_id, data):
+        """Merges a seen set previously returned by export_seen()."""
+        with self._lock:
+            seen = self._seen.setdefault(player_id, bytearray())
+            if len(data) > len(seen):
+                seen.extend(bytes(len(data) - len(seen)))
+            for i, b in enumerate(data):
+                seen[i] |= b
+
+    # --- Persistence ---
+
+    def save(self, path=DEFAULT_BANK_PATH):
+        """Writes the bank as text: one 'puzzle solution rating deviation technique_mask' line per puzzle."""
+        with self._lock, open(path, "w", encoding="utf-8") as f:
+            f.write("# puzzle solution rating deviation technique_mask\n")
+            for pid, puzzle_text in enumerate(self._puzzles):
+                f.write(f"{puzzle_text} {self._solutions[pid]} {self._ratings[pid]:.1f} "
+                        f"{self._deviations[pid]:.1f} {self._techniques[pid]}\n")
+
+    @classmethod
+    def load(cls, path=DEFAULT_BANK_PATH, rating_model=None):
+        """Reads a bank written by save()."""
+        bank = cls(rating_model)
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                puzzle_text, solution_text, rating, deviation, mask = line.split()
+                bank.add(puzzle_text, solution_text, grade={"technique_mask": int(mask)},
+                         rating=float(rating), deviation=float(deviation))
+        return bank
+
+    @classmethod
+    def load_default(cls, path=DEFAULT_BANK_PATH, rating_model=None):
+        """The player's bank file if there is one, else the bundled starter set, else an empty bank."""
+        for candidate in (path, STARTER_BANK_PATH):
+            if os.path.exists(candidate):
+                return cls.load(candidate, rating_model)
+        return cls(rating_model)
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+    from src.sudoku_generator import SudokuGenerator
+
+    parser = argparse.ArgumentParser(description="Build a puzzle bank file.")
+    parser.add_argument("--per-level", type=int, default=20, help="Puzzles per difficulty level")
+    parser.add_argument("--out", default=DEFAULT_BANK_PATH)
+    parser.add_argument("--timeout", type=float, default=5.0, help="Generation timeout per puzzle")
+    args = parser.parse_args()
+
+    bank = PuzzleBank.load(args.out) if os.path.exists(args.out) else PuzzleBank()
+    start = time.time()
+    bank.fill(SudokuGenerator(), per_level=args.per_level, timeout=args.timeout)
+    bank.save(args.out)
+    print(f"Bank has {len(bank)} puzzles ({time.time() - start:.1f}s to generate).")
+
+    start = time.perf_counter()
+    entry = bank.draw("demo", 1450, 1550)
+    print(f"Draw in [1450, 1550]: {entry and entry['rating']} in {(time.perf_counter() - start) * 1e6:.0f} µs")
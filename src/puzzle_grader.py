@@ -0,0 +1,199 @@
+from src.constraints import BOXES, CLASSIC, COL_OF, PEERS, ROW_OF, UNITS
+from src.skill_rating import SkillRatingModel
+
+# Human solving techniques, from easiest to hardest. "guess" means the logical
+# techniques below ran out and the puzzle needs trial and error (backtracking).
+TECHNIQUES = ("naked_single", "hidden_single", "locked_candidates", "naked_pair", "guess")
+TECHNIQUE_BITS = {name: 1 << i for i, name in enumerate(TECHNIQUES)}
+
+# Rating added on top of the clue-count rating for the hardest technique a puzzle needs
+TECHNIQUE_RATING_BONUS = {
+    "naked_single": 0.0,
+    "hidden_single": 25.0,
+    "locked_candidates": 100.0,
+    "naked_pair": 150.0,
+    "guess": 250.0,
+}
+
+
+def technique_mask(techniques):
+    """Packs an iterable of technique names into a bitmask (see TECHNIQUE_BITS)."""
+    mask = 0
+    for name in techniques:
+        mask |= TECHNIQUE_BITS[name]
+    return mask
+
+
+def technique_names(mask):
+    """Unpacks a technique bitmask into the list of technique names it contains."""
+    return [name for name in TECHNIQUES if mask & TECHNIQUE_BITS[name]]
+
+
+def grade_puzzle(board, rating_model=None):
+    """
+    Solves a 9x9 puzzle the way a person would and reports how hard that was.
+
+    Returns a dict with:
+        clues             - number of given digits
+        empty_cells       - number of empty cells
+        techniques        - {technique: times used}
+        technique_mask    - the techniques as a bitmask (see TECHNIQUE_BITS)
+        hardest           - the hardest technique needed, or None for a full board
+        rating            - clue-count rating plus a bonus for the hardest technique
+        valid             - False if the givens contradict each other
+    """
+    rating_model = rating_model if rating_model is not None else SkillRatingModel()
+    values = [board[r][c] for r in range(9) for c in range(9)]
+    empty_cells = values.count(0)
+    used = {}
+    valid = _solve_logically(values, used)
+    if valid and 0 in values:
+        used["guess"] = 1
+
+    hardest = None
+    for name in TECHNIQUES:
+        if name in used:
+            hardest = name
+    rating = rating_model.puzzle_rating_for(empty_cells)
+    if hardest is not None:
+        rating += TECHNIQUE_RATING_BONUS[hardest]
+
+    return {
+        "clues": 81 - empty_cells,
+        "empty_cells": empty_cells,
+        "techniques": used,
+        "technique_mask": technique_mask(used),
+        "hardest": hardest,
+        "rating": rating,
+        "valid": valid,
+    }
+
+
+def _solve_logically(values, used):
+    """
+    Applies the techniques in order of difficulty until the board is solved or none applies.
+    Fills `values` in place and counts technique uses in `used`. Returns False on a contradiction.
+    """
+    candidates = [0] * 81
+    for cell in range(81):
+        if values[cell]:
+            continue
+        mask = CLASSIC.all_digits
+        for peer in PEERS[cell]:
+            mask &= ~(1 << values[peer])
+        candidates[cell] = mask
+    for cell in range(81):
+        if values[cell]:
+            if any(values[peer] == values[cell] for peer in PEERS[cell]):
+                return False
+
+    def place(cell, digit):
+        values[cell] = digit
+        candidates[cell] = 0
+        bit = 1 << digit
+        for peer in PEERS[cell]:
+            candidates[peer] &= ~bit
+
+    while 0 in values:
+        if any(values[cell] == 0 and candidates[cell] == 0 for cell in range(81)):
+            return False # Some empty cell has no candidates left
+
+        # Naked single: a cell with exactly one candidate
+        progress = False
+        for cell in range(81):
+            mask = candidates[cell]
+            if values[cell] == 0 and mask and mask & (mask - 1) == 0:
+                place(cell, mask.bit_length() - 1)
+                used["naked_single"] = used.get("naked_single", 0) + 1
+                progress = True
+        if progress:
+            continue
+
+        # Hidden single: a digit with exactly one possible cell in a unit
+        for unit in UNITS:
+            for digit in range(1, 10):
+                bit = 1 << digit
+                spots = [cell for cell in unit if candidates[cell] & bit]
+                if len(spots) == 1 and values[spots[0]] == 0:
+                    place(spots[0], digit)
+                    used["hidden_single"] = used.get("hidden_single", 0) + 1
+                    progress = True
+                    break
+            if progress:
+                break
+        if progress:
+            continue
+
+        # Locked candidates (pointing): a digit confined to one row/column inside a box
+        for box in BOXES:
+            for digit in range(1, 10):
+                bit = 1 << digit
+                spots = [cell for cell in box if candidates[cell] & bit]
+                if len(spots) < 2:
+                    continue
+                for line in _lines_through(spots):
+                    removed = False
+                    for cell in line:
+                        if cell not in box and candidates[cell] & bit:
+                            candidates[cell] &= ~bit
+                            removed = True
+                    if removed:
+                        used["locked_candidates"] = used.get("locked_candidates", 0) + 1
+                        progress = True
+            if progress:
+                break
+        if progress:
+            continue
+
+        # Naked pair: two cells in a unit with the same two candidates
+        for unit in UNITS:
+            pairs = {}
+            for cell in unit:
+                mask = candidates[cell]
+                if values[cell] == 0 and bin(mask).count("1") == 2:
+                    pairs.setdefault(mask, []).append(cell)
+            for mask, cells in pairs.items():
+                if len(cells) != 2:
+                    continue
+                removed = False
+                for cell in unit:
+                    if cell not in cells and candidates[cell] & mask:
+                        candidates[cell] &= ~mask
+                        removed = True
+                if removed:
+                    used["naked_pair"] = used.get("naked_pair", 0) + 1
+                    progress = True
+            if progress:
+                break
+        if not progress:
+            return True # Stuck: the remaining cells need guessing
+    return True
+
+
+def _lines_through(cells):
+    """Returns the row and/or column unit shared by all `cells` (each as a tuple of cell indices)."""
+    lines = []
+    rows = {ROW_OF[cell] for cell in cells}
+    cols = {COL_OF[cell] for cell in cells}
+    if len(rows) == 1:
+        lines.append(UNITS[rows.pop()])
+    if len(cols) == 1:
+        lines.append(UNITS[9 + cols.pop()])
+    return lines
+
+
+if __name__ == '__main__':
+    puzzle = [
+        [5, 3, 0, 0, 7, 0, 0, 0, 0],
+        [6, 0, 0, 1, 9, 5, 0, 0, 0],
+        [0, 9, 8, 0, 0, 0, 0, 6, 0],
+        [8, 0, 0, 0, 6, 0, 0, 0, 3],
+        [4, 0, 0, 8, 0, 3, 0, 0, 1],
+        [7, 0, 0, 0, 2, 0, 0, 0, 6],
+        [0, 6, 0, 0, 0, 0, 2, 8, 0],
+        [0, 0, 0, 4, 1, 9, 0, 0, 5],
+        [0, 0, 0, 0, 8, 0, 0, 7, 9]
+    ]
+    grade = grade_puzzle(puzzle)
+    print(f"Grade: {grade}")
+    print(f"Techniques: {technique_names(grade['technique_mask'])}")
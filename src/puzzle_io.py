@@ -0,0 +1,131 @@
+import gzip
+import io
+import itertools
+
+from src.sudoku_board import board_to_string
+
+# Characters accepted for an empty cell when reading
+_EMPTY = "0._-*"
+_CELL_CHARS = set("123456789" + _EMPTY)
+_NORMALIZE = str.maketrans({ch: "0" for ch in _EMPTY})
+
+FORMATS = ("line", "sdm", "sdk")
+
+
+class PuzzleFormatError(ValueError):
+    """A line or file that doesn't hold a 9x9 puzzle in the expected format."""
+    pass
+
+
+def parse_puzzle(text):
+    """
+    Normalizes one 81-character puzzle ('0', '.', '_', '-' or '*' for empty cells, any
+    whitespace ignored) to digits with '0' for empty. Raises PuzzleFormatError otherwise.
+    """
+    cells = "".join(text.split())
+    if len(cells) != 81 or not _CELL_CHARS.issuperset(cells):
+        raise PuzzleFormatError(f"Expected 81 cells of 1-9 or an empty marker, got {text[:90]!r}")
+    return cells.translate(_NORMALIZE)
+
+
+def read_puzzles(stream, fmt="line", on_error="raise"):
+    """
+    Yields puzzles from a text stream as 81-character strings ('0' for empty), one at a
+    time, so a corpus of any size is never held in memory.
+
+    fmt      - "line"/"sdm": one puzzle per line. Blank lines and '#' comments are skipped,
+               and only the first field is read ("<puzzle>,<rating>" and "<puzzle> <note>"
+               both work). "sdk": a single puzzle as 9 rows, with '#' metadata lines.
+    on_error - "raise" (PuzzleFormatError with the line number), "skip" malformed entries,
+               or "keep" them as the raw field so the caller can report them in place.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown puzzle format {fmt!r}; expected one of {FORMATS}")
+    if on_error not in ("raise", "skip", "keep"):
+        raise ValueError(f"on_error must be 'raise', 'skip' or 'keep', not {on_error!r}")
+
+    if fmt == "sdk":
+        rows = [line.strip() for line in stream if line.strip() and not line.startswith("#")]
+        entries = [(1, "".join(rows))]
+    else:
+        entries = _line_fields(stream)
+
+    for line_number, field in entries:
+        try:
+            yield parse_puzzle(field)
+        except PuzzleFormatError as error:
+            if on_error == "raise":
+                raise PuzzleFormatError(f"Line {line_number}: {error}") from None
+            if on_error == "keep":
+                yield field
+
+
+def _line_fields(stream):
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        yield line_number, line.replace(",", " ").replace(";", " ").split(None, 1)[0]
+
+
+def format_puzzle(puzzle, fmt="line", empty="0"):
+    """Formats a board or 81-character string as text for `fmt` (without a trailing newline)."""
+    text = puzzle if isinstance(puzzle, str) else board_to_string(puzzle)
+    if fmt == "sdk":
+        text = text.replace("0", ".")
+        return "\n".join(text[r * 9:(r + 1) * 9] for r in range(9))
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown puzzle format {fmt!r}; expected one of {FORMATS}")
+    return text if empty == "0" else text.replace("0", empty)
+
+
+def write_puzzles(stream, puzzles, fmt="line", empty="0"):
+    """
+    Writes boards or 81-character strings to a text stream as they arrive. Returns the count.
+    "sdk" holds a single puzzle, so writing a second one raises ValueError.
+    """
+    count = 0
+    for puzzle in puzzles:
+        if fmt == "sdk" and count:
+            raise ValueError("The SDK format holds a single puzzle; use 'line' or 'sdm' for several")
+        stream.write(format_puzzle(puzzle, fmt, empty))
+        stream.write("\n")
+        count += 1
+    return count
+
+
+def guess_format(path):
+    """The format implied by a file name: '.sdk' files hold one puzzle, anything else one per line."""
+    name = path.lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    return "sdk" if name.endswith(".sdk") else "line"
+
+
+def open_puzzle_file(path, mode="r"):
+    """Opens a puzzle file as text, transparently (de)compressing '.gz' files."""
+    if path.lower().endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path, mode.replace("t", "") + "b"), encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def batched(iterable, size):
+    """Yields lists of up to `size` items from iterable, reading it lazily."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+if __name__ == '__main__':
+    sample = io.StringIO(
+        "# two puzzles and a bad line\n"
+        "53..7....6..195....98....6.8...6...34..8.3..17...2...6.6....28....419..5....8..79\n"
+        "not a puzzle\n"
+        "000000010400000000020000000000050407008000300001090000300400200050100000000806000,hard\n"
+    )
+    puzzles = list(read_puzzles(sample, on_error="keep"))
+    print(puzzles)
+    print(format_puzzle(puzzles[0], "sdk"))
@@ -0,0 +1,279 @@
+import asyncio
+import itertools
+import random
+
+from src.solution_cache import get_solution_cache
+from src.sudoku_board import board_to_string
+from src.sudoku_generator import SudokuGenerator
+
+# Events waiting per member; a member that falls this far behind loses its oldest events
+MEMBER_QUEUE_SIZE = 256
+# Leaderboard updates are coalesced: at most one broadcast per room per interval (seconds)
+LEADERBOARD_INTERVAL = 0.25
+
+
+class RaceError(ValueError):
+    """A move or join that the room rejects (unknown room or player, or a move on a given)."""
+    pass
+
+
+class _Racer:
+    """One member's progress. The board is one byte per cell, so a move is a single index."""
+    __slots__ = ("player_id", "board", "correct", "mistakes", "joined_at", "finished_at", "rank", "queue", "dropped")
+
+    def __init__(self, player_id, puzzle, joined_at):
+        self.player_id = player_id
+        self.board = bytearray(puzzle)
+        self.correct = 0              # Empty cells currently holding the right digit
+        self.mistakes = 0
+        self.joined_at = joined_at
+        self.finished_at = None
+        self.rank = None
+        self.queue = asyncio.Queue(MEMBER_QUEUE_SIZE)
+        self.dropped = 0
+
+
+class RaceRoom:
+    """
+    One puzzle raced by several players. Every member gets the puzzle on joining, then the
+    room's events (joins, progress, finishes, leaderboards) on their own queue.
+
+    The solution is kept flat, one byte per cell, so a move is checked with one comparison,
+    and each member's count of correct cells is updated in place: finishing is detected
+    without ever comparing whole boards.
+    """
+
+    def __init__(self, room_id, puzzle, solution, loop=None):
+        self.room_id = room_id
+        self.size = len(puzzle)
+        self.puzzle = bytes(v for row in puzzle for v in row)
+        self.solution = bytes(v for row in solution for v in row)
+        self.empty_cells = self.puzzle.count(0)
+        self.loop = loop or asyncio.get_running_loop()
+        self.created_at = self.loop.time()
+        self.last_activity = self.created_at
+        self.members = {}                 # player_id -> _Racer
+        self.finishers = 0
+        self._leaderboard_pending = False
+
+    def puzzle_event(self):
+        return {"type": "puzzle", "room": self.room_id, "size": self.size,
+                "puzzle": "".join(str(v) for v in self.puzzle) if self.size <= 9 else list(self.puzzle)}
+
+    def join(self, player_id):
+        """Adds a player (or returns the existing member) and queues the puzzle for them."""
+        racer = self.members.get(player_id)
+        if racer is None:
+            racer = self.members[player_id] = _Racer(player_id, self.puzzle, self.loop.time())
+            self._send(racer, self.puzzle_event())
+            self.broadcast({"type": "joined", "room": self.room_id, "player": player_id})
+            self._schedule_leaderboard()
+        return racer
+
+    def leave(self, player_id):
+        if self.members.pop(player_id, None) is not None:
+            self.broadcast({"type": "left", "room": self.room_id, "player": player_id})
+            self._schedule_leaderboard()
+
+    def move(self, player_id, row, col, num):
+        """
+        Applies one player's entry (0 clears the cell) and returns
+        {"correct": bool, "remaining": int, "finished": bool, "rank": int or None}.
+        Raises RaceError for unknown players, cells outside the board and moves on givens.
+        """
+        racer = self.members.get(player_id)
+        if racer is None:
+            raise RaceError(f"{player_id!r} is not in room {self.room_id!r}")
+        if not (0 <= row < self.size and 0 <= col < self.size and 0 <= num <= self.size):
+            raise RaceError(f"Invalid move ({row}, {col}) = {num} on a {self.size}x{self.size} board")
+        cell = row * self.size + col
+        if self.puzzle[cell]:
+            raise RaceError(f"Cell ({row}, {col}) is a given")
+
+        self.last_activity = self.loop.time()
+        answer = self.solution[cell]
+        old = racer.board[cell]
+        racer.board[cell] = num
+        # O(1) bookkeeping: only this cell can change the count of correct cells
+        racer.correct += (num == answer) - (old == answer)
+        correct = num == answer
+        if num and not correct and num != old: # Re-sending the same wrong digit is not a new mistake
+            racer.mistakes += 1
+
+        if racer.finished_at is None and racer.correct == self.empty_cells:
+            self.finishers += 1
+            racer.finished_at = self.last_activity
+            racer.rank = self.finishers
+            self.broadcast({"type": "finished", "room": self.room_id, "player": player_id, "rank": racer.rank,
+                            "seconds": racer.finished_at - racer.joined_at, "mistakes": racer.mistakes})
+        elif old != num:
+            self.broadcast({"type": "progress", "room": self.room_id, "player": player_id,
+                            "remaining": self.empty_cells - racer.correct})
+        self._schedule_leaderboard()
+        return {"correct": correct, "remaining": self.empty_cells - racer.correct,
+                "finished": racer.finished_at is not None, "rank": racer.rank}
+
+    def standings(self):
+        """The leaderboard: finishers by rank, then everyone else by progress and fewest mistakes."""
+        racers = sorted(self.members.values(),
+                        key=lambda r: (r.rank or len(self.members) + 1, -r.correct, r.mistakes, r.joined_at))
+        return [{"player": r.player_id, "rank": r.rank, "remaining": self.empty_cells - r.correct,
+                 "mistakes": r.mistakes,
+                 "seconds": None if r.finished_at is None else r.finished_at - r.joined_at}
+                for r in racers]
+
+    def broadcast(self, event):
+        for racer in self.members.values():
+            self._send(racer, event)
+
+    def _send(self, racer, event):
+        queue = racer.queue
+        if queue.full():
+            # Never block the room on a slow member: drop their oldest event instead
+            queue.get_nowait()
+            racer.dropped += 1
+        queue.put_nowait(event)
+
+    def _schedule_leaderboard(self):
+        # Sorting on every move would cost O(m log m) per move; publish at most once per interval
+        if not self._leaderboard_pending:
+            self._leaderboard_pending = True
+            self.loop.call_later(LEADERBOARD_INTERVAL, self._publish_leaderboard)
+
+    def _publish_leaderboard(self):
+        self._leaderboard_pending = False
+        if self.members:
+            self.broadcast({"type": "leaderboard", "room": self.room_id, "standings": self.standings()})
+
+
+class RaceServer:
+    """
+    All race rooms of one process, driven by a single asyncio event loop.
+
+    create_room() gets a puzzle (from the puzzle bank when there is one, else generated in a
+    worker thread so the loop keeps serving moves), and every room validates against its cached
+    solution. Room state is only touched from the loop's thread; from other threads (e.g. a
+    Streamlit session), go through asyncio.run_coroutine_threadsafe().
+    """
+
+    def __init__(self, puzzle_bank=None, target_rating=1500.0, room_timeout=3600.0):
+        self.puzzle_bank = puzzle_bank
+        self.target_rating = target_rating
+        self.room_timeout = room_timeout
+        self.rooms = {}
+        self._room_ids = itertools.count(1)
+
+    def open_room(self, puzzle, solution, room_id=None):
+        """Opens a room on a known puzzle and its solution. Returns the room."""
+        room_id = room_id if room_id is not None else f"room-{next(self._room_ids)}"
+        if room_id in self.rooms:
+            raise RaceError(f"Room {room_id!r} already exists")
+        room = self.rooms[room_id] = RaceRoom(room_id, puzzle, solution)
+        if room.size == 9:
+            get_solution_cache().put(puzzle, solution) # Hints and solves in the room skip the search
+        return room
+
+    async def create_room(self, room_id=None, difficulty="medium", size=9, timeout=5.0):
+        """Opens a room with a new puzzle: banked when possible, otherwise generated off the loop."""
+        entry = None
+        if self.puzzle_bank is not None and size == 9:
+            # Rooms share one "seen" set, so concurrent rooms get different puzzles
+            entry = self.puzzle_bank.draw_nearest("race-rooms", self.target_rating)
+        if entry is not None:
+            puzzle, solution = entry["puzzle"], entry["solution"]
+        else:
+            generator = SudokuGenerator(size=size) # One per call: generators aren't shared across threads
+            puzzle, solution = await asyncio.get_running_loop().run_in_executor(
+                None, lambda: generator.generate_puzzle(difficulty, timeout=timeout))
+        return self.open_room(puzzle, solution, room_id)
+
+    async def join_or_create(self, room_id, player_id, **room_options):
+        """Joins room_id, creating it first if needed. Returns (room, the member's event queue)."""
+        room = self.rooms.get(room_id)
+        if room is None:
+            try:
+                room = await self.create_room(room_id, **room_options)
+            except RaceError:
+                room = self.room(room_id) # Another player created it while the puzzle was generated
+        return room, room.join(player_id).queue
+
+    def room(self, room_id):
+        room = self.rooms.get(room_id)
+        if room is None:
+            raise RaceError(f"No room {room_id!r}")
+        return room
+
+    def join(self, room_id, player_id):
+        """Joins a room. Returns the member's event queue; its first event is the puzzle."""
+        return self.room(room_id).join(player_id).queue
+
+    def leave(self, room_id, player_id):
+        room = self.rooms.get(room_id)
+        if room is not None:
+            room.leave(player_id)
+            if not room.members:
+                del self.rooms[room_id]
+
+    def move(self, room_id, player_id, row, col, num):
+        return self.room(room_id).move(player_id, row, col, num)
+
+    def standings(self, room_id):
+        return self.room(room_id).standings()
+
+    def close_idle_rooms(self):
+        """Closes rooms without a move for room_timeout seconds. Returns how many were closed."""
+        now = asyncio.get_running_loop().time()
+        idle = [room_id for room_id, room in self.rooms.items() if now - room.last_activity > self.room_timeout]
+        for room_id in idle:
+            self.rooms.pop(room_id).broadcast({"type": "closed", "room": room_id})
+        return len(idle)
+
+    async def run_janitor(self, interval=60.0):
+        """Closes idle rooms every `interval` seconds, until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            self.close_idle_rooms()
+
+
+async def _bot(server, room_id, player_id, solution, mistake_rate):
+    """A simulated player: fills the empty cells in random order, sometimes wrong first."""
+    queue = server.join(room_id, player_id)
+    puzzle = (await queue.get())["puzzle"]
+    empty = [cell for cell, ch in enumerate(puzzle) if ch == "0"]
+    random.shuffle(empty)
+    moves = 0
+    for cell in empty:
+        row, col = divmod(cell, 9)
+        if random.random() < mistake_rate:
+            server.move(room_id, player_id, row, col, solution[cell] % 9 + 1)
+            moves += 1
+        result = server.move(room_id, player_id, row, col, solution[cell])
+        moves += 1
+        await asyncio.sleep(0) # Let the other bots move
+    assert result["finished"]
+    return moves
+
+
+async def _demo(rooms, players):
+    server = RaceServer()
+    generator = SudokuGenerator()
+    puzzles = [generator.generate_puzzle("medium") for _ in range(10)]
+    for index in range(rooms):
+        puzzle, solution = puzzles[index % len(puzzles)]
+        server.open_room(puzzle, solution)
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    bots = [_bot(server, room_id, f"player-{p}", [v for row in puzzles[i % len(puzzles)][1] for v in row], 0.1)
+            for i, room_id in enumerate(list(server.rooms)) for p in range(players)]
+    moves = sum(await asyncio.gather(*bots))
+    elapsed = loop.time() - start
+    await asyncio.sleep(LEADERBOARD_INTERVAL * 2) # Let the last leaderboards go out
+    print(f"{rooms} rooms x {players} players: {moves} moves in {elapsed:.2f}s ({moves / elapsed:,.0f} moves/s)")
+    first = next(iter(server.rooms))
+    print(f"{first} standings: {server.standings(first)[:3]}")
+    print(f"Puzzle: {board_to_string(puzzles[0][0])}")
+
+
+if __name__ == '__main__':
+    asyncio.run(_demo(rooms=2000, players=4))
@@ -0,0 +1,65 @@
+import time
+
+
+class BudgetExceededError(Exception):
+    """Raised inside a search when its SearchBudget runs out. Entry points catch it."""
+    pass
+
+
+class _BudgetExceeded:
+    """
+    Result returned by solve()/count_solutions() when the search ran out of budget.
+    It is falsy and compares unequal to every count, so code written against the
+    plain True/False and integer results treats it as "no answer", never as success.
+    """
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return "BUDGET_EXCEEDED"
+
+
+BUDGET_EXCEEDED = _BudgetExceeded()
+
+
+class SearchBudget:
+    """
+    Cooperative work limit for a search: a maximum number of search nodes and/or a
+    wall-clock limit. The search calls charge() once per node; the clock is only read
+    every `check_interval` nodes, so an active budget stays cheap.
+
+    timeout  - seconds from construction until the budget expires
+    deadline - absolute time.monotonic() value; lets several searches share one deadline
+    Nodes accumulate across every search that shares the same budget object.
+    """
+
+    def __init__(self, max_nodes=None, timeout=None, deadline=None, check_interval=1024):
+        self.max_nodes = max_nodes
+        if timeout is not None:
+            timeout_deadline = time.monotonic() + timeout
+            deadline = timeout_deadline if deadline is None else min(deadline, timeout_deadline)
+        self.deadline = deadline
+        self.check_interval = check_interval
+        self.nodes = 0
+        self.exceeded = False
+
+    def charge(self):
+        """Counts one search node. Raises BudgetExceededError once the budget is spent."""
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            self.exceeded = True
+            raise BudgetExceededError()
+        if self.deadline is not None and self.nodes % self.check_interval == 0:
+            if time.monotonic() >= self.deadline:
+                self.exceeded = True
+                raise BudgetExceededError()
+
+    def expired(self):
+        """True if the wall-clock deadline has passed (without charging a node)."""
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def remaining_seconds(self):
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
@@ -0,0 +1,245 @@
+import math
+
+# Glicko constant: converts between the 400-point rating scale and natural log odds
+_Q = math.log(10) / 400
+
+# Puzzle ratings are anchored to how many cells are empty: 30 empty cells is rated
+# 1000 and each additional empty cell adds 25 points. With the generator's ranges
+# this puts easy around 1000-1125, medium around 1375-1500 and hard around 1625-1750.
+_BASE_EMPTY_CELLS = 30
+_BASE_PUZZLE_RATING = 1000.0
+_RATING_PER_EMPTY_CELL = 25.0
+
+# Empty-cell ranges used by SudokuGenerator for each difficulty string
+DIFFICULTY_EMPTY_CELLS = {"easy": (30, 35), "medium": (45, 50), "hard": (55, 60)}
+
+
+class SkillRatingModel:
+    """
+    Glicko-style skill rating for players and puzzles.
+
+    Every player and puzzle has a rating (higher = stronger player / harder puzzle) and
+    a rating deviation (RD, how uncertain the rating is). A finished game counts as a match
+    between player and puzzle: the player "wins" with a score between 0 and 1 that
+    reflects speed, hints and mistakes, and the puzzle gets 1 minus that score.
+    update() handles one game in O(1). recompute() re-rates a whole stored history with
+    NumPy, one vectorized step per game index, so the constants can be re-tuned
+    against millions of past games.
+    """
+
+    def __init__(self, initial_rating=1000.0, initial_deviation=350.0, puzzle_deviation=150.0,
+                 min_deviation=50.0, deviation_drift=25.0, target_offset=0.0):
+        """
+        Args:
+            initial_rating (float): Rating of a brand-new player.
+            initial_deviation (float): RD of a brand-new player (also the maximum RD).
+            puzzle_deviation (float): RD of a puzzle that has never been played.
+            min_deviation (float): RD never shrinks below this, so ratings keep adapting.
+            deviation_drift (float): RD added back before each game, so long histories don't freeze the rating.
+            target_offset (float): Target puzzle rating relative to the player's rating.
+                                   0 aims for an even match; negative values serve easier puzzles.
+        """
+        self.initial_rating = initial_rating
+        self.initial_deviation = initial_deviation
+        self.puzzle_deviation = puzzle_deviation
+        self.min_deviation = min_deviation
+        self.deviation_drift = deviation_drift
+        self.target_offset = target_offset
+
+    # --- Puzzle ratings and game scores ---
+
+    def puzzle_rating_for(self, empty_cells):
+        """Initial rating of a puzzle with this many empty cells."""
+        return _BASE_PUZZLE_RATING + (empty_cells - _BASE_EMPTY_CELLS) * _RATING_PER_EMPTY_CELL
+
+    def empty_cells_for(self, rating):
+        """Inverse of puzzle_rating_for(): empty cells that give roughly this rating (clamped to 0-81)."""
+        cells = _BASE_EMPTY_CELLS + (rating - _BASE_PUZZLE_RATING) / _RATING_PER_EMPTY_CELL
+        return max(0, min(81, int(round(cells))))
+
+    def difficulty_for_rating(self, rating):
+        """Returns the difficulty string whose typical puzzle rating is closest to `rating`."""
+        def distance(level):
+            low, high = DIFFICULTY_EMPTY_CELLS[level]
+            return abs(self.puzzle_rating_for((low + high) / 2) - rating)
+        return min(DIFFICULTY_EMPTY_CELLS, key=distance)
+
+    def game_score(self, time_seconds, empty_cells, hints_used=0, incorrect_attempts=0):
+        """
+        Converts a solved game into a score in [0, 1].
+        Solving in the expected time for the puzzle scores 0.5, half the time about 0.8,
+        twice the time about 0.2. Each hint and each mistake scales the score down.
+        """
+        expected_seconds = 20.0 + 8.0 * empty_cells
+        ratio = time_seconds / expected_seconds
+        score = 1.0 / (1.0 + ratio * ratio)
+        score *= 0.85 ** hints_used
+        score *= 0.9 ** incorrect_attempts
+        return max(0.0, min(1.0, score))
+
+    # --- Rating updates ---
+
+    def expected_score(self, rating, opponent_rating, opponent_deviation=0.0):
+        """Probability-like expected score of `rating` against the opponent."""
+        g = _g(opponent_deviation)
+        return 1.0 / (1.0 + 10 ** (-g * (rating - opponent_rating) / 400))
+
+    def update(self, player_rating, player_deviation, puzzle_rating, puzzle_deviation, score):
+        """
+        Applies one game. Returns (player_rating, player_deviation, puzzle_rating, puzzle_deviation).
+        `score` is the player's score in [0, 1]; the puzzle scores 1 - score.
+        """
+        new_player = self._update_one(player_rating, player_deviation, puzzle_rating, puzzle_deviation, score)
+        new_puzzle = self._update_one(puzzle_rating, puzzle_deviation, player_rating, player_deviation, 1.0 - score)
+        return new_player + new_puzzle
+
+    def _update_one(self, rating, deviation, opponent_rating, opponent_deviation, score):
+        deviation = min(math.sqrt(deviation * deviation + self.deviation_drift ** 2), self.initial_deviation)
+        g = _g(opponent_deviation)
+        expected = 1.0 / (1.0 + 10 ** (-g * (rating - opponent_rating) / 400))
+        inverse_variance = _Q * _Q * g * g * expected * (1.0 - expected)
+        denominator = 1.0 / (deviation * deviation) + inverse_variance
+        rating += _Q / denominator * g * (score - expected)
+        deviation = max(math.sqrt(1.0 / denominator), self.min_deviation)
+        return rating, deviation
+
+    # --- Bulk recomputation ---
+
+    def recompute(self, player_index, scores, puzzle_ratings, puzzle_index=None, n_players=None):
+        """
+        Recomputes ratings from a game history, vectorized with NumPy.
+
+        Games are grouped by how many games their player had already played. Step k updates
+        every player's k-th game at once, so the Python loop runs (longest history) times, not
+        (number of games) times. Within a step every player appears at most once.
+        Against fixed-rating puzzles (no puzzle_index) this equals replaying the games one by
+        one. With puzzle_index it is not a chronological replay: steps follow each player's game
+        count, not wall-clock time, so a puzzle's games are applied in that order, and a puzzle
+        that appears several times in a step gets them all at once, like a Glicko rating period.
+        Puzzle ratings (and through them player ratings) then approximate a sequential replay.
+
+        Args:
+            player_index: int array, player of each game (0..n_players-1); each player's games in
+                          the order they were played.
+            scores: float array, player's score of each game.
+            puzzle_ratings: if puzzle_index is None, the fixed rating of each game's puzzle;
+                            otherwise the initial rating of each puzzle, indexed by puzzle_index.
+            puzzle_index: optional int array, puzzle of each game. When given, puzzle ratings are
+                          updated too; when omitted, every game is against a fixed-rating puzzle.
+            n_players: number of players (defaults to max(player_index) + 1).
+
+        Returns:
+            (player_ratings, player_deviations, puzzle_ratings, puzzle_deviations) as NumPy arrays.
+            The puzzle arrays are per puzzle when puzzle_index is given, otherwise per game (unchanged).
+        """
+        import numpy as np # Only needed for bulk work; the game itself runs without NumPy
+
+        player_index = np.asarray(player_index, dtype=np.int64)
+        scores = np.asarray(scores, dtype=np.float64)
+        puzzle_ratings = np.asarray(puzzle_ratings, dtype=np.float64)
+        n_games = player_index.shape[0]
+        if n_players is None:
+            n_players = int(player_index.max()) + 1 if n_games else 0
+
+        p_rating = np.full(n_players, self.initial_rating)
+        p_dev = np.full(n_players, self.initial_deviation)
+        if puzzle_index is None:
+            z_rating = puzzle_ratings.copy() # One fixed opponent per game
+            z_dev = np.full(n_games, self.puzzle_deviation)
+            game_puzzle = np.arange(n_games)
+        else:
+            z_rating = puzzle_ratings.copy()
+            z_dev = np.full(z_rating.shape[0], self.puzzle_deviation)
+            game_puzzle = np.asarray(puzzle_index, dtype=np.int64)
+        if n_games == 0:
+            return p_rating, p_dev, z_rating, z_dev
+
+        # Position of each game within its player's history (0 for the first game, ...)
+        by_player = np.argsort(player_index, kind="stable")
+        sorted_players = player_index[by_player]
+        group_start = np.r_[0, np.flatnonzero(np.diff(sorted_players)) + 1]
+        group_sizes = np.diff(np.r_[group_start, n_games])
+        game_rank = np.empty(n_games, dtype=np.int64)
+        game_rank[by_player] = np.arange(n_games) - np.repeat(group_start, group_sizes)
+
+        # Process games step by step: all first games, then all second games, ...
+        by_rank = np.argsort(game_rank, kind="stable")
+        step_bounds = np.searchsorted(game_rank[by_rank], np.arange(int(game_rank.max()) + 2))
+
+        for step in range(len(step_bounds) - 1):
+            games = by_rank[step_bounds[step]:step_bounds[step + 1]]
+            players = player_index[games]
+            puzzles = game_puzzle[games]
+            s = scores[games]
+
+            pr, pd = p_rating[players], p_dev[players]
+            zr, zd = z_rating[puzzles], z_dev[puzzles]
+
+            # Players: exactly one game each in this step
+            new_pr, new_pd = self._period_update(np, pr, pd, zr, zd, s, players, n_players, p_rating, p_dev)
+            # Puzzles: accumulate every game they appeared in during this step
+            if puzzle_index is not None:
+                self._period_update(np, zr, zd, pr, pd, 1.0 - s, puzzles, z_rating.shape[0], z_rating, z_dev)
+            p_rating[players], p_dev[players] = new_pr, new_pd
+
+        return p_rating, p_dev, z_rating, z_dev
+
+    def _period_update(self, np, rating, deviation, opp_rating, opp_deviation, score, index, size,
+                       all_ratings, all_deviations):
+        """
+        Glicko rating-period update for the entities `index` (may repeat). Returns the new
+        rating/deviation per game row, and writes the result into all_ratings/all_deviations.
+        """
+        g = 1.0 / np.sqrt(1.0 + 3.0 * _Q * _Q * opp_deviation * opp_deviation / (math.pi ** 2))
+        expected = 1.0 / (1.0 + 10 ** (-g * (rating - opp_rating) / 400))
+
+        inverse_variance = np.zeros(size)
+        improvement = np.zeros(size)
+        np.add.at(inverse_variance, index, _Q * _Q * g * g * expected * (1.0 - expected))
+        np.add.at(improvement, index, g * (score - expected))
+
+        touched = np.unique(index)
+        drifted = np.minimum(np.sqrt(all_deviations[touched] ** 2 + self.deviation_drift ** 2), self.initial_deviation)
+        denominator = 1.0 / (drifted * drifted) + inverse_variance[touched]
+        all_ratings[touched] += _Q / denominator * improvement[touched]
+        all_deviations[touched] = np.maximum(np.sqrt(1.0 / denominator), self.min_deviation)
+        return all_ratings[index], all_deviations[index]
+
+    def recompute_from_history(self, games):
+        """
+        Recomputes every player's rating from stored games (dicts as returned by
+        ProfileStore.get_game_history()). Returns {player_id: (rating, deviation)}.
+        """
+        import numpy as np
+
+        player_ids = sorted({g["player_id"] for g in games})
+        lookup = {pid: i for i, pid in enumerate(player_ids)}
+        player_index = np.fromiter((lookup[g["player_id"]] for g in games), dtype=np.int64, count=len(games))
+        puzzle_ratings = np.fromiter(
+            (g.get("puzzle_rating") if g.get("puzzle_rating") is not None else self.puzzle_rating_for(g["empty_cells"])
+             for g in games), dtype=np.float64, count=len(games))
+        scores = np.fromiter(
+            (g.get("score") if g.get("score") is not None
+             else self.game_score(g["time_seconds"], g["empty_cells"], g["hints_used"], g["incorrect_attempts"])
+             for g in games), dtype=np.float64, count=len(games))
+
+        ratings, deviations, _, _ = self.recompute(player_index, scores, puzzle_ratings, n_players=len(player_ids))
+        return {pid: (float(ratings[i]), float(deviations[i])) for i, pid in enumerate(player_ids)}
+
+
+def _g(deviation):
+    """Glicko attenuation factor: games against uncertain opponents count for less."""
+    return 1.0 / math.sqrt(1.0 + 3.0 * _Q * _Q * deviation * deviation / (math.pi ** 2))
+
+
+if __name__ == '__main__':
+    model = SkillRatingModel()
+    rating, deviation = model.initial_rating, model.initial_deviation
+    print(f"New player: {rating:.0f} ± {deviation:.0f} -> {model.difficulty_for_rating(rating)}")
+
+    for seconds, empty, hints, mistakes in [(150, 32, 0, 0), (200, 47, 0, 1), (900, 57, 3, 4)]:
+        score = model.game_score(seconds, empty, hints, mistakes)
+        rating, deviation, _, _ = model.update(rating, deviation, model.puzzle_rating_for(empty),
+                                               model.puzzle_deviation, score)
+        print(f"Solved {empty} empty cells in {seconds}s (score {score:.2f}): "
+              f"{rating:.0f} ± {deviation:.0f} -> {model.difficulty_for_rating(rating)}")
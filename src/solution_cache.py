@@ -0,0 +1,142 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class SolutionCache:
+    """
+    Bounded LRU cache from a puzzle's given clues to its solution, shared by every player
+    and thread in the process.
+
+    Keys are a 16-byte BLAKE2 hash of the board size and clues; values are the solution
+    as one byte per cell, so a 9x9 entry costs a few hundred bytes including overhead.
+    Entries older than `ttl` seconds (if set) count as misses and are dropped on access.
+    """
+
+    def __init__(self, max_entries=100_000, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict() # key -> (solution bytes, stored_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key_for(givens):
+        """Compact key for a board's clues (0 for empty cells)."""
+        cells = bytes(v for row in givens for v in row)
+        return hashlib.blake2b(cells, digest_size=16, person=b"sudoku%d" % len(givens)).digest()
+
+    def get(self, givens):
+        """Returns the cached solution board for these clues, or None."""
+        key = self.key_for(givens)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[1] > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        size = len(givens)
+        solution = entry[0]
+        return [list(solution[r * size:(r + 1) * size]) for r in range(size)]
+
+    def put(self, givens, solution):
+        """Stores the solution for these clues, evicting the least recently used entries if full."""
+        key = self.key_for(givens)
+        value = (bytes(v for row in solution for v in row), time.monotonic())
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss/eviction counters and the current size, as a dict."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def solve_from_givens(solver, board_state, givens, budget=None, cache=None):
+    """
+    Solves board_state in place like solver.solve(), reusing the cached solution of the
+    puzzle's givens when there is one. The player's entries are checked cell by cell
+    against that solution, so no search is needed when they agree. A search only runs
+    on a cache miss (to solve and cache the givens), or when the entries disagree with
+    the cached solution.
+
+    Returns True, False or BUDGET_EXCEEDED, as solver.solve() does.
+    """
+    if solver.model is not None and not solver.model.is_classic:
+        return solver.solve(board_state, budget) # Keys don't capture variant rules
+    cache = cache if cache is not None else get_solution_cache()
+
+    solution = cache.get(givens)
+    if solution is None:
+        solution = [row[:] for row in givens]
+        result = solver.solve(solution, budget)
+        if not result:
+            return result # Unsolvable givens (or out of budget): the entries can't help
+        cache.put(givens, solution)
+
+    size = len(board_state)
+    for r in range(size):
+        row, solved_row = board_state[r], solution[r]
+        for c in range(size):
+            if row[c] and row[c] != solved_row[c]:
+                # The entries leave the cached solution: search from the current board
+                return solver.solve(board_state, budget)
+    for r in range(size):
+        board_state[r][:] = solution[r]
+    return True
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_solution_cache():
+    """The process-wide cache shared by hints and solves of every player."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = SolutionCache()
+    return _default_cache
+
+
+if __name__ == '__main__':
+    from src.sudoku_solver import SudokuSolver
+    from src.sudoku_board import string_to_board
+
+    solver = SudokuSolver()
+    givens = string_to_board("530070000600195000098000060800060003400803001700020006060000280000419005000080079")
+    for attempt in ("miss", "hit"):
+        board = [row[:] for row in givens]
+        start = time.perf_counter()
+        result = solve_from_givens(solver, board, givens)
+        print(f"{attempt}: {result} in {(time.perf_counter() - start) * 1000:.2f} ms")
+    print(get_solution_cache().stats())
@@ -1,12 +1,51 @@
+from array import array
+
+from src.constraints import ConstraintModel, classic_model
+
+# Leading byte of SudokuBoard.to_bytes(), bumped if the layout ever changes
+SESSION_FORMAT_VERSION = 1
+
+def board_to_string(board):
+    """Packs a 9x9 board into the common 81-character form ('0' for empty cells)."""
+    return "".join(str(v) for row in board for v in row)
+
+def string_to_board(text):
+    """Unpacks an 81-character string ('0' or '.' for empty cells) into a 9x9 board."""
+    values = [0 if ch in "0." else int(ch) for ch in text]
+    return [values[r * 9:(r + 1) * 9] for r in range(9)]
+
 class SudokuBoard:
-    def __init__(self):
-        self.board = [[0 for _ in range(9)] for _ in range(9)]
-        self.initial_board = [[0 for _ in range(9)] for _ in range(9)] # To keep track of fixed numbers
+    def __init__(self, size=9, rules=()):
+        """
+        size is the side of the board: 4, 9, 16 or 25 (boxes are sqrt(size) wide).
+        rules are optional variant rules (see constraints.py), e.g. (DiagonalRule(),).
+        """
+        self.size = size
+        self.set_rules(rules)
+        self.board = [[0 for _ in range(size)] for _ in range(size)]
+        self.initial_board = [[0 for _ in range(size)] for _ in range(size)] # To keep track of fixed numbers
+        # Move log: one packed (cell, old, new) record per change; moves before the cursor are applied
+        self._moves = array("L")
+        self._cursor = 0
+        # Pencil marks: one candidate bitmask per cell (bit d set = digit d noted), like the bitset solver's
+        self.notes = array("L", [0]) * (size * size)
+
+    def set_rules(self, rules=()):
+        """Switches the rules moves are validated against (classic when empty)."""
+        self.model = ConstraintModel(self.size, rules) if rules else classic_model(self.size)
+        self.box_size = self.model.box_size
 
     def set_board(self, new_board):
-        """Sets the current board and stores it as the initial board."""
+        """Sets the current board and stores it as the initial board. The board size follows new_board."""
+        if len(new_board) != self.size:
+            # Variant rules are laid out for one size, so a new size starts with classic rules
+            self.size = len(new_board)
+            self.set_rules()
         self.board = [row[:] for row in new_board]
         self.initial_board = [row[:] for row in new_board]
+        self._moves = array("L")
+        self._cursor = 0
+        self.notes = array("L", [0]) * (self.size * self.size)
 
     def get_board(self):
         return [row[:] for row in self.board]
@@ -15,72 +54,217 @@ class SudokuBoard:
         return [row[:] for row in self.initial_board]
 
     def place_number(self, row, col, num):
-        if 0 <= row < 9 and 0 <= col < 9 and 0 <= num <= 9:
+        if 0 <= row < self.size and 0 <= col < self.size and 0 <= num <= self.size:
+            old = self.board[row][col]
+            if old != num:
+                # A new move discards anything that was undone
+                del self._moves[self._cursor:]
+                self._moves.append((row * self.size + col) << 16 | old << 8 | num)
+                self._cursor += 1
             self.board[row][col] = num
+            if num:
+                self._prune_notes(row * self.size + col, num)
             return True
         return False
 
+    # --- Move history ---
+
+    def can_undo(self):
+        return self._cursor > 0
+
+    def can_redo(self):
+        return self._cursor < len(self._moves)
+
+    def undo(self):
+        """Reverts the last move. Returns (row, col, restored value), or None if there is nothing to undo."""
+        if not self._cursor:
+            return None
+        self._cursor -= 1
+        move = self._moves[self._cursor]
+        row, col = divmod(move >> 16, self.size)
+        self.board[row][col] = move >> 8 & 0xFF
+        return row, col, self.board[row][col]
+
+    def redo(self):
+        """Re-applies the last undone move. Returns (row, col, value), or None if there is nothing to redo."""
+        if self._cursor == len(self._moves):
+            return None
+        move = self._moves[self._cursor]
+        self._cursor += 1
+        row, col = divmod(move >> 16, self.size)
+        self.board[row][col] = move & 0xFF
+        if move & 0xFF:
+            self._prune_notes(move >> 16, move & 0xFF)
+        return row, col, self.board[row][col]
+
+    def move_history(self):
+        """The applied moves, oldest first, as (row, col, old, new) tuples."""
+        return [divmod(move >> 16, self.size) + (move >> 8 & 0xFF, move & 0xFF)
+                for move in self._moves[:self._cursor]]
+
+    # --- Pencil marks ---
+    # Notes are not part of the move history or saved games: undoing a move doesn't restore
+    # the marks it pruned.
+
+    def get_notes(self, row, col):
+        """The digits pencilled into (row, col), in ascending order."""
+        mask = self.notes[row * self.size + col]
+        return [d for d in range(1, self.size + 1) if mask >> d & 1]
+
+    def toggle_note(self, row, col, digit):
+        """Adds or removes one pencil mark in an empty cell. Returns True if the mark is now set."""
+        if not (0 <= row < self.size and 0 <= col < self.size and 1 <= digit <= self.size) or self.board[row][col]:
+            return False
+        cell = row * self.size + col
+        self.notes[cell] ^= 1 << digit
+        return bool(self.notes[cell] >> digit & 1)
+
+    def clear_notes(self, row=None, col=None):
+        """Clears one cell's pencil marks, or every cell's without arguments."""
+        if row is None:
+            self.notes = array("L", [0]) * (self.size * self.size)
+        else:
+            self.notes[row * self.size + col] = 0
+
+    def fill_notes(self):
+        """
+        Pencils every candidate into every empty cell and returns the (row, col) cells whose
+        marks changed. One pass: each row, column and box ORs its placed digits into a single
+        mask, so a cell's candidates are the digits missing from its three masks. Variant
+        rules (diagonals, anti-knight, cages) also exclude the digits of the cell's other peers.
+        """
+        size, model = self.size, self.model
+        values = [v for row in self.board for v in row]
+        rows, cols, regions = [0] * size, [0] * size, [0] * len(model.regions)
+        for cell, digit in enumerate(values):
+            if digit:
+                bit = 1 << digit
+                rows[model.row_of[cell]] |= bit
+                cols[model.col_of[cell]] |= bit
+                regions[model.region_of[cell]] |= bit
+
+        changed = []
+        notes = self.notes
+        for cell, digit in enumerate(values):
+            if digit:
+                continue
+            used = rows[model.row_of[cell]] | cols[model.col_of[cell]] | regions[model.region_of[cell]]
+            if not model.is_classic:
+                for peer in model.peers[cell]:
+                    used |= 1 << values[peer]
+            mask = model.all_digits & ~used
+            if notes[cell] != mask:
+                notes[cell] = mask
+                changed.append(divmod(cell, size))
+        return changed
+
+    def _prune_notes(self, cell, num):
+        """A digit was placed: its cell loses its marks and its peers lose that digit, in O(peers)."""
+        notes = self.notes
+        notes[cell] = 0
+        keep = ~(1 << num)
+        for peer in self.model.peers[cell]:
+            notes[peer] &= keep
+
+    @classmethod
+    def replay(cls, initial_board, moves, rules=()):
+        """Rebuilds a game from its initial puzzle and (row, col, old, new) moves."""
+        board = cls(len(initial_board), rules)
+        board.set_board(initial_board)
+        for row, col, _, new in moves:
+            board.place_number(row, col, new)
+        return board
+
+    def to_bytes(self):
+        """
+        Serializes the game (givens, move log and undo position) in a few hundred bytes.
+        Cells and digits are bit-packed at the narrowest width for the board size: a 9x9
+        game is 10 header bytes, 41 bytes of givens and 2 bytes per move. Rules are not stored.
+        """
+        size = self.size
+        digit_bits = size.bit_length()
+        move_bits = (size * size - 1).bit_length() + 2 * digit_bits
+        moves = [(move >> 16) << 2 * digit_bits | (move >> 8 & 0xFF) << digit_bits | move & 0xFF
+                 for move in self._moves]
+        return (bytes((SESSION_FORMAT_VERSION, size))
+                + len(moves).to_bytes(4, "big") + self._cursor.to_bytes(4, "big")
+                + _pack_bits([v for row in self.initial_board for v in row], digit_bits)
+                + _pack_bits(moves, move_bits))
+
+    @classmethod
+    def from_bytes(cls, data, rules=()):
+        """Restores a game written by to_bytes(), including moves that had been undone."""
+        if not data or data[0] != SESSION_FORMAT_VERSION:
+            raise ValueError("Not a saved game, or saved by an incompatible version")
+        size = data[1]
+        count = int.from_bytes(data[2:6], "big")
+        cursor = int.from_bytes(data[6:10], "big")
+        digit_bits = size.bit_length()
+        move_bits = (size * size - 1).bit_length() + 2 * digit_bits
+        givens_length = (size * size * digit_bits + 7) // 8
+        givens = _unpack_bits(data[10:10 + givens_length], digit_bits, size * size)
+        packed = _unpack_bits(data[10 + givens_length:], move_bits, count)
+
+        board = cls(size, rules)
+        board.set_board([givens[r * size:(r + 1) * size] for r in range(size)])
+        digit_mask = (1 << digit_bits) - 1
+        for move in packed:
+            cell, old, new = move >> 2 * digit_bits, move >> digit_bits & digit_mask, move & digit_mask
+            board._moves.append(cell << 16 | old << 8 | new)
+        for _ in range(cursor):
+            board.redo()
+        return board
+
     def is_valid_move(self, board_state, row, col, num):
         """Checks if placing 'num' at (row, col) is valid on the given board_state."""
         if num == 0:  # 0 is considered an empty cell, always valid to place
             return True
-
-        # Check row
-        for x in range(9):
-            if board_state[row][x] == num and col != x:
-                return False
-
-        # Check column
-        for x in range(9):
-            if board_state[x][col] == num and row != x:
-                return False
-
-        # Check 3x3 box
-        start_row = row - row % 3
-        start_col = col - col % 3
-        for i in range(3):
-            for j in range(3):
-                if board_state[i + start_row][j + start_col] == num and (i + start_row != row or j + start_col != col):
-                    return False
-        return True
+        model = self.model if len(board_state) == self.size else classic_model(len(board_state))
+        return model.is_valid(board_state, row, col, num)
 
     def is_board_full(self, board_state):
         """Checks if the given board_state has any empty cells (0)."""
-        for r in range(9):
-            for c in range(9):
-                if board_state[r][c] == 0:
-                    return False
+        for row in board_state:
+            if 0 in row:
+                return False
         return True
 
     def is_board_solved(self):
         """Checks if the current board is full and all numbers are valid."""
-        temp_board = self.get_board()
-        if not self.is_board_full(temp_board):
-            return False
+        # Peers never include the cell itself, so no copy or temporary clearing is needed
+        return self.model.is_solved(self.board)
 
-        for r in range(9):
-            for c in range(9):
-                num = temp_board[r][c]
-                # Temporarily remove number to validate against itself
-                temp_board[r][c] = 0
-                if not self.is_valid_move(temp_board, r, c, num):
-                    temp_board[r][c] = num # Put it back
-                    return False
-                temp_board[r][c] = num # Put it back
-        return True
+    def get_conflicts(self, row, col):
+        """Returns the (row, col) cells that clash with the number at (row, col)."""
+        return self.model.conflicts(self.board, row, col)
 
     def display(self):
         """Prints the current board to the console."""
-        for r in range(9):
-            if r % 3 == 0 and r != 0:
-                print("- - - - - - - - - - - - ")
-            for c in range(9):
-                if c % 3 == 0 and c != 0:
+        width = len(str(self.size))
+        for r in range(self.size):
+            if r % self.box_size == 0 and r != 0:
+                print("- " * ((width + 1) * self.size // 2 + self.box_size + 2))
+            for c in range(self.size):
+                if c % self.box_size == 0 and c != 0:
                     print(" | ", end="")
-                print(self.board[r][c] if self.board[r][c] != 0 else ".", end=" ")
+                value = self.board[r][c]
+                print(str(value if value != 0 else ".").rjust(width), end=" ")
             print()
         print("\n")
 
+def _pack_bits(values, bits):
+    """Packs non-negative ints of `bits` bits each, most significant first, into bytes."""
+    packed = 0
+    for value in values:
+        packed = packed << bits | value
+    length = (len(values) * bits + 7) // 8
+    return (packed << (length * 8 - len(values) * bits)).to_bytes(length, "big")
+
+def _unpack_bits(data, bits, count):
+    packed = int.from_bytes(data, "big") >> (len(data) * 8 - count * bits)
+    mask = (1 << bits) - 1
+    return [packed >> (count - 1 - i) * bits & mask for i in range(count)]
+
 if __name__ == '__main__':
     # Simple test for SudokuBoard
     board = SudokuBoard()
@@ -109,4 +293,19 @@ if __name__ == '__main__':
     # Test placing a number
     board.place_number(0, 2, 1)
     print("After placing 1 at (0,2):")
-    board.display()
\ No newline at end of file
+    board.display()
+
+    # Move history: undo, redo and a compact saved game
+    board.place_number(0, 3, 6)
+    board.place_number(0, 5, 8)
+    print(f"Undo: {board.undo()}, redo: {board.redo()}, undo: {board.undo()}")
+    saved = board.to_bytes()
+    restored = SudokuBoard.from_bytes(saved)
+    print(f"Saved game: {len(saved)} bytes, restores same board: {restored.get_board() == board.get_board()}, "
+          f"moves: {restored.move_history()}, can redo: {restored.can_redo()}")
+
+    # Pencil marks: fill every candidate, then a placement prunes its peers
+    board.fill_notes()
+    print(f"Notes at (0,2): {board.get_notes(0, 2)} (filled cell), at (1,1): {board.get_notes(1, 1)}")
+    board.place_number(1, 1, 7)
+    print(f"After placing 7 at (1,1): notes at (1,2): {board.get_notes(1, 2)}, at (2,0): {board.get_notes(2, 0)}")
@@ -1,22 +1,109 @@
 import random
+import time
+from src.bitset_solver import BitsetSolver
+from src.constraints import ConstraintModel, KillerRule, classic_model
+from src.search_budget import BUDGET_EXCEEDED, BudgetExceededError, SearchBudget
 from src.sudoku_solver import SudokuSolver
 
+# Share of the cells removed per difficulty on boards other than 9x9 (roughly the 9x9 ranges / 81)
+DIFFICULTY_REMOVAL_FRACTIONS = {
+    "easy": (0.37, 0.43),
+    "medium": (0.55, 0.62),
+    "hard": (0.68, 0.74),
+}
+
 class SudokuGenerator:
-    def __init__(self):
-        self.solver = SudokuSolver()
+    def __init__(self, fill_node_budget=20000, check_node_budget=20000, max_fill_attempts=3, size=9, rules=(),
+                 grid_corpus=None):
+        """
+        Args:
+            fill_node_budget (int): Search nodes one attempt at a full board may use before it is retried.
+            check_node_budget (int): Search nodes one uniqueness check may use. Checks run on the
+                                     propagating bitset solver, which stays far below this on
+                                     9x9. A check that runs out counts as "not unique", so the
+                                     cell keeps its clue.
+            max_fill_attempts (int): Backtracking attempts at a full board before falling back to a
+                                     shuffled pattern board, which always succeeds instantly.
+            size (int): Board side: 4, 9, 16 or 25.
+            rules (tuple): Variant rules from constraints.py (diagonal, jigsaw, anti-knight, killer).
+            grid_corpus (GridCorpus): Precomputed solution grids (see grid_corpus.py). Classic 9x9
+                                      boards are then drawn from it instead of searched for.
+        """
+        self.size = size
+        self.model = ConstraintModel(size, rules) if rules else classic_model(size)
+        self.box_size = self.model.box_size
+        self.solver = SudokuSolver(self.model if rules else None)
+        self.fill_node_budget = fill_node_budget
+        self.check_node_budget = check_node_budget
+        self.max_fill_attempts = max_fill_attempts
+        self.grid_corpus = grid_corpus
+        # What the budgets did during the most recent generate_puzzle call
+        self.last_generation = {}
+
+    def generate_full_board(self, deadline=None):
+        """
+        Generates a random, valid, solved Sudoku board using backtracking (or the grid corpus).
+        Raises RuntimeError if the variant rules admit no solution grid.
+        """
+        if self.grid_corpus is not None and self.size == 9 and self.model.is_classic:
+            self.last_generation["fill_corpus"] = True
+            return self.grid_corpus.draw()
+        for attempt in range(1, self.max_fill_attempts + 1):
+            budget = SearchBudget(max_nodes=self.fill_node_budget, deadline=deadline)
+            if self.size != 9 or not self.model.is_classic:
+                # Plain backtracking stalls on bigger boards and variants; the bitset solver fills them randomly
+                board = self.solver.bitset_solver.random_solution(self.size, budget)
+                if board is None: # The search finished without a single grid
+                    raise RuntimeError(f"No {self.model.name} solution grid exists; the rules have no solution")
+                if board is not BUDGET_EXCEEDED:
+                    self.last_generation["fill_attempts"] = attempt
+                    return board
+                if budget.expired():
+                    break
+                continue
+            board = [[0 for _ in range(9)] for _ in range(9)]
+            try:
+                # Recursively fill the board. It needs a starting point, find_empty handles this.
+                if self._fill_board(board, budget):
+                    self.last_generation["fill_attempts"] = attempt
+                    return board
+            except BudgetExceededError:
+                if budget.expired():
+                    break # Out of time overall; don't start another attempt
 
-    def generate_full_board(self):
-        """Generates a random, valid, solved Sudoku board using backtracking."""
-        board = [[0 for _ in range(9)] for _ in range(9)]
-        # Recursively fill the board. It needs a starting point, find_empty handles this.
-        self._fill_board(board)
-        return board
+        # Fallback: every attempt ran out of budget
+        self.last_generation["fill_attempts"] = self.max_fill_attempts
+        if not self.model.is_classic:
+            # The pattern board ignores variant rules: one last search bounded only by the deadline
+            board = self.solver.bitset_solver.random_solution(self.size, SearchBudget(deadline=deadline))
+            if not board: # None (no solution) or BUDGET_EXCEEDED
+                raise RuntimeError(f"No {self.model.name} solution grid found in time; "
+                                   "the rules may have no solution")
+            return board
+        self.last_generation["fill_fallback"] = True
+        return self._pattern_board()
 
-    def _fill_board(self, board):
+    def _pattern_board(self):
         """
-        Recursive helper function to fill a 9x9 Sudoku board.
+        Builds a random full board without searching: a valid base pattern with rows, columns
+        and digits shuffled in ways that preserve validity.
+        """
+        box, size = self.box_size, self.size
+        bands = random.sample(range(box), box)
+        rows = [band * box + r for band in bands for r in random.sample(range(box), box)]
+        stacks = random.sample(range(box), box)
+        cols = [stack * box + c for stack in stacks for c in random.sample(range(box), box)]
+        digits = random.sample(range(1, size + 1), size)
+        return [[digits[(box * (r % box) + r // box + c) % size] for c in cols] for r in rows]
+
+    def _fill_board(self, board, budget=None):
+        """
+        Recursive helper function to fill a 9x9 Sudoku board (other sizes use the bitset solver).
         It attempts to place numbers randomly until a full, valid board is achieved.
         """
+        if budget is not None:
+            budget.charge()
+
         find = self.solver.find_empty(board)
         if not find:
             return True  # Board is full
@@ -28,33 +115,82 @@ class SudokuGenerator:
         for num in nums:
             if self.solver.is_valid(board, row, col, num):
                 board[row][col] = num
-                if self._fill_board(board):
+                if self._fill_board(board, budget):
                     return True
                 board[row][col] = 0  # Backtrack if the current path doesn't lead to a solution
 
         return False
 
-    def generate_puzzle(self, difficulty_level="medium"):
+    def generate_puzzle(self, difficulty_level="medium", timeout=None):
         """
         Generates a Sudoku puzzle with a unique solution for the player.
-        Difficulty levels influence the number of cells removed.
+        Difficulty levels influence the number of cells removed. last_generation["shortfall"]
+        is how many fewer cells than the level's target were removed (no other removal kept
+        the solution unique, or time ran out), so callers can report what was actually served.
 
         Args:
             difficulty_level (str): "easy", "medium", or "hard".
+            timeout (float): Optional wall-clock limit in seconds. When it expires the removal
+                             phase stops early and the puzzle is returned with the cells removed
+                             so far. It is still uniquely solvable, just easier than requested.
 
         Returns:
             tuple: A tuple containing (puzzle_board, solved_board).
                    puzzle_board is the game board with empty cells (0s).
                    solved_board is the uniquely solved version of the puzzle.
         """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        self.last_generation = {"fill_attempts": 0, "fill_fallback": False, "fill_corpus": False,
+                                "checks_over_budget": 0, "timed_out": False}
+
         # First, generate a complete and solved Sudoku board
-        solved_board = self.generate_full_board()
+        solved_board = self.generate_full_board(deadline)
         # Create a copy to remove numbers from for the puzzle
         puzzle_board = [row[:] for row in solved_board] 
 
+        cells_to_remove = self._cells_to_remove(difficulty_level)
+        # Uniqueness checks go straight to the bitset solver: propagation settles them in a few
+        # nodes where row-major backtracking can run out of budget and keep clues it needn't
+        removed_count = self._remove_clues(self.solver.bitset_solver, puzzle_board, cells_to_remove, deadline)
+
+        self._record_removal(cells_to_remove, removed_count)
+        # Return both the generated puzzle and its unique solution
+        return puzzle_board, solved_board 
+
+    def generate_killer_puzzle(self, difficulty_level="medium", max_cage_size=4, timeout=None):
+        """
+        Generates a killer puzzle: random cages laid over a fresh solution grid, then clues
+        removed while the cages and remaining clues still force a unique solution. Any
+        rules the generator was built with (e.g. diagonals) also apply.
+
+        Returns:
+            tuple: (puzzle_board, solved_board, KillerRule). Solve or validate the puzzle
+                   with a ConstraintModel that includes the returned rule.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        self.last_generation = {"fill_attempts": 0, "fill_fallback": False, "fill_corpus": False,
+                                "checks_over_budget": 0, "timed_out": False}
+        solved_board = self.generate_full_board(deadline)
+        cages = KillerRule.from_solution(solved_board, max_cage_size)
+        solver = BitsetSolver(ConstraintModel(self.size, self.model.rules + (cages,)))
+        puzzle_board = [row[:] for row in solved_board]
+        # Cage sums carry most of the information, so killer puzzles can lose many more clues
+        cells_to_remove = max(self._cells_to_remove(difficulty_level), round(0.85 * self.size ** 2))
+        self._record_removal(cells_to_remove, self._remove_clues(solver, puzzle_board, cells_to_remove, deadline))
+        return puzzle_board, solved_board, cages
+
+    def _record_removal(self, cells_to_remove, removed_count):
+        self.last_generation["removed"] = removed_count
+        self.last_generation["target"] = cells_to_remove
+        self.last_generation["shortfall"] = cells_to_remove - removed_count
+
+    def _cells_to_remove(self, difficulty_level):
         # Define the target number of cells to remove based on difficulty
         # These numbers are approximate and can be fine-tuned
-        if difficulty_level == "easy":
+        if self.size != 9:
+            low, high = DIFFICULTY_REMOVAL_FRACTIONS.get(difficulty_level, DIFFICULTY_REMOVAL_FRACTIONS["medium"])
+            cells_to_remove = random.randint(round(low * self.size ** 2), round(high * self.size ** 2))
+        elif difficulty_level == "easy":
             cells_to_remove = random.randint(30, 35) # Fewer empty cells, easier to solve
         elif difficulty_level == "medium":
             cells_to_remove = random.randint(45, 50) # Moderate number of empty cells
@@ -62,17 +198,26 @@ class SudokuGenerator:
             cells_to_remove = random.randint(55, 60) # Many empty cells, harder deductions needed
         else: # Default to medium if an unknown level is passed
             cells_to_remove = random.randint(45, 50)
+        return cells_to_remove
 
+    def _remove_clues(self, solver, puzzle_board, cells_to_remove, deadline):
+        """
+        Empties up to cells_to_remove cells of puzzle_board (in place), in random order, keeping
+        only removals after which `solver` still finds exactly one solution. Returns the count.
+        """
         removed_count = 0
-        
+
         # Create a list of all (row, col) coordinates and shuffle them
-        cells_to_consider = [(r, c) for r in range(9) for c in range(9)]
+        cells_to_consider = [(r, c) for r in range(self.size) for c in range(self.size)]
         random.shuffle(cells_to_consider)
 
         # Iterate through cells and attempt to remove numbers
         for r, c in cells_to_consider:
             if removed_count >= cells_to_remove:
                 break # Stop if enough cells have been removed
+            if deadline is not None and time.monotonic() >= deadline:
+                self.last_generation["timed_out"] = True
+                break # Out of time: keep what has been removed so far
 
             original_value = puzzle_board[r][c]
             if original_value == 0: # Skip if already empty
@@ -85,8 +230,12 @@ class SudokuGenerator:
             # Create a deep copy to not modify the current puzzle_board during solution counting
             temp_puzzle_copy = [row[:] for row in puzzle_board]
             
-            # Count solutions for the board after potential removal
-            solutions = self.solver.count_solutions(temp_puzzle_copy)
+            # Count solutions for the board after potential removal. Two are enough to know
+            # it's not unique, and a check that exceeds its budget counts as not unique.
+            budget = SearchBudget(max_nodes=self.check_node_budget, deadline=deadline)
+            solutions = solver.count_solutions(temp_puzzle_copy, limit=2, budget=budget)
+            if solutions is BUDGET_EXCEEDED:
+                self.last_generation["checks_over_budget"] += 1
 
             if solutions == 1:
                 # If a unique solution still exists, keep the cell empty
@@ -94,9 +243,7 @@ class SudokuGenerator:
             else:
                 # If not unique (0 or >1 solutions), revert the change
                 puzzle_board[r][c] = original_value
-        
-        # Return both the generated puzzle and its unique solution
-        return puzzle_board, solved_board 
+        return removed_count
 
 if __name__ == '__main__':
     # This block allows you to test the generator independently
@@ -134,4 +281,24 @@ if __name__ == '__main__':
     print(f"Solutions (should be 1): {test_solver.count_solutions([row[:] for row in hard_puzzle])}")
     print("\nSolved Version:")
     for row in hard_solved:
-        print(row)
\ No newline at end of file
+        print(row)
+    for size in (4, 16):
+        sized = SudokuGenerator(size=size)
+        start = time.time()
+        sized_puzzle, _ = sized.generate_puzzle("medium", timeout=10)
+        print(f"\n--- {size}x{size} medium: {sum(row.count(0) for row in sized_puzzle)} empty cells "
+              f"in {time.time() - start:.2f}s, solutions: {test_solver.count_solutions(sized_puzzle, limit=2)} ---")
+
+    from src.constraints import DiagonalRule, JigsawRule
+    for rules in ((DiagonalRule(),), (JigsawRule.random(),)):
+        variant = SudokuGenerator(rules=rules)
+        start = time.time()
+        variant_puzzle, _ = variant.generate_puzzle("medium", timeout=10)
+        print(f"\n--- {variant.model.name} medium: {sum(row.count(0) for row in variant_puzzle)} empty cells "
+              f"in {time.time() - start:.2f}s, solutions: {variant.solver.count_solutions(variant_puzzle, limit=2)} ---")
+
+    start = time.time()
+    killer_puzzle, _, cages = SudokuGenerator().generate_killer_puzzle("hard", timeout=10)
+    killer_solver = SudokuSolver(ConstraintModel(9, (cages,)))
+    print(f"\n--- killer: {len(cages.cages)} cages, {sum(row.count(0) for row in killer_puzzle)} empty cells "
+          f"in {time.time() - start:.2f}s, solutions: {killer_solver.count_solutions(killer_puzzle, limit=2)} ---")
@@ -1,87 +1,136 @@
+import math
 import time
+from src.bitset_solver import BitsetSolver
+from src.constraints import classic_model
+from src.search_budget import BUDGET_EXCEEDED, BudgetExceededError
 
 class SudokuSolver:
-    def __init__(self):
-        pass
+    def __init__(self, model=None):
+        """
+        model - optional ConstraintModel with variant rules (see constraints.py). Without one,
+                every board is checked with the classic rules for its size.
+        """
+        self.model = model
+        # Variant rules and boards larger than 9x9 go to the propagating bitset solver
+        self.bitset_solver = BitsetSolver(model)
+
+    def set_model(self, model=None):
+        """Switches the rules used from now on (None for classic rules at each board's size)."""
+        self.model = model
+        self.bitset_solver.model = model
 
     def find_empty(self, board_state):
         """Finds the next empty cell (0) in the board."""
-        for r in range(9):
-            for c in range(9):
+        size = len(board_state)
+        for r in range(size):
+            for c in range(size):
                 if board_state[r][c] == 0:
                     return (r, c)  # (row, col)
         return None
 
     def is_valid(self, board_state, row, col, num):
         """Checks if placing 'num' at (row, col) is valid on the given board_state."""
-        if num == 0:
-            return True
-
-        # Check row
-        for x in range(9):
-            if board_state[row][x] == num and col != x:
-                return False
-
-        # Check column
-        for x in range(9):
-            if board_state[x][col] == num and row != x:
-                return False
-
-        # Check 3x3 box
-        start_row = row - row % 3
-        start_col = col - col % 3
-        for i in range(3):
-            for j in range(3):
-                if board_state[i + start_row][j + start_col] == num and (i + start_row != row or j + start_col != col):
-                    return False
-        return True
-
-    def solve(self, board_state):
+        model = self.model if self.model is not None else classic_model(len(board_state))
+        return model.is_valid(board_state, row, col, num)
+
+    def has_conflicts(self, board_state):
+        """True if two filled cells break a rule already (such a board has no solution)."""
+        model = self.model if self.model is not None else classic_model(len(board_state))
+        for r, row in enumerate(board_state):
+            for c, num in enumerate(row):
+                if num and not model.is_valid(board_state, r, c, num):
+                    return True
+        return False
+
+    def _uses_bitset(self, board_state):
+        return len(board_state) > 9 or (self.model is not None and not self.model.is_classic)
+
+    def solve(self, board_state, budget=None):
         """
         Solves the Sudoku board using backtracking.
         Modifies the board_state in place if a solution is found.
         Returns True if a solution exists, False otherwise.
+
+        With a SearchBudget, returns BUDGET_EXCEEDED (falsy) if the budget runs out
+        first; board_state is then left exactly as it was passed in.
+
+        Boards larger than 9x9 and variant rules are solved by BitsetSolver.
         """
+        size = len(board_state)
+        if self._uses_bitset(board_state):
+            return self.bitset_solver.solve(board_state, budget)
+        if self.has_conflicts(board_state):
+            return False # Backtracking only checks the cells it fills, so clashing givens must be caught here
+        if budget is None:
+            return self._solve_recursive(board_state, None)
+
+        empty_cells = [(r, c) for r in range(size) for c in range(size) if board_state[r][c] == 0]
+        try:
+            return self._solve_recursive(board_state, budget)
+        except BudgetExceededError:
+            for r, c in empty_cells:
+                board_state[r][c] = 0
+            return BUDGET_EXCEEDED
+
+    def _solve_recursive(self, board_state, budget):
+        if budget is not None:
+            budget.charge()
+
         find = self.find_empty(board_state)
         if not find:
             return True  # Board is full, solution found
 
         row, col = find
 
-        for num in range(1, 10):
+        for num in range(1, len(board_state) + 1):
             if self.is_valid(board_state, row, col, num):
                 board_state[row][col] = num
 
-                if self.solve(board_state):
+                if self._solve_recursive(board_state, budget):
                     return True
 
                 board_state[row][col] = 0  # Backtrack
 
         return False
 
-    def count_solutions(self, board_state):
+    def count_solutions(self, board_state, limit=None, budget=None):
         """
         Counts the number of solutions for a given Sudoku board.
         Uses a non-destructive approach (creates copies of the board).
+
+        limit  - stop searching once this many solutions are found (e.g. 2 for a uniqueness check)
+        budget - optional SearchBudget; returns BUDGET_EXCEEDED if it runs out before the count is known
         """
-        solutions = 0
+        if self._uses_bitset(board_state):
+            return self.bitset_solver.count_solutions(board_state, limit, budget)
+        if self.has_conflicts(board_state):
+            return 0
         temp_board = [row[:] for row in board_state] # Create a copy to not modify original
+        if limit is None:
+            limit = math.inf
+        try:
+            return self._count_solutions_recursive(temp_board, limit, budget)
+        except BudgetExceededError:
+            return BUDGET_EXCEEDED
+
+    def _count_solutions_recursive(self, current_board, limit, budget):
+        """Returns the number of ways (capped at limit) the empty cells of current_board can be completed."""
+        if budget is not None:
+            budget.charge()
+
+        find = self.find_empty(current_board)
+        if not find:
+            return 1
 
-        def _count_solutions_recursive(current_board):
-            nonlocal solutions
-            find = self.find_empty(current_board)
-            if not find:
-                solutions += 1
-                return
-
-            row, col = find
-            for num in range(1, 10):
-                if self.is_valid(current_board, row, col, num):
-                    current_board[row][col] = num
-                    _count_solutions_recursive(current_board)
-                    current_board[row][col] = 0 # Backtrack
-
-        _count_solutions_recursive(temp_board)
+        solutions = 0
+        row, col = find
+        for num in range(1, len(current_board) + 1):
+            if self.is_valid(current_board, row, col, num):
+                current_board[row][col] = num
+                solutions += self._count_solutions_recursive(current_board, limit - solutions, budget)
+                current_board[row][col] = 0 # Backtrack
+                if solutions >= limit:
+                    break
         return solutions
 
 if __name__ == '__main__':
@@ -1,4 +1,6 @@
 import streamlit as st
+import asyncio
+import threading
 import time
 import random
 
@@ -9,10 +11,76 @@ from src.sudoku_board import SudokuBoard
 from src.sudoku_generator import SudokuGenerator
 from src.ai_controller import AIController
 from src.sudoku_solver import SudokuSolver # Used for validation and hints
+from src.profile_store import SQLiteProfileStore
+from src.telemetry import Telemetry, RingBufferSink, serve_metrics_from_env
+from src.puzzle_bank import PuzzleBank
+from src.race_room import RaceError, RaceServer
+from src.grid_corpus import GridCorpus
+from src.grid_render import CONFLICT, FIXED, HINT, NOTES, SOLVED, GridRenderer
 
 # --- Streamlit Page Configuration (MUST BE FIRST STREAMLIT COMMAND) ---
 st.set_page_config(layout="wide", page_title="Adaptive AI Sudoku")
 
+# --- Shared profile store (one per server process, shared by all sessions) ---
+@st.cache_resource
+def get_profile_store():
+    return SQLiteProfileStore()
+
+
+# --- Shared solution-grid corpus (python -m src.grid_corpus), if built; memory-mapped on first use ---
+@st.cache_resource
+def get_grid_corpus():
+    return GridCorpus.load_default()
+
+
+# --- Shared puzzle bank: loaded once per server process, topped up in the background and saved ---
+@st.cache_resource
+def get_puzzle_bank():
+    # The bundled starter set serves the first game when there is no bank file yet
+    bank = PuzzleBank.load_default()
+
+    def fill_and_save():
+        bank.fill(SudokuGenerator(grid_corpus=get_grid_corpus()), 5, timeout=5.0)
+        bank.save() # Keeps the new puzzles, and the ids the players' seen sets refer to
+
+    threading.Thread(target=fill_and_save, daemon=True).start()
+    return bank
+
+
+# --- Shared race rooms: one asyncio loop in a background thread serves every session ---
+@st.cache_resource
+def get_race_server():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="race-rooms", daemon=True).start()
+    server = RaceServer(puzzle_bank=get_puzzle_bank())
+    asyncio.run_coroutine_threadsafe(server.run_janitor(), loop)
+    return server, loop
+
+
+def race_call(coroutine_function, *args):
+    """Runs coroutine_function(server, *args) on the race loop and waits for its result."""
+    server, loop = get_race_server()
+    return asyncio.run_coroutine_threadsafe(coroutine_function(server, *args), loop).result()
+
+
+# --- Shared telemetry: recent events in memory (shown in the sidebar), plus a Prometheus
+# /metrics endpoint when SUDOKU_METRICS_PORT is set ---
+@st.cache_resource
+def get_app_telemetry():
+    telemetry = Telemetry([RingBufferSink(capacity=5000)])
+    serve_metrics_from_env(telemetry)
+    return telemetry
+
+
+def recent_telemetry(limit=50):
+    """The newest `limit` buffered telemetry records, newest first, as table rows."""
+    ring = get_app_telemetry().sinks[0]
+    return [{"Time": time.strftime("%H:%M:%S", time.localtime(record["ts"])), "Name": record["name"],
+             "Value": record.get("value", ""),
+             "Fields": ", ".join(f"{k}={v}" for k, v in record["fields"].items())}
+            for record in reversed(ring.snapshot()[-limit:])]
+
+
 # --- Custom CSS for Sudoku Grid Styling ---
 # This makes the grid look more like a traditional Sudoku board
 st.markdown("""
@@ -30,17 +98,6 @@ st.markdown("""
     color: black; /* Default text color */
 }
 
-/* Style for fixed/initial numbers (read-only cells) */
-.fixed-cell {
-    background-color: #e0e0e0 !important; /* Light grey */
-    font-weight: bold !important;
-    color: #4A4A4A !important; /* Darker grey for fixed numbers */
-}
-
-/* Borders for 3x3 blocks */
-.cell-border-right { border-right: 3px solid black !important; }
-.cell-border-bottom { border-bottom: 3px solid black !important; }
-
 /* Remove default Streamlit input padding/margin */
 .stTextInput {
     padding: 0;
@@ -65,21 +122,31 @@ div.stButton > button {
 # These functions will manage the game state and interact with your core logic classes
 
 def new_game_logic():
-    """Starts a new game, generates a puzzle, and resets state."""
+    """Starts a new game, generates a puzzle, and resets state. A race in progress is left first."""
+    if st.session_state.race_room:
+        # The new board has nothing to do with the room's puzzle, so stop sending moves there
+        race_call(_leave_race, st.session_state.race_room, st.session_state.player_id)
+        st.session_state.race_room = None
     st.session_state.game_over = False
     st.session_state.timer_running = True
     st.session_state.start_time = time.time()
     st.session_state.messages = [] # Clear previous messages
     # Ensure current board and initial puzzle are cleared / reset
-    st.session_state.current_board = [[0 for _ in range(9)] for _ in range(9)]
-    st.session_state.initial_puzzle = [[0 for _ in range(9)] for _ in range(9)]
+    size = st.session_state.sudoku_generator_obj.size
+    st.session_state.current_board = [[0 for _ in range(size)] for _ in range(size)]
+    st.session_state.initial_puzzle = [[0 for _ in range(size)] for _ in range(size)]
 
 
-    current_difficulty = st.session_state.ai_controller_obj.get_current_difficulty()
-    
-    # Generate puzzle and its unique solution
-    # Ensure sudoku_generator.py's generate_puzzle returns both
-    new_puzzle, solved_board_from_gen = st.session_state.sudoku_generator_obj.generate_puzzle(current_difficulty)
+    # Serve a banked puzzle near the player's rating, or generate one (with its unique solution)
+    generation_start = time.perf_counter()
+    new_puzzle, solved_board_from_gen = st.session_state.ai_controller_obj.get_next_puzzle(
+        st.session_state.sudoku_generator_obj, timeout=5.0 # Bounded wait on every rerun
+    )
+    current_difficulty = st.session_state.ai_controller_obj.initial_puzzle_difficulty
+    if st.session_state.ai_controller_obj.current_puzzle_id is None:
+        st.session_state.ai_controller_obj.telemetry.observe(
+            "generation_seconds", time.perf_counter() - generation_start, difficulty=current_difficulty
+        )
     
     st.session_state.solved_board = solved_board_from_gen # Store the unique solution
 
@@ -88,38 +155,176 @@ def new_game_logic():
     st.session_state.initial_puzzle = st.session_state.sudoku_board_obj.get_initial_board()
 
     st.session_state.ai_controller_obj.start_game_timer() # Resets timer and stats in AI controller
-    st.session_state.ai_controller_obj.set_initial_puzzle_difficulty(current_difficulty)
 
     st.session_state.messages.append(f"New game started! Difficulty: **{current_difficulty.capitalize()}**")
     st.rerun() # Force a rerun to clear inputs and display new board
 
 
+# Per-style cell CSS (see grid_render.py); user entries keep the default look
+CELL_STYLE_CSS = {
+    FIXED: "background-color: #e0e0e0 !important; font-weight: bold !important; color: #4A4A4A !important;",
+    HINT: "color: purple !important;",
+    CONFLICT: "color: red !important;",
+    SOLVED: "color: green !important;",
+    NOTES: "font-size: 11px !important;", # Pencil marks show as the empty input's placeholder
+}
+
+
+def cell_key(row, col):
+    """Widget key of a cell; it includes the game's start time, so each game gets fresh inputs."""
+    return f"cell_{row}_{col}_{int(st.session_state.start_time * 1000)}" # Digits only: the key is a CSS class
+
+
+def grid_css(renderer, size, box):
+    """
+    One <style> block for the grid: a rule per cell style and per box border, each listing
+    its cells by key class, instead of a pair of wrapper divs around every input.
+    """
+    cells = [(r, c) for r in range(size) for c in range(size)]
+    groups = [([(r, c) for r, c in cells if (c + 1) % box == 0 and c != size - 1],
+               "border-right: 3px solid black !important;"),
+              ([(r, c) for r, c in cells if (r + 1) % box == 0 and r != size - 1],
+               "border-bottom: 3px solid black !important;")]
+    groups += [(styled, CELL_STYLE_CSS[style]) for style, styled in renderer.cells_by_style().items()
+               if style in CELL_STYLE_CSS]
+    rules = [", ".join(f".st-key-{cell_key(r, c)} input" for r, c in group) + " {" + css + "}"
+             for group, css in groups if group]
+    return "<style>\n" + "\n".join(rules) + "\n</style>"
+
+
+def place_cell_logic(row, col, num):
+    """Records a player's entry (0 to clear) in the board's move log and the displayed board."""
+    st.session_state.sudoku_board_obj.place_number(row, col, num)
+    st.session_state.current_board[row][col] = num
+
+
+def undo_logic(redo=False):
+    """Undoes (or redoes) the last entry. Runs as a button callback, before the cells are drawn."""
+    if st.session_state.game_over:
+        return
+    board_obj = st.session_state.sudoku_board_obj
+    change = board_obj.redo() if redo else board_obj.undo()
+    if change is None:
+        st.session_state.messages.append(f"Nothing to {'redo' if redo else 'undo'}.")
+        return
+    row, col, num = change
+    st.session_state.current_board[row][col] = num # The grid renderer writes it to the cell's input
+    race_move_logic(row, col)
+
+
+async def _join_race(server, room_id, player_id):
+    room, _ = await server.join_or_create(room_id, player_id)
+    size = room.size
+    rows = lambda cells: [list(cells[r * size:(r + 1) * size]) for r in range(size)]
+    return rows(room.puzzle), rows(room.solution)
+
+
+async def _race_move(server, room_id, player_id, row, col, num):
+    return server.move(room_id, player_id, row, col, num)
+
+
+async def _leave_race(server, room_id, player_id):
+    server.leave(room_id, player_id)
+
+
+async def _race_standings(server, room_id):
+    return server.standings(room_id) if room_id in server.rooms else []
+
+
+def join_race_logic(room_code):
+    """Joins (or opens) a race room: every member plays the room's puzzle, moves are checked by the room."""
+    room_id = room_code.strip() or f"race-{random.randint(1000, 9999)}"
+    if st.session_state.race_room:
+        race_call(_leave_race, st.session_state.race_room, st.session_state.player_id)
+    puzzle, solution = race_call(_join_race, room_id, st.session_state.player_id)
+    st.session_state.race_room = room_id
+    st.session_state.game_over = False
+    st.session_state.timer_running = True
+    st.session_state.start_time = time.time() # New widget keys, so the inputs show the room's puzzle
+    st.session_state.sudoku_board_obj.set_board(puzzle)
+    st.session_state.current_board = st.session_state.sudoku_board_obj.get_board()
+    st.session_state.initial_puzzle = st.session_state.sudoku_board_obj.get_initial_board()
+    st.session_state.solved_board = solution
+    st.session_state.messages = [f"🏁 Racing in room **{room_id}**. Share the code so others can join."]
+
+
+def race_move_logic(row, col):
+    """
+    Sends the cell's current value to the race room, if racing, and ends the game when the
+    room says the player has finished. Every board change (entry, hint, undo, redo) goes
+    through here. Returns whether a race is on (the room, not check_win_logic, decides the win).
+    """
+    if not st.session_state.race_room:
+        return False
+    # The room checks the move against its solution in O(1) and keeps everyone's standings
+    try:
+        result = race_call(_race_move, st.session_state.race_room, st.session_state.player_id,
+                           row, col, st.session_state.current_board[row][col])
+    except RaceError as error: # The room closed (idle) or the move was rejected
+        st.session_state.messages.append(f"Race: {error}")
+        return True
+    if result["finished"] and not st.session_state.game_over:
+        st.session_state.game_over = True
+        st.session_state.timer_running = False
+        st.session_state.messages.append(f"🏁 You finished #{result['rank']} in room **{st.session_state.race_room}**!")
+    return True
+
+
+def leave_race_logic():
+    new_game_logic() # Leaves the room, then starts an ordinary game
+
+
+def notes_logic(fill=True):
+    """Pencils every candidate into every empty cell (or clears every mark). Used as an on_click callback."""
+    if st.session_state.game_over:
+        return
+    if fill:
+        st.session_state.sudoku_board_obj.fill_notes()
+    else:
+        st.session_state.sudoku_board_obj.clear_notes()
+
+
 def update_cell_logic(row, col, _): # _ is a dummy argument for on_change, value retrieved by key
     """Handles updating a cell in the game board from user input."""
-    key = f"cell_{row}_{col}_{st.session_state.start_time}"
+    key = cell_key(row, col)
     value = st.session_state[key] # Retrieve the actual value from session state using the input's key
 
     if st.session_state.game_over:
         return
 
+    board_obj = st.session_state.sudoku_board_obj
+    if (st.session_state.notes_mode and value and value.isdigit() and not st.session_state.current_board[row][col]
+            and 1 <= int(value) <= board_obj.size):
+        # Notes mode: the digit toggles a pencil mark instead of filling the cell
+        board_obj.toggle_note(row, col, int(value))
+        st.session_state[key] = ""
+        return
+
     # Only allow updates to cells that were initially empty
     if st.session_state.initial_puzzle[row][col] == 0:
+        st.session_state.grid_renderer.hinted.discard((row, col)) # The player's own entry now
         if value is None or value == "":
-            st.session_state.current_board[row][col] = 0
+            place_cell_logic(row, col, 0)
             # No message needed for clearing a cell
         else:
             try:
                 num = int(value)
-                if 1 <= num <= 9:
-                    st.session_state.current_board[row][col] = num
+                size = len(st.session_state.current_board)
+                if 1 <= num <= size:
+                    place_cell_logic(row, col, num)
                     # Full board validation happens on win check
                 else:
-                    st.session_state.messages.append(f"Cell ({row+1},{col+1}): Please enter a digit between 1 and 9.")
-                    st.session_state.current_board[row][col] = 0 # Clear invalid input
+                    st.session_state.messages.append(f"Cell ({row+1},{col+1}): Please enter a number between 1 and {size}.")
+                    place_cell_logic(row, col, 0) # Clear invalid input
+                    st.session_state[key] = ""
             except ValueError:
                 st.session_state.messages.append(f"Cell ({row+1},{col+1}): Invalid input. Please enter a number.")
-                st.session_state.current_board[row][col] = 0 # Clear non-numeric input
+                place_cell_logic(row, col, 0) # Clear non-numeric input
+                st.session_state[key] = ""
     
+    if race_move_logic(row, col):
+        return
+
     # After any update, re-check for win condition
     check_win_logic()
 
@@ -169,8 +374,10 @@ def get_hint_logic():
     )
     
     if r is not None:
-        st.session_state.current_board[r][c] = num
+        st.session_state.grid_renderer.mark_hinted(r, c)
+        place_cell_logic(r, c, num)
         st.session_state.messages.append(f"💡 Hint: Try putting **{num}** at row **{r+1}**, column **{c+1}**.")
+        race_move_logic(r, c)
         st.rerun() # Force rerun to update the board immediately
     else:
         st.session_state.messages.append("No immediate hint available or board is already complete.")
@@ -180,8 +387,16 @@ def solve_board_logic():
     if st.session_state.game_over:
         st.session_state.messages.append("Game is already over. Start a new game to solve.")
         return
+    if st.session_state.race_room:
+        st.session_state.messages.append("Solve is off while racing. Leave the race to reveal the solution.")
+        return
 
+    st.session_state.ai_controller_obj.record_revealed_game(
+        time.time() - st.session_state.start_time,
+        sum(row.count(0) for row in st.session_state.initial_puzzle)
+    )
     st.session_state.current_board = [row[:] for row in st.session_state.solved_board]
+    st.session_state.grid_renderer.revealed = True
     st.session_state.game_over = True
     st.session_state.timer_running = False
     st.session_state.messages.append("🤖 Puzzle solved by AI!")
@@ -192,9 +407,17 @@ def solve_board_logic():
 # This block ensures that game state objects are created only once per session
 if 'sudoku_board_obj' not in st.session_state:
     st.session_state.sudoku_board_obj = SudokuBoard()
-    st.session_state.sudoku_generator_obj = SudokuGenerator()
-    st.session_state.ai_controller_obj = AIController()
+    st.session_state.sudoku_generator_obj = SudokuGenerator(grid_corpus=get_grid_corpus())
+    st.session_state.player_id = "guest"
+    st.session_state.ai_controller_obj = AIController(
+        get_profile_store(), st.session_state.player_id, get_app_telemetry(), puzzle_bank=get_puzzle_bank()
+    )
     st.session_state.sudoku_solver_obj = SudokuSolver()
+    st.session_state.race_room = None # Race room id while racing (see race_room.py)
+    st.session_state.grid_renderer = GridRenderer() # What each cell shows, to update only changed cells
+    st.session_state.grid_keys = None # start_time of the widget keys the renderer has drawn
+    st.session_state.grid_css = ""
+    st.session_state.notes_mode = False # Digits typed into empty cells toggle pencil marks
 
     # Board states
     st.session_state.current_board = [[0 for _ in range(9)] for _ in range(9)]
@@ -215,6 +438,40 @@ if 'sudoku_board_obj' not in st.session_state:
 # --- Streamlit UI Layout ---
 st.title("🧠 Adaptive AI Sudoku Game")
 
+# Player name selects whose adaptive profile is loaded and saved
+player_id = st.sidebar.text_input("Player name", value=st.session_state.player_id).strip() or "guest"
+if player_id != st.session_state.player_id:
+    st.session_state.player_id = player_id
+    st.session_state.ai_controller_obj.player_id = player_id
+    st.session_state.ai_controller_obj.load_profile()
+
+# Race mode: everyone in a room plays the same puzzle; standings update live
+st.sidebar.subheader("Race mode")
+if st.session_state.race_room:
+    st.sidebar.write(f"Room **{st.session_state.race_room}**")
+    standings = race_call(_race_standings, st.session_state.race_room)
+    st.sidebar.table([{"Player": s["player"], "Rank": s["rank"] or "", "Left": s["remaining"],
+                       "Mistakes": s["mistakes"]} for s in standings])
+    if st.sidebar.button("Leave race"):
+        leave_race_logic()
+else:
+    room_code = st.sidebar.text_input("Room code (empty for a new room)")
+    if st.sidebar.button("Join race"):
+        join_race_logic(room_code)
+        st.rerun() # Redraw the grid with the room's puzzle
+
+# Recent game events and metrics from the shared telemetry ring buffer
+with st.sidebar.expander("Recent telemetry"):
+    st.dataframe(recent_telemetry(), hide_index=True, use_container_width=True)
+
+# Board size: changing it starts a new game on the new board
+board_sizes = [9, 4, 16]
+board_size = st.sidebar.selectbox("Board size", board_sizes, format_func=lambda n: f"{n}x{n}",
+                                  index=board_sizes.index(st.session_state.sudoku_generator_obj.size))
+if board_size != st.session_state.sudoku_generator_obj.size:
+    st.session_state.sudoku_generator_obj = SudokuGenerator(size=board_size, grid_corpus=get_grid_corpus())
+    new_game_logic()
+
 # Create two columns for layout: one for the game, one for controls
 col_game, col_controls = st.columns([2, 1])
 
@@ -222,46 +479,38 @@ with col_game:
     st.subheader("The Puzzle")
 
     # Sudoku Grid rendering
-    for r in range(9):
+    size = len(st.session_state.current_board)
+    box = st.session_state.sudoku_board_obj.box_size
+    renderer = st.session_state.grid_renderer
+    if st.session_state.grid_keys != st.session_state.start_time:
+        # A new game has new widget keys, so every cell is written once
+        renderer.reset(size, st.session_state.sudoku_board_obj.model)
+        st.session_state.grid_keys = st.session_state.start_time
+    # Only cells whose text or style changed since the last run are written to widget state
+    changes = renderer.render(st.session_state.current_board, st.session_state.initial_puzzle,
+                              st.session_state.sudoku_board_obj.notes)
+    for r, c, text, style in changes:
+        st.session_state[cell_key(r, c)] = "" if style == NOTES else text # Marks go in the placeholder
+    if changes or not st.session_state.grid_css:
+        st.session_state.grid_css = grid_css(renderer, size, box)
+    st.markdown(st.session_state.grid_css, unsafe_allow_html=True)
+
+    for r in range(size):
         # Create columns for each cell in the row
-        cols = st.columns(9)
-        for c in range(9):
-            current_value = st.session_state.current_board[r][c]
-            initial_value = st.session_state.initial_puzzle[r][c]
-
-            is_fixed = (initial_value != 0)
-            cell_display_value = str(current_value) if current_value != 0 else ""
-            
-            # Apply CSS classes for borders
-            cell_class = ""
-            if (c + 1) % 3 == 0 and c != 8: # Vertical border after 3rd and 6th column
-                cell_class += "cell-border-right "
-            if (r + 1) % 3 == 0 and r != 8: # Horizontal border after 3rd and 6th row
-                cell_class += "cell-border-bottom "
-            
-            if is_fixed:
-                cell_class += "fixed-cell "
-            
-            # Text input for each cell
-            # Using unique keys is essential for Streamlit inputs
-            key = f"cell_{r}_{c}_{st.session_state.start_time}" # Add start_time to ensure unique key across games
-            
-            # The input field itself
+        cols = st.columns(size)
+        for c in range(size):
             with cols[c]: # Place input in its respective column
-                # Using a custom div to apply styling easily
-                st.markdown(f'<div class="{cell_class}">', unsafe_allow_html=True)
-                new_val = st.text_input(
+                st.text_input(
                     label=f"cell_{r}_{c}", # Label is hidden by CSS
-                    value=cell_display_value,
-                    max_chars=1,
-                    key=key,
-                    disabled=is_fixed or st.session_state.game_over,
+                    max_chars=len(str(size)),
+                    key=cell_key(r, c), # Its value comes from the renderer through session state
+                    placeholder=renderer.notes_text(st.session_state.sudoku_board_obj.notes[r * size + c])
+                    if not st.session_state.current_board[r][c] else "",
+                    disabled=st.session_state.initial_puzzle[r][c] != 0 or st.session_state.game_over,
                     label_visibility="collapsed",
-                    # Add on_change to trigger update_cell_logic
                     on_change=update_cell_logic,
                     args=(r, c, None) # Pass dummy None, actual value will be retrieved via key
                 )
-                st.markdown('</div>', unsafe_allow_html=True)
 
 
 with col_controls:
@@ -280,10 +529,25 @@ with col_controls:
         new_game_logic()
         # st.rerun() # This call is generally not needed after a button click as it forces rerun anyway
 
-    if st.button("🤔 Get Hint", use_container_width=True, disabled=st.session_state.game_over):
+    # Hints and Solve would hand out the room's solution, so both are off while racing
+    racing = bool(st.session_state.race_room)
+    if st.button("🤔 Get Hint", use_container_width=True, disabled=st.session_state.game_over or racing):
         get_hint_logic()
 
-    if st.button("🤖 Solve Puzzle", use_container_width=True, disabled=st.session_state.game_over):
+    undo_col, redo_col = st.columns(2)
+    undo_col.button("↩️ Undo", use_container_width=True, on_click=undo_logic,
+                    disabled=st.session_state.game_over or not st.session_state.sudoku_board_obj.can_undo())
+    redo_col.button("↪️ Redo", use_container_width=True, on_click=undo_logic, kwargs={"redo": True},
+                    disabled=st.session_state.game_over or not st.session_state.sudoku_board_obj.can_redo())
+
+    st.toggle("✏️ Notes mode", key="notes_mode", help="Typing a digit in an empty cell toggles that pencil mark")
+    fill_col, clear_col = st.columns(2)
+    fill_col.button("📝 Fill notes", use_container_width=True, on_click=notes_logic,
+                    disabled=st.session_state.game_over)
+    clear_col.button("🧹 Clear notes", use_container_width=True, on_click=notes_logic, kwargs={"fill": False},
+                     disabled=st.session_state.game_over)
+
+    if st.button("🤖 Solve Puzzle", use_container_width=True, disabled=st.session_state.game_over or racing):
         if st.session_state.game_over or not st.session_state.timer_running:
             # Game is already over or not started, prevent solving
             st.session_state.messages.append("No active game to solve.")